@@ -0,0 +1,52 @@
+######################################################################
+## ADDED. Benchmark of the ASP Kemeny encodings (kemeny, kemeny-original and
+## kemeny-support) on all scenarios in jaggs/: for random profiles the ground
+## program of every encoding is built once per profile (one-shot), and the
+## grounding size (atoms and rules), grounding time and solve time are reported.
+## The outcomes of the encodings are checked to be the same.
+######################################################################
+
+import argparse, glob, os, random, time
+import clingo
+from src import Scenario, ASPSolver
+from src.asp_solver import solve_outcomes
+
+RULES = ['kemeny', 'kemeny-original', 'kemeny-support']
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--jaggs', type=str, default='./jaggs', help='Directory with the .jagg files.')
+parser.add_argument('--num_judges', type=int, default=15, help='Number of judges in every profile.')
+parser.add_argument('--profiles', type=int, default=20, help='Number of random profiles per scenario.')
+parser.add_argument('--seed', type=int, default=0, help='Seed of the random profiles.')
+args = parser.parse_args()
+
+random.seed(args.seed)
+solver = ASPSolver(maskrep=True)
+print('{:<20} {:<16} {:>8} {:>8} {:>10} {:>10}'.format('scenario', 'rule', 'atoms', 'rules', 'ground ms', 'solve ms'))
+for path in sorted(glob.glob(os.path.join(args.jaggs, '*.jagg'))):
+    scen = Scenario()
+    scen.load_from_file(path, args.num_judges)
+    profiles = [[[1, random.choice(scen.in_consistent)] for _ in range(args.num_judges)]
+        for _ in range(args.profiles)]
+    stats = {rule: [0, 0, 0.0, 0.0] for rule in RULES}
+    for profile in profiles:
+        scen.profile = profile
+        outcomes = {}
+        for rule in RULES:
+            t0 = time.time()
+            control = clingo.Control(arguments=["--project"])
+            control.add("base", [], solver.program(scen, rule, 0, solver.profile_facts(scen)))
+            control.ground([("base", [])])
+            t1 = time.time()
+            outcomes[rule] = solve_outcomes(control, scen, solver.opt)
+            t2 = time.time()
+            stats[rule][0] += len(control.symbolic_atoms)
+            stats[rule][1] += int(control.statistics['problem']['lp']['rules'])
+            stats[rule][2] += t1 - t0
+            stats[rule][3] += t2 - t1
+        if len(set(map(tuple, outcomes.values()))) > 1:
+            raise Exception (f"Outcomes of the encodings differ on {path}: {outcomes}")
+    name = os.path.basename(path)[:-5]
+    for rule in RULES:
+        atoms, rules, ground, solve = [value / args.profiles for value in stats[rule]]
+        print(f'{name:<20} {rule:<16} {atoms:>8.0f} {rules:>8.0f} {1000*ground:>10.2f} {1000*solve:>10.2f}')
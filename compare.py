@@ -1,58 +1,79 @@
 from src import Scenario
 from src import CompareRules
-from src import BFSolver
-from src import ASPSolver
+from src.parallel import Checkpoint
 import src.utils as utils
-import itertools, argparse
+import argparse, sys
 
 
 # Add parser.
 parser = argparse.ArgumentParser()
 # Arguments for scenario.
 parser.add_argument('--path_scen', type=str, default="./jaggs/sc01_JVC.jagg", help='Rel dir to .jagg file for reduced scenario.')
+parser.add_argument('--scenario_cache', type=str, default="", help='Directory of the cache of compiled scenarios; if empty no cache is used.')
 parser.add_argument('--num_judges', type=int, default=15, help='Number of judgements/judges that are contained in every profile.')
 parser.add_argument('--show_nums_consistent', type=bool, default=1, help='Show number of consistent and antipodal judgements (0/1 for False/True).')
+parser.add_argument('--count_only', type=int, default=0, help='If True only the numbers of consistent judgements and profiles are counted (without enumerating them) and shown (1/0 for True/False).')
 parser.add_argument('--show_judgements_consistent', type=bool, default=0, help='Show rational and feasible judgements (0/1 for False/True).')
 # Arguments for initialising comparison object.
 parser.add_argument('--solver1', type=str, default="bf", help='Solver method. options: "bf" (BFS), "asp" (ASP solver).')
 parser.add_argument('--rule1', type=str, default="kemeny",
-        help='Options: "kemeny", "kemeny-original", "kemnash", "lamb-kemnash". For ASP also saturation versions as "X-sat" (e.g, "kemeny-sat")')
+        help='Options: "kemeny", "kemeny-original", "kemnash", "lamb-kemnash". For ASP also saturation versions as "X-sat" (e.g, "kemeny-sat"), "kemeny-support" and overflow-safe "kemnash-log", "lamb-kemnash-log"')
 parser.add_argument('--lamb1', type=float, default=0, help='value of \u03BB parameter, rule is lamb-kemnash or lamb-kemnash-sat ')
 parser.add_argument('--solver2', type=str, default="bf", help='Solver method. options: "bf" (BFS), "asp" (ASP solver).')
 parser.add_argument('--rule2', type=str, default="kemnash", help='Rule used by solver2, options same as for rule1.')
 parser.add_argument('--lamb2', type=float, default=0, help='value of \u03BB parameter, rule is lamb-kemnash or lamb-kemnash-sat ')
 # Arguments for results that are produced / printed.
+parser.add_argument('--asp_grouped', type=int, default=0, help='If True the asp solver represents voters with the same judgement as one coalition (1/0 for True/False).')
+parser.add_argument('--asp_stats', type=int, default=0, help='If True the times of the phases of the asp solver and the sizes of the ground programs are collected and shown (1/0 for True/False).')
 parser.add_argument('--sample', type=int, default=0, help='Number of profiles in every iteration.')
 parser.add_argument('--simulate', type=int, default=40000000, help='If total number of profiles exceeds this number, profile is simulated.')
 parser.add_argument('--all_examples', type=int, default=0, help='If False only when outcomes differ (0/1 for False/True).')
 parser.add_argument('--num_examples', type=int, default=0, help='Maximal number of examples that is printed.')
 parser.add_argument('--time_analysis', type=int, default=1, help='If True execution time is part of the (comparison) analysis (0/1 for False/True).')
 parser.add_argument('--show_result', type=int, default=1, help='If True, the result are printed (0/1 for False/True).')
+parser.add_argument('--workers', type=int, default=1, help='Number of processes sweeping the profiles in parallel.')
+parser.add_argument('--symmetry', type=int, default=0, help='If True only one profile per orbit under the automorphisms of the scenario is computed (1/0 for True/False).')
+parser.add_argument('--seed', type=int, default=None, help='Seed of the random sample; if not given the time is used.')
+parser.add_argument('--checkpoint', type=str, default="", help='Path (prefix) of checkpoint files; if empty no checkpoints are saved.')
+parser.add_argument('--checkpoint_every', type=int, default=300, help='Minimal number of seconds between checkpoints.')
+parser.add_argument('--resume', type=int, default=0, help='If True the run continues from the checkpoint (1/0 for True/False).')
 args = parser.parse_args()
+if args.resume and not args.checkpoint:
+    parser.error('--resume requires --checkpoint.')
+checkpoint = Checkpoint(args.checkpoint, args.checkpoint_every, args.resume) if args.checkpoint else None
 
 # Initialise the scenario object
 reducedScen = Scenario()
+# Count without enumerating (for scenarios too large to enumerate).
+if args.count_only:
+    counts = reducedScen.count_from_file(args.path_scen, args.num_judges)
+    print("There are "+str(counts['in'][0])+" rational (allowed individual) judgements"
+            +" cotaining "+str(counts['in'][1])+" PAIRS of antipodal judgements.")
+    print("There are "+str(counts['out'][0])+" feasible (allowed collective) judgements"\
+            +" cotaining "+str(counts['out'][1])+" PAIRS of antipodal judgements.")
+    print("There are "+str(reducedScen.num_profs)+" profiles of "+str(reducedScen.number_voters)+" judges.")
+    sys.exit()
 # Load the reduced scenario.
-reducedScen.load_from_file(args.path_scen, args.num_judges)
+reducedScen.load_from_file(args.path_scen, args.num_judges, args.scenario_cache or None)
 # Show consistent judgments
 in_consistent = reducedScen.in_consistent
 out_consistent = reducedScen.out_consistent
 if args.show_nums_consistent:
     num_in = len(in_consistent)
     num_out = len(out_consistent)
-    num_antipodal_in = utils.count_consistentOpp(in_consistent)
-    num_antipodal_out = utils.count_consistentOpp(out_consistent)
+    num_antipodal_in = utils.count_consistentOpp(in_consistent, reducedScen.num_issues)
+    num_antipodal_out = utils.count_consistentOpp(out_consistent, reducedScen.num_issues)
     print("There are "+str(num_in)+" rational (allowed individual) judgements"
             +" cotaining "+str(num_antipodal_in)+" PAIRS of antipodal judgements.")
     print("There are "+str(num_out)+" feasible (allowed collective) judgements"\
             +" cotaining "+str(num_antipodal_out)+" PAIRS of antipodal judgements.")
 if args.show_judgements_consistent:
     print('The rational judgements are:')
-    print(utils.print_list([utils.jdict_to_bin(jdict) for jdict in in_consistent]))
+    print(utils.print_list([utils.mask_to_bin(mask, reducedScen.num_issues) for mask in in_consistent]))
     print('The feasible judgements are:')
-    print(utils.print_list([utils.jdict_to_bin(jdict) for jdict in out_consistent]))
+    print(utils.print_list([utils.mask_to_bin(mask, reducedScen.num_issues) for mask in out_consistent]))
 # Initialising comparison object
 comparison = CompareRules(reducedScen, args.solver1, args.rule1, args.lamb1, args.solver2,
-            args.rule2, args.lamb2)
+            args.rule2, args.lamb2, checkpoint, args.asp_grouped, args.asp_stats)
 result = comparison.result(args.all_examples, args.num_examples, args.sample, 
-                args.time_analysis, args.show_result, args.simulate)
\ No newline at end of file
+                args.time_analysis, args.show_result, args.simulate, args.workers, args.symmetry, args.seed)
\ No newline at end of file
@@ -0,0 +1,52 @@
+######################################################################
+## ADDED. Check of the ASP log-utility Kemeny-Nash rules (kemnash-log and
+## lamb-kemnash-log, per voter and grouped) against the BF Kemeny-Nash rules for
+## lambda in LAMBS on all scenarios in jaggs/: on the profile in which the judges
+## hold all rational judgements (in turn), which has voters with agreement 0 for
+## every outcome if the judgements contain antipodal pairs, and on random profiles.
+## The exit code is 1 if the outcomes differ.
+######################################################################
+
+import argparse, glob, os, random, sys
+from src import Scenario, ASPSolver, BFSolver
+
+LAMBS = [0, 0.5, 1]
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--jaggs', type=str, default='./jaggs', help='Directory with the .jagg files.')
+parser.add_argument('--num_judges', type=int, default=9, help='Number of judges in every profile.')
+parser.add_argument('--profiles', type=int, default=20, help='Number of random profiles per scenario.')
+parser.add_argument('--seed', type=int, default=0, help='Seed of the random profiles.')
+args = parser.parse_args()
+
+random.seed(args.seed)
+bfs = BFSolver(maskrep=True)
+solvers = {'': ASPSolver(maskrep=True), ' (grouped)': ASPSolver(maskrep=True, grouped=True)}
+failed = False
+for path in sorted(glob.glob(os.path.join(args.jaggs, '*.jagg'))):
+    scen = Scenario()
+    scen.load_from_file(path, args.num_judges)
+    judgements = scen.in_consistent
+    profiles = [[[1, judgements[judge % len(judgements)]] for judge in range(args.num_judges)]]
+    profiles += [[[1, random.choice(judgements)] for _ in range(args.num_judges)]
+        for _ in range(args.profiles)]
+    name = os.path.basename(path)[:-5]
+    for lamb in LAMBS:
+        rule = 'kemnash' if lamb == 0 else 'lamb-kemnash'
+        for grouped, solver in solvers.items():
+            differ = 0
+            for profile in profiles:
+                scen.profile = profile
+                outcomes_bf = sorted(bfs.all_outcomes(scen, rule, lamb))
+                outcomes_asp = solver.all_outcomes(scen, rule + '-log', lamb)
+                if outcomes_asp != outcomes_bf:
+                    differ += 1
+                    if differ == 1:
+                        print(f'  {profile}: {outcomes_asp} versus {outcomes_bf}')
+            print(f'{name:<20} lambda {lamb:<4} {rule}-log{grouped}: ' +
+                (f'{differ}/{len(profiles)} profiles differ' if differ else 'ok'))
+            failed = failed or differ > 0
+if failed:
+    print('FAILED')
+    sys.exit(1)
+print('OK')
@@ -1,8 +1,7 @@
 from src import Scenario
 from src import Compare_Kemnash
-import src.utils as utils
-import matplotlib.pyplot as plt
-import itertools, argparse, os, time, sys
+from src.parallel import Checkpoint
+import argparse, os, sys
 
 l = [0, .01, .05, .1, .15, .25, .35, .45, .55]
 l0 = [0]
@@ -27,10 +26,20 @@ parser = argparse.ArgumentParser()
 # Arguments for scenario.
 parser.add_argument('--sc', type=int, default=None)
 parser.add_argument('--path_scen', type=str, default="./jaggs/sc01_JVC.jagg", help='Path to .jagg file for reduced scenario.')
+parser.add_argument('--scenario_cache', type=str, default="", help='Directory of the cache of compiled scenarios; if empty no cache is used.')
 parser.add_argument('--num_judges', type=int, default=15, help='Number of judgements/judges that are contained in every profile.')
 # Arguments for initialising comparison object.
 parser.add_argument('--lambs', type=str, default='l', help='Key of lambda list in lamb_dicts.')
 parser.add_argument('--sample', type=int, default=250000, help='Number of profiles in every iteration.')
+parser.add_argument('--gray', type=int, default=0, help='If True profiles are iterated in minimal change order with incremental scores (1/0 for True/False).')
+parser.add_argument('--symmetry', type=int, default=0, help='If True only one profile per orbit under the automorphisms of the scenario is iterated (1/0 for True/False).')
+parser.add_argument('--seed', type=int, default=None, help='Seed of the sampled profiles; if not given a random seed.')
+parser.add_argument('--parametric', type=int, default=0, help='If True results are computed exactly as functions of lambda (1/0 for True/False).')
+parser.add_argument('--resolution', type=int, default=0, help='With --parametric: number of equally spaced lambdas in [0, max(lambs)] evaluated (if 0 lambs are used).')
+parser.add_argument('--workers', type=int, default=1, help='Number of processes sweeping the profiles in parallel.')
+parser.add_argument('--checkpoint', type=str, default="", help='Path (prefix) of checkpoint files; if empty no checkpoints are saved.')
+parser.add_argument('--checkpoint_every', type=int, default=300, help='Minimal number of seconds between checkpoints.')
+parser.add_argument('--resume', type=int, default=0, help='If True the run continues from the checkpoint (1/0 for True/False).')
 # Plots
 parser.add_argument('--show_plots', type=int, default=0, help='If True plot is shown (1/0 for True/False).')
 parser.add_argument('--save_plots', type=int, default=0, help='If True plots saved (1/0 for True/False).')
@@ -38,6 +47,9 @@ parser.add_argument('--plot_folderDir', type=str, default="construct", help='Abs
 # Auxiliary 
 parser.add_argument('--verbose', type=int, default=1, help='If True all result values are printed (1/0 for True/False).')
 args = parser.parse_args()
+if args.resume and not args.checkpoint:
+    parser.error('--resume requires --checkpoint.')
+checkpoint = Checkpoint(args.checkpoint, args.checkpoint_every, args.resume) if args.checkpoint else None
 
 # SCENARIO.
 if args.sc == None:
@@ -78,10 +90,15 @@ else:
 
 scen = Scenario()
 # scen.load_from_file(args.path_scen, args.num_judges)
-scen.load_from_file(path, args.num_judges)
+scen.load_from_file(path, args.num_judges, args.scenario_cache or None)
 # Get result dictionary
 lambs = lamb_dict[args.lambs]
-result = Compare_Kemnash(scen, lambs, args.sample).result()
+if args.parametric:
+    if args.resolution:
+        lambs = [max(lambs) * idx / max(args.resolution - 1, 1) for idx in range(args.resolution)]
+    result = Compare_Kemnash(scen, lambs, args.sample, args.gray, checkpoint, args.symmetry, args.seed).result_parametric(workers=args.workers)
+else:
+    result = Compare_Kemnash(scen, lambs, args.sample, args.gray, checkpoint, args.symmetry, args.seed).result(workers=args.workers)
 symdif_, solprof_, qual_, lamb_, ze_ = [], [], [], [], []
 for label in result:
     if label[:6] == 'symdif':
@@ -112,6 +129,8 @@ if args.verbose:
 
 if args.save_plots == args.show_plots == 0:
     sys.exit()
+# Modified: matplotlib is only imported when plots are made.
+import matplotlib.pyplot as plt
 
 if args.save_plots:
     # Construct name for plot.
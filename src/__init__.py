@@ -1,11 +1,16 @@
+from importlib import import_module
 from .classes import Scenario, Solver
-import src.asp_rules
-from .asp_solver import ASPSolver
 from .bf_solver import BFSolver
-from .parser import Parser
-import src.utils 
-from .compare_rules import CompareRules
-from .lamb_iter import Compare_Kemnash
-
 
+# Modified: the other modules are imported on first use (e.g. src.ASPSolver), so
+# runs and worker processes that do not need them do not import clingo, pyparsing
+# or matplotlib (see startup_bench.py).
+LAZY = {'ASPSolver': 'asp_solver', 'Parser': 'parser', 'CompareRules': 'compare_rules',
+    'Compare_Kemnash': 'lamb_iter', 'asp_rules': None, 'utils': None}
 
+def __getattr__(name):
+    if name not in LAZY:
+        raise AttributeError(f"module {__name__} has no attribute {name}")
+    if LAZY[name] is None:
+        return import_module(f'.{name}', __name__)
+    return getattr(import_module(f'.{LAZY[name]}', __name__), name)
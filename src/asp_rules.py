@@ -1,6 +1,11 @@
 from fractions import Fraction
+from math import log
 import textwrap
 
+# ADDED. Precision of the logarithms of agreements in the log-utility encodings
+# (see kemnash_log): log values are rounded to multiples of 1/LOG_PRECISION.
+LOG_PRECISION = 10000
+
 # Kemeny rule (using optimisation) 
 # Borrows from implementation kemeny3-opt.lp in JA-ASP [License-(JA-ASP)] 
 def kemeny():
@@ -17,6 +22,18 @@ def kemeny():
         """
     return asp_program
 
+# ADDED. Kemeny rule (using optimisation) by support of the issue literals: the sum
+# of agreements is the sum over the accepted literals of their support, a flat 
+# weighted #maximize (no voter recursion).
+def kemeny_support():
+    asp_program = """
+        % determine support (number of voters) for each issue literal
+        support(X,N) :- ilit(X), N = #count { V : voter(V), js(V,X) }.
+        % maximize the support of the collective judgement
+        #maximize { N@10,X : js(col,X), support(X,N) }.
+        """
+    return asp_program
+
 # Kemeny-Nash rule (using optimisation) 
 # Borrows from implementation kemeny3-opt.lp in JA-ASP [License-(JA-ASP)]
 def kemnash(lamb=0):
@@ -267,3 +284,320 @@ def kemeny_original_sat():
 
 
 
+#####################################################################
+## ADDED. COALITION-GROUPED ENCODINGS. Voters with the same judgement are
+## one coalition: voter(K) is a coalition with size(K,S) voters (see 
+## ASPSolver.profile_facts) and every rule weights by the coalition size; 
+## the ground program scales with the number of distinct judgements.
+#####################################################################
+
+# Kemeny rule (using optimisation), coalitions.
+def kemeny_grouped():
+    asp_program = """
+        % determine the Hamming distance from each coalition's judgment set to the outcome
+        dist(V,D) :- voter(V), D = #count { X : ilit(X), js(col,X), js(V,-X) }.
+        agr(V,C) :- numissues(N), voter(V), dist(V,D), C = N-D.
+        % maximize the sum of agreements weighted by coalition size
+        #maximize { S*C@10,V : agr(V,C), size(V,S) }.
+        """
+    return asp_program
+
+# Kemeny rule (using optimisation) by support of the issue literals, coalitions.
+def kemeny_support_grouped():
+    asp_program = """
+        % determine support (number of voters) for each issue literal
+        support(X,N) :- ilit(X), N = #sum { S,V : voter(V), js(V,X), size(V,S) }.
+        % maximize the support of the collective judgement
+        #maximize { N@10,X : js(col,X), support(X,N) }.
+        """
+    return asp_program
+
+# Kemeny-Nash rule (using optimisation), coalitions.
+def kemnash_grouped(lamb=0):
+    # Convert lamb value to (integer) fraction. 
+    lamb = list((Fraction(lamb).limit_denominator()).as_integer_ratio())
+    asp_program = f"#const ln={lamb[0]}.\n"
+    asp_program += textwrap.dedent(f"#const ld={lamb[1]}.\n")
+    asp_program += textwrap.dedent("""
+        % determine the Hamming distance from each coalition's judgment set to the outcome
+        dist(V,D) :- voternum(V), D = #count { X : ilit(X), js(col,X), js(V,-X) }.
+        agr(V,C) :- numissues(N), voternum(V), dist(V,D), C = N-D.
+        % lamb_agr encodes the non-zero agreement of the coalition members
+        agr_lamb(V,C) :- agr(V,C1), C1 > 0, C = C1*ld.
+        agr_lamb(V,ln) :- agr(V,C1), C1 = 0.
+        % iteratively multiply Lambda agreements, to the power coalition size.
+        agr_lamb_prod(1,C) :- agr_lamb(1,C1), size(1,S), C = C1**S.
+        agr_lamb_prod(V,C) :- voternum(V), voternum(V1), V1 = V-1, agr_lamb_prod(V1,C1), agr_lamb(V,C2), 
+          size(V,S), C = C1*(C2**S).
+        % introduce 1-ary predicate to encode final product.
+        agr_lamb_prod(C) :- agr_lamb_prod(N,C), numvoters(N).
+        % maximize product of lambda agreements.
+        #maximize { C@10,agr_lamb_prod(C) : agr_lamb_prod(C) }.""")
+    return asp_program
+
+# Kemeny rule (using saturation), coalitions.
+def kemeny_sat_grouped():
+    asp_program = """
+        % Kemeny rule with saturation
+        w :- not w.
+        virtual(X) :- lit(X), w. 
+        % guess a virtual assignment (issues and variables from clauses)
+        virtual(X) ; virtual(-X) :- variable(X).
+        % remove virtual assignments that are contradictory
+        w :- variable(X), virtual(X), virtual(-X).
+        % remove virtual assignments that don't satisfy output constraint
+        w :- outputClause(C), virtual(-L) : outputClause(C,L).
+
+        % order the variables alphabetically.
+        1 { varorder(X,O) : varnum(O) } 1 :- var(X).
+        1 { varorder(X,O) : var(X) } 1 :- varnum(O).
+        :- varorder(X1,O1), varorder(X2,O2), X1 < X2, O1 > O2.
+
+        % order the coalitions alphabetically.
+        1 { voterorder(V,O) : voternum(O) } 1 :- voter(V).
+        1 { voterorder(V,O) : voter(V) } 1 :- voternum(O).
+        :- voterorder(V1,O1), voterorder(V2,O2), V1 < V2, O1 > O2.
+
+        % total number of voters.
+        totalvoters(T) :- T = #sum { S,V : size(V,S) }.
+
+        % compute the agreement with the virtual assignment for every coalition.
+        virtagr(0,N,0) :- voternum(N).
+        % If virtual and coalition both accept.
+        virtagr(Xn,Vn,C) :- varnum(Xn), varorder(X,Xn), voternum(Vn), voterorder(V,Vn),
+          virtagr(Xn-1,Vn,D), C = D + 1, virtual(X), js(V,X), ilit(X).
+        % If virtual accepts and coalition rejects.
+        virtagr(Xn,Vn,C) :- varnum(Xn), varorder(X,Xn), voternum(Vn), voterorder(V,Vn),
+          virtagr(Xn-1,Vn,C), virtual(X), js(V,-X), ilit(X).
+        % If virtual and coalition both reject.
+        virtagr(Xn,Vn,C) :- varnum(Xn), varorder(X,Xn), voternum(Vn), voterorder(V,Vn),
+          virtagr(Xn-1,Vn,D), C = D + 1, virtual(-X), js(V,-X), ilit(X).
+        % If virtual rejects and coalition accepts.
+        virtagr(Xn,Vn,C) :- varnum(Xn), varorder(X,Xn), voternum(Vn), voterorder(V,Vn),
+          virtagr(Xn-1,Vn,C), virtual(-X), js(V,X), ilit(X).
+
+        % Add 2-ary predicate to encode the total agreement for each coalition.
+        virtagr(Vn,C) :- virtagr(NI,Vn,C), numissues(NI).
+        % Sum of agreement scores, weighted by coalition size.
+        virtagr_sum(1,C) :- virtagr(1,C1), size(1,S), C = S*C1.
+        virtagr_sum(V,C) :- V1 = V - 1, virtagr_sum(V1,C1), virtagr(V,C2), size(V,S), C = C1 + S*C2.
+
+        % Make predicate for final virtual agreement
+        virtagr(C) :- virtagr_sum(N,C), numvoters(N).           
+
+        % Saturate all virtual/1, virtagr/3, virtagr/2, virtagr_sum/2 in case w 
+        % is derived.
+        virtual(X) :- w, lit(X).
+        virtagr(Xn,Vn,0..C) :- w, varnum(Xn), voternum(Vn), numvars(M), C = M + 1. 
+        virtagr(Vn,0..C) :- w, voternum(Vn), numvars(M), C = M + 1.
+        virtagr_sum(Vn,0..C) :- w, voternum(Vn), totalvoters(T), numvars(M), C = T*M + 1.
+
+        % compute the agreement between the collective assignment and the profile.
+        agr(V,C) :- voter(V), C = #count { X : ilit(X), js(col,X), js(V,X) }.
+        % calculate collective agreement, weighted by coalition size.
+        colagr(C) :- C = #sum { S*C1,V : agr(V,C1), size(V,S) }.
+
+        % remove virtual assignments that have agreement that is weakly smaller than 
+        % agreement of collective decision.
+        w :- virtagr(C1), colagr(C2), C1 <= C2."""
+    return asp_program
+
+# Kemeny-Nash rule (using saturation), coalitions.
+def kemnash_sat_grouped(lamb=0):
+    # Convert lamb value to (integer) fraction. 
+    lamb = list((Fraction(lamb).limit_denominator()).as_integer_ratio())
+    asp_program = f"#const ln={lamb[0]}.\n"
+    asp_program += textwrap.dedent(f"#const ld={lamb[1]}.\n")
+    asp_program += textwrap.dedent("""
+        % use the technique of saturation (see Eiter & Gottlob '95)
+        w :- not w.
+        virtual(X) :- lit(X), w. 
+        % guess a virtual assignment (issues and variables from clauses)
+        virtual(X) ; virtual(-X) :- variable(X).
+        % remove virtual assignments that are contradictory
+        w :- variable(X), virtual(X), virtual(-X).
+        % remove virtual assignments that don't satisfy output constraint
+        w :- outputClause(C), virtual(-L) : outputClause(C,L).
+
+        % order the variables alphabetically.
+        1 { varorder(X,O) : varnum(O) } 1 :- var(X).
+        1 { varorder(X,O) : var(X) } 1 :- varnum(O).
+        :- varorder(X1,O1), varorder(X2,O2), X1 < X2, O1 > O2.
+
+        % order the coalitions alphabetically.
+        1 { voterorder(V,O) : voternum(O) } 1 :- voter(V).
+        1 { voterorder(V,O) : voter(V) } 1 :- voternum(O).
+        :- voterorder(V1,O1), voterorder(V2,O2), V1 < V2, O1 > O2.
+
+        % compute the agreement with the virtual assignment for every coalition.
+        virtagr(0,N,0) :- voternum(N).
+        % if virtual and coalition both accept.
+        virtagr(Xn,Vn,C) :- varnum(Xn), varorder(X,Xn), voternum(Vn), voterorder(V,Vn),
+          virtagr(Xn-1,Vn,D), C = D + 1, virtual(X), js(V,X), ilit(X).
+        % if virtual accepts and coalition rejects.
+        virtagr(Xn,Vn,C) :- varnum(Xn), varorder(X,Xn), voternum(Vn), voterorder(V,Vn),
+          virtagr(Xn-1,Vn,C), virtual(X), js(V,-X), ilit(X).
+        % if virtual and coalition both reject.
+        virtagr(Xn,Vn,C) :- varnum(Xn), varorder(X,Xn), voternum(Vn), voterorder(V,Vn),
+          virtagr(Xn-1,Vn,D), C = D + 1, virtual(-X), js(V,-X), ilit(X).
+        % if virtual rejects and coalition accepts.
+        virtagr(Xn,Vn,C) :- varnum(Xn), varorder(X,Xn), voternum(Vn), voterorder(V,Vn),
+          virtagr(Xn-1,Vn,C), virtual(-X), js(V,X), ilit(X).
+
+        % add 2-ary predicate to encode the total agreement for each coalition.
+        virtagr(V,C) :- virtagr(NI,V,C), numissues(NI).
+        virtagr_lamb(V,C) :- virtagr(V,C1), C1 > 0, C = C1 * ld.
+        virtagr_lamb(V,ln) :- virtagr(V,C), C = 0.
+
+        % virtagr_prod: product of the agreement scores, to the power coalition size.
+        virtagr_prod(1,C) :- virtagr_lamb(1,C1), size(1,S), C = C1**S.
+        virtagr_prod(V,C) :- V1 = V - 1, virtagr_prod(V1,C1), virtagr_lamb(V,C2), 
+          size(V,S), C = C1 * (C2**S).
+
+        % make predicate for final virtual agreement.
+        virtagr(C) :- virtagr_prod(N,C), numvoters(N).
+
+        % saturate all virtual/1, virtagr/3, virtagr/2, virtagr_prod/2 in case w 
+        % is derived.
+        virtual(X) :- w, lit(X).
+        virtagr(Xn,Vn,0..C) :- w, varnum(Xn), voternum(Vn), numvars(M), C = M + 1. 
+        virtagr(Vn,0..C) :- w, voternum(Vn), numvars(M), C = M + 1.
+        virtagr_lamb(Vn,0..C) :- w, voternum(Vn), numvars(M), C = M + 1.
+        virtagr_prod(Vn,0..C) :- w, voternum(Vn), numvoters(M), C = M + 1. 
+
+        % compute the agreement of the collective assignment with the profile.
+        agr(V,C) :- voter(V), C = #count { X : ilit(X), js(col,X), js(V,X) }.
+        agr_lamb(V,C) :- agr(V,C1), C1 > 0, C = C1 * ld.
+        agr_lamb(V,ln) :- agr(V,C), C = 0.
+
+        % calculate collective agreement, product of agreements to the power coalition size.
+        colagr(1,C) :- agr_lamb(1,C1), size(1,S), C = C1**S.
+        colagr(V,C) :- V1 = V - 1, colagr(V1,C1), agr_lamb(V,C2), size(V,S), C = C1 * (C2**S).
+        colagr(C) :- numvoters(N), colagr(N,C).
+
+        % remove virtual assignments that have distance at least that of the  
+        % collective outcome.
+        w :- virtagr(C1), colagr(C2), C1 <= C2.
+        """)
+    return asp_program
+
+# Original implementation kemeny3-opt.lp in JA-ASP [License-(JA-ASP)], coalitions.
+def kemeny_original_grouped():
+    asp_program = """
+        % determine the Hamming distance from each coalition's judgment set to the outcome
+        dist(A,D) :- voter(A), D = #count { X : ilit(X), js(col,X), js(A,-X) }.
+        % sum the distances over all coalitions, weighted by size.
+        dist(E) :- E = #sum { S*D,dist(A,D) : dist(A,D), size(A,S) }.
+        % minimize the cumulative distance.
+        #minimize { E@10,dist(E) : dist(E) }."""
+    return asp_program
+
+# Original implementation kemeny3.lp in JA-ASP [License-(JA-ASP)], coalitions
+# (with the modifications of kemeny_original_sat).
+def kemeny_original_sat_grouped():
+    asp_program = """
+        % determine support (number of voters) for each issue literal. 
+        pc(X,N) :- ilit(X), N = #sum { S,A : voter(A), js(A,X), size(A,S) }.       
+
+        % use the technique of saturation (see Eiter & Gottlob '95)
+        w :- not w.
+        virtual(X) :- lit(X), w.
+        % guess a virtual assignment
+        virtual(X) ; virtual(-X) :- variable(X).
+        % remove virtual assignments that are contradictory
+        w :- variable(X), virtual(X), virtual(-X).
+        % remove virtual assignments that don't satisfy integrity constraint
+        w :- outputClause(C), virtual(-L) : outputClause(C,L).
+
+        % order the variables alphabetically
+        1 { varorder(X,O) : varnum(O) } 1 :- var(X).
+        1 { varorder(X,O) : var(X) } 1 :- varnum(O).
+        :- varorder(X1,O1), varorder(X2,O2), X1 < X2, O1 > O2.      
+
+        % order the coalitions alphabetically
+        1 { voterorder(A,O) : voternum(O) } 1 :- voter(A).
+        1 { voterorder(A,O) : voter(A) } 1 :- voternum(O).
+        :- voterorder(A1,O1), voterorder(A2,O2), A1 < A2, O1 > O2.
+
+        % total number of voters.
+        totalvoters(T) :- T = #sum { S,A : size(A,S) }.
+
+        % compute the distance from the virtual assignment to the profile
+        % virtdist(Var,Coalition,Ans), a coalition adds its size
+        virtdist(0,N,0) :- numvoters(N).
+        virtdist(Xn,An,C) :-
+          varnum(Xn), varorder(X,Xn),
+          voternum(An), voterorder(A,An),
+          virtdist(Xn,An-1,C), virtual(X), js(A,X), ilit(X).
+        virtdist(Xn,An,C) :-
+          varnum(Xn), varorder(X,Xn),
+          voternum(An), voterorder(A,An),
+          virtdist(Xn,An-1,D), size(A,S), C = D+S, virtual(X), js(A,-X), ilit(X).
+        virtdist(Xn,An,C) :-
+          varnum(Xn), varorder(X,Xn),
+          voternum(An), voterorder(A,An),
+          virtdist(Xn,An-1,C), virtual(-X), js(A,-X), ilit(X).
+        virtdist(Xn,An,C) :-
+          varnum(Xn), varorder(X,Xn),
+          voternum(An), voterorder(A,An),
+          virtdist(Xn,An-1,D), size(A,S), C = D+S, virtual(-X), js(A,X), ilit(X).
+        virtdist(Xn,0,C) :- varnum(Xn), numvoters(N), virtdist(Xn-1,N,C).
+        virtdist(D) :- virtdist(M,N,D), numvars(M), numvoters(N).
+        % saturate all virtdist/3 in case w is derived
+        virtdist(Xn,An,0..C) :- w, varnum(Xn), voternum(An), totalvoters(T), C = T*Xn.
+
+        % compute the distance from the collective assignment to the profile
+        coldist(D) :- D = #sum { N,pc(X,N) : js(col,-X), pc(X,N) }.     
+
+        % remove virtual assignments that have distance at least that of the collective outcome
+        w :- virtdist(D1), coldist(D2), D1 >= D2."""
+    return asp_program
+
+#####################################################################
+## ADDED. LOG-UTILITY KEMENY-NASH ENCODINGS. Instead of products of agreements
+## (which overflow clingo's 32-bit integers), the sum of the logarithms of the 
+## (lambda) agreements, rounded to fixed precision, is maximised with weighted 
+## #maximize terms; if lambda is 0 and a voter has agreement 0 the product is 0
+## (zero) and all such outcomes are equally good. As the rounding may change the order of outcomes, the exact
+## outcomes are selected among all near-optimal ones (see ASPSolver.program).
+#####################################################################
+
+def log_agreements(lamb, num_issues):
+    """Facts log_agr(C,W): W is the rounded logarithm of the lambda agreement of a 
+    voter with agreement C (C*ld if C > 0, otherwise ln, omitted if ln = 0)."""
+    lamb_num, lamb_den = (Fraction(lamb).limit_denominator()).as_integer_ratio()
+    asp_program = ""
+    for agr in range(num_issues + 1):
+        value = agr * lamb_den if agr > 0 else lamb_num
+        if value > 0:
+            asp_program += f"log_agr({agr},{round(log(value) * LOG_PRECISION)}).\n"
+    return asp_program
+
+# Kemeny-Nash rule (using optimisation of log-utilities)
+def kemnash_log(lamb=0, num_issues=1):
+    asp_program = log_agreements(lamb, num_issues)
+    asp_program += textwrap.dedent("""
+        % determine the Hamming distance from each voter's judgment set to the outcome
+        dist(V,D) :- voter(V), D = #count { X : ilit(X), js(col,X), js(V,-X) }.
+        agr(V,C) :- numissues(N), voter(V), dist(V,D), C = N-D.
+        % if ln = 0 the product is 0 if a voter has agreement 0, first avoid this
+        zero :- agr(V,0), not log_agr(0,_).
+        #minimize { 1@20 : zero }.
+        % maximize sum of the logarithms of lambda agreements (if the product is not 0).
+        #maximize { W@10,V : agr(V,C), log_agr(C,W), not zero }.""")
+    return asp_program
+
+# Kemeny-Nash rule (using optimisation of log-utilities), coalitions.
+def kemnash_log_grouped(lamb=0, num_issues=1):
+    asp_program = log_agreements(lamb, num_issues)
+    asp_program += textwrap.dedent("""
+        % determine the Hamming distance from each coalition's judgment set to the outcome
+        dist(V,D) :- voter(V), D = #count { X : ilit(X), js(col,X), js(V,-X) }.
+        agr(V,C) :- numissues(N), voter(V), dist(V,D), C = N-D.
+        % if ln = 0 the product is 0 if a voter has agreement 0, first avoid this
+        zero :- agr(V,0), not log_agr(0,_).
+        #minimize { 1@20 : zero }.
+        % maximize sum of the logarithms of lambda agreements, weighted by coalition size
+        % (if the product is not 0).
+        #maximize { S*W@10,V : agr(V,C), log_agr(C,W), size(V,S), not zero }.""")
+    return asp_program
@@ -4,18 +4,40 @@
 ## correct answer sets.
 #####################################################################
 
-import textwrap, clingo, time
+import textwrap, clingo, warnings, time
 from fractions import Fraction
 from .classes import Solver
-from .parser import Parser
 import src.utils as utils
 import src.asp_rules as asp_rules
 
+# ADDED. Statistics of the calls of all_outcomes per (rule, lamb) (see ASPSolver.stats):
+# number of calls, the times (s) of the phases and the sizes of the solved programs
+# (ground atoms and rules) and the search (choices and conflicts), summed over calls.
+STATS = ['calls', 'time_build', 'time_cnf', 'time_add', 'time_ground', 'time_assign',
+    'time_solve', 'time_extract', 'atoms', 'rules', 'choices', 'conflicts']
+
+def new_stats():
+    """ADDED. Statistics (see STATS) without calls."""
+    return {key: 0.0 if key.startswith('time') else 0 for key in STATS}
+
 class ASPSolver(Solver):
     """A solver that uses Answer Set Programming to compute outcomes."""
-    def __init__(self, binrep=False, print_asp=False):
+    def __init__(self, binrep=False, print_asp=False, maskrep=False, session=True, grouped=False,
+            stats=False):
         self.opt = False
         self.binrep = binrep
+        self.maskrep = maskrep
+        # ADDED. If session, profiles are solved in a persistent grounded program per
+        # (scenario, rule, lamb, number of voters) (see ASPSession).
+        self.print_asp = print_asp
+        self.session = session
+        self.sessions = {}
+        # ADDED. If grouped, voters with the same judgement are one coalition (see 
+        # profile_facts and asp_rules); the program is then grounded per profile.
+        self.grouped = grouped
+        # ADDED. If stats, statistics (see STATS) are summed in self.stats[(rule, lamb)]; 
+        # the dictionaries may be replaced (e.g. by those of a sweep, see CompareRules).
+        self.stats = {} if stats else None
 
     def all_outcomes(self, scenario, rule, lamb=0):
         """Given a scenario object and the name of a rule
@@ -31,35 +53,75 @@ class ASPSolver(Solver):
             - lamb-kemnash-sat      (saturation technique - based on Kemeny JA-ASP)
             - kemeny-original       (Kemeny with optimisation from JAGGPY)
             - kemeny-original-sat   (Kemeny with saturation from JA-ASP package)
+            - kemeny-support        (using optimisation of the support of literals)
+            - kemnash-log           (using optimisation of log-utilities, exact)
+            - lamb-kemnash-log      (using optimisation of log-utilities, exact)
+        Outcomes are judgement dictionaries, unless binrep (bin strings) or 
+        maskrep (bitmasks) is set.
         """
-        # Make sure that Solver is not in optimisation mode
-        self.opt = False
-        t0 = time.time()
         # Give a warning if scenario does not include profile
         if scenario.profile == []:
             raise Exception ("The scenario does not include a profile")
-            
-        parser = Parser()
 
-        # Create a list of all variables in the scenario. REMOVED IN SEP
-        all_variables = set()
-        for var in scenario.variables:
-            all_variables.add(var)
-
-        # Add the scenario to the asp_program using the scenario argument.
-        asp_program = textwrap.dedent("""% We first add the scenario to our ASP program.
-        """)
+        # Modified: the program is grounded once per (scenario, rule, lamb, number of
+        # voters) and the profile is set by external atoms (see ASPSession), unless
+        # this is not possible; then the program with the profile is grounded.
+        number_voters = sum(coalition[0] for coalition in scenario.profile)
+        stats = None
+        if self.stats is not None:
+            stats = self.stats.setdefault((rule, lamb), new_stats())
+            stats['calls'] += 1
+        session = None
+        if self.session and not self.grouped:
+            session = self.get_session(scenario, rule, lamb, number_voters, stats)
+        if session is not None:
+            self.opt = session.opt
+            control = session.control
+            outcomes = session.solve(scenario.profile, stats)
+        else:
+            asp_program = self.program(scenario, rule, lamb, self.profile_facts(scenario, self.grouped),
+                self.grouped, stats)
+            if self.print_asp:
+                print(asp_program)
+            control = ground_program(asp_program, stats)
+            outcomes = solve_outcomes(control, scenario, self.opt, self.log_lamb, stats)
+        if stats is not None:
+            lp_stats = control.statistics['problem']['lp']
+            stats['atoms'] += int(lp_stats['atoms'])
+            stats['rules'] += int(lp_stats['rules'])
+        if self.binrep:
+            outcomes = [utils.mask_to_bin(d, scenario.num_issues) for d in outcomes]
+        elif not self.maskrep:
+            outcomes = [utils.mask_to_jdict(scenario, d) for d in outcomes]
+        return outcomes
 
-        # Adding issues.
-        asp_program += textwrap.dedent("""
-        % Adding the labels that represent the issues.
-        """)
-        for key in scenario.agenda:
-            asp_program += f"issue(l{key}).\n"
-            all_variables.add(f"l{key}")
+    def get_session(self, scenario, rule, lamb, number_voters, stats=None):
+        """ADDED. The session of (scenario, rule, lamb, number_voters), created on first
+        use, or None if the rule cannot be grounded for all profiles (see ASPSession).
+        The statistics of the creation are added to stats (if not None)."""
+        key = (rule, lamb, number_voters)
+        if key not in self.sessions or self.sessions[key][0] is not scenario:
+            session = ASPSession(self, scenario, rule, lamb, number_voters, stats)
+            self.sessions[key] = (scenario, session if session.fits else None)
+        return self.sessions[key][1]
 
+    def profile_facts(self, scenario, grouped=False):
+        """ADDED (split off from all_outcomes). The voters and their judgements in
+        scenario.profile as ASP facts. If grouped, every distinct judgement is one
+        voter(K), a coalition with size(K,S) voters."""
+        if grouped:
+            sizes = {}
+            for count, mask in scenario.profile:
+                sizes[mask] = sizes.get(mask, 0) + count
+            asp_program = "\n% Adding coalitions, their sizes and how they voted.\n"
+            for coalition, (mask, size) in enumerate(sizes.items(), 1):
+                asp_program += f"voter({coalition}). size({coalition},{size}).\n"
+                for pos, label in enumerate(scenario.agenda):
+                    sign = "" if (mask >> (scenario.num_issues - 1 - pos)) & 1 else "-"
+                    asp_program += f"js({coalition},{sign}l{label}).\n"
+            return asp_program
         # Adding voters and judgment sets.
-        asp_program += textwrap.dedent("""
+        asp_program = textwrap.dedent("""
         % Adding voters and specifying how they voted.
         """)
         voter_count = 0
@@ -69,95 +131,47 @@ class ASPSolver(Solver):
                 voter = str(voter_count + voter_index)
                 asp_program += f"voter({voter}).\n"
                 # Register how they voted for each issue.
-                for label in scenario.agenda:
-                    if scenario.agenda[label] in coalition[1]:
+                for pos, label in enumerate(scenario.agenda):
+                    if (coalition[1] >> (scenario.num_issues - 1 - pos)) & 1:
                         asp_program += f"js({voter},l{label}).\n"
                     else:
                         asp_program += f"js({voter},-l{label}).\n"
             voter_count += coalition[0]
+        return asp_program
+
+    def program(self, scenario, rule, lamb, voters, grouped=False, stats=None):
+        """ADDED (split off from all_outcomes). The ASP program of rule for scenario,
+        with the voters part voters (see profile_facts and ASPSession); if grouped the 
+        encodings for coalitions are used. Sets self.opt and self.num_variables. The
+        times of building (and CNF translation) are added to stats (if not None)."""
+        time0 = time.time()
+        time_cnf = 0.0
+        # Make sure that Solver is not in optimisation mode
+        self.opt = False
+        # ADDED. Lambda of the log-utility rules (exact selection, see solve_outcomes).
+        self.log_lamb = None
+
+        # Add the scenario to the asp_program using the scenario argument.
+        asp_program = textwrap.dedent("""% We first add the scenario to our ASP program.
+        """)
+
+        # Adding issues.
+        asp_program += textwrap.dedent("""
+        % Adding the labels that represent the issues.
+        """)
+        for key in scenario.agenda:
+            asp_program += f"issue(l{key}).\n"
+
+        # Adding voters (and their judgements).
+        asp_program += voters
 
-        # Adding input constraints.
-        asp_program += "\n% Declare input constraints (in CNF)\n"
-        total_input_constraints = ""
-
-        # Compound separate constraints into one.
-        for conjunct in scenario.input_constraints:
-            total_input_constraints += f"{conjunct} & "
-
-        # Add auxiliary input constraints that guarantee that labels
-        # correspond to the right formulas.
-        for constraint in parser.translate_agenda(scenario.agenda):
-            total_input_constraints += f"({constraint}) & "
-        total_ic = total_input_constraints[:-3]
-
-        # Translate the constraint to CNF.
-        cnf_object = parser.to_cnf(total_ic, all_variables)
-        ic_cnf = cnf_object[0]
-        all_variables = all_variables.union(cnf_object[1])
-
-        # Adding the input constraint clauses to the program.
-        conjuncts = ("".join(ic_cnf.split())).split("&")
-        clause_number = 1
-        for clause in conjuncts:
-            prep_clause = "".join(clause.split("("))
-            prep_clause = "".join(prep_clause.split(")"))
-            conjunct = prep_clause.split("|")
-            for string in conjunct:
-                if string[0] == "(":
-                    formula = string[1:]
-                elif string[-1] == ")":
-                    formula = string[:-1]
-                else:
-                    formula = string
-                if formula[0] == "~":
-                    asp_program += f'inputClause({clause_number}, -{formula[1:]}).\n'
-                else:
-                    asp_program += f'inputClause({clause_number}, {formula}).\n'
-            clause_number += 1
-
-        # Adding output constraints.
-        asp_program += "\n% Declare output constraints (in CNF)\n"
-        total_output_contstraints = ""
-
-        # Compound separate constraints into one.
-        for conjunct in scenario.output_constraints:
-            total_output_contstraints += f"{conjunct} & "
-
-        # Add auxiliary input constraints that guarantee
-        # that labels correspond to the right formulas.
-        for constraint in parser.translate_agenda(scenario.agenda):
-            total_output_contstraints += f"({constraint}) & "
-        total_oc = total_output_contstraints[:-3]
-
-        # Translate the constraint to CNF.
-        cnf_object = parser.to_cnf(total_oc, all_variables)
-        oc_cnf = cnf_object[0]
-        all_variables = all_variables.union(cnf_object[1])
-
-        # Adding the output constraint clauses to the program.
-        conjuncts = ("".join(oc_cnf.split())).split("&")
-        clause_number = 1
-        for clause in conjuncts:
-            prep_clause = "".join(clause.split("("))
-            prep_clause = "".join(prep_clause.split(")"))
-            conjunct = prep_clause.split("|")
-            for string in conjunct:
-                if string[0] == "(":
-                    formula = string[1:]
-                elif string[-1] == ")":
-                    formula = string[:-1]
-                else:
-                    formula = string
-                if formula[0] == "~":
-                    asp_program += f'outputClause({clause_number}, -{formula[1:]}).\n'
-                else:
-                    asp_program += f'outputClause({clause_number}, {formula}).\n'
-            clause_number += 1
-
-        # Declare variables.
-        asp_program += '\n'
-        for variable in all_variables:
-            asp_program += f'variable({variable}).\n'
+        # Adding the input and output constraints (in CNF) and the variables.
+        # Modified: computed once per scenario (see Scenario.compute_asp_facts).
+        if scenario.asp_facts is None:
+            time_cnf = time.time()
+            scenario.compute_asp_facts()
+            time_cnf = time.time() - time_cnf
+        asp_program += scenario.asp_facts
 
         # Add the consistency checks for the input and output constraints.
         # ja.py from JA-ASP (modified)
@@ -201,91 +215,207 @@ class ASPSolver(Solver):
         outcome(X) :- agent(col), js(col,X), ilit(X).
         #show outcome/1.
         """)
-        t1=time.time()
 
         # Add the ASP code corresponding to the rule that is to be executed.
         # Add the ASP code corresponding to the rule that is to be executed.
         if rule == "kemeny":
             self.opt = True
-            asp_program += textwrap.dedent(asp_rules.kemeny())
+            asp_program += textwrap.dedent(asp_rules.kemeny_grouped() if grouped else asp_rules.kemeny())
+
+        elif rule == "kemeny-support":
+            self.opt = True
+            asp_program += textwrap.dedent(asp_rules.kemeny_support_grouped() if grouped else asp_rules.kemeny_support())
 
         elif rule == "kemnash":
             if lamb > 0:
                 warnings.warn("For nonzero values of \u03BB for use parameterised Kemeny-Nash rule, now \u03BB is set to 0.")
             self.opt = True
             self.opt = True
-            asp_program += textwrap.dedent(asp_rules.kemnash(0))
+            asp_program += textwrap.dedent(asp_rules.kemnash_grouped(0) if grouped else asp_rules.kemnash(0))
 
         elif rule == "lamb-kemnash":
             self.opt = True
-            asp_program += textwrap.dedent(asp_rules.kemnash(lamb))
+            asp_program += textwrap.dedent(asp_rules.kemnash_grouped(lamb) if grouped else asp_rules.kemnash(lamb))
 
         elif rule == "kemeny-sat":
             self.opt = False
-            asp_program += textwrap.dedent(asp_rules.kemeny_sat())
+            asp_program += textwrap.dedent(asp_rules.kemeny_sat_grouped() if grouped else asp_rules.kemeny_sat())
 
         elif rule == "kemnash-sat":
             self.opt = False
             if lamb > 0:
                 warnings.warn("For nonzero values of \u03BB, use "\
                     "parameterised Kemeny-Nash rule. Now \u03BB is set to 0.")
-            asp_program += textwrap.dedent(asp_rules.kemnash_sat(0))
+            asp_program += textwrap.dedent(asp_rules.kemnash_sat_grouped(0) if grouped else asp_rules.kemnash_sat(0))
 
         elif rule == "lamb-kemnash-sat":
             self.opt = False
-            asp_program += textwrap.dedent(asp_rules.kemnash_sat(lamb))
+            asp_program += textwrap.dedent(asp_rules.kemnash_sat_grouped(lamb) if grouped else asp_rules.kemnash_sat(lamb))
+
+        elif rule in ["kemnash-log", "lamb-kemnash-log"]:
+            self.opt = True
+            if rule == "kemnash-log" and lamb > 0:
+                warnings.warn("For nonzero values of \u03BB, use "\
+                    "parameterised Kemeny-Nash rule. Now \u03BB is set to 0.")
+            self.log_lamb = lamb if rule == "lamb-kemnash-log" else 0
+            asp_program += textwrap.dedent(asp_rules.kemnash_log_grouped(self.log_lamb, scenario.num_issues) 
+                if grouped else asp_rules.kemnash_log(self.log_lamb, scenario.num_issues))
 
         elif rule == "kemeny-original":
             self.opt = True
-            asp_program += textwrap.dedent(asp_rules.kemeny_original())
+            asp_program += textwrap.dedent(asp_rules.kemeny_original_grouped() if grouped else asp_rules.kemeny_original())
 
         elif rule == "kemeny-original-sat":
             self.opt = False
-            asp_program += textwrap.dedent(asp_rules.kemeny_original_sat())
+            asp_program += textwrap.dedent(asp_rules.kemeny_original_sat_grouped() if grouped else asp_rules.kemeny_original_sat())
 
         else:
             raise Exception (f"{rule} is not a recognized aggregation rule.")
 
-        t2 = time.time()
-        print(asp_program)
-
-        # Ground and solve the program.
-        control = clingo.Control(arguments=["--project"])
-        control.add("base", [], asp_program)
-        t3 = time.time()
-        print('t3-t2', t3-t2)
-        print('t3-t0', t3-t0)
-        control.ground([("base", [])])
-        control.configuration.solve.models = 0
-        if self.opt:
-            control.configuration.solve.opt_mode = "optN"
-
-        # Yield the results of the program.
-        outcomes = []
-        with control.solve(yield_=True) as handle:
-            for m in handle:
-                if self.opt:
-                    if m.optimality_proven:
-                        outcome =[str(atom)[8:-1] for atom in m.symbols(atoms=True) 
-                            if str(atom)[:7] == 'outcome']
-                        outcome_dict = {}
-                        for label in scenario.agenda:
-                            outcome_dict[scenario.agenda[label]] = False
-                            if "l"+str(label) in outcome:
-                                outcome_dict[scenario.agenda[label]] = True
-                        outcomes.append(outcome_dict)
-                else:
-                    outcome =[str(atom)[8:-1] for atom in m.symbols(atoms=True) 
-                        if str(atom)[:7] == 'outcome']
-                    outcome_dict = {}
-                    for label in scenario.agenda:
-                        outcome_dict[scenario.agenda[label]] = False
-                        if "l"+str(label) in outcome:
-                            outcome_dict[scenario.agenda[label]] = True
-                    outcomes.append(outcome_dict)
-        outcomes = [dict(t) for t in {tuple(outcome.items()) for outcome in outcomes}]
-        if self.binrep:
-            outcomes = [utils.jdict_to_bin(d) for d in outcomes]
-        t4= time.time()
-        print('t4-t0',t4-t0)
-        return outcomes
\ No newline at end of file
+        self.num_variables = scenario.asp_num_variables
+        if stats is not None:
+            stats['time_cnf'] += time_cnf
+            stats['time_build'] += time.time() - time0 - time_cnf
+        return asp_program
+
+
+class ASPSession():
+    """ADDED. A multi-shot clingo session for a scenario, rule and number of voters:
+    the program is grounded once, with judgements vote(V,X) of voter V on issue
+    literal X as external atoms, and every profile is solved by assigning these
+    (only the changed ones). The votes of all possible profiles are grounded; for 
+    the Kemeny-Nash rules the products of agreements are then only bounded by the 
+    largest possible product, if this may not fit in a (32-bit) clingo integer 
+    fits is False and the session should not be used. The statistics of building and
+    grounding the program are added to stats (if not None)."""
+
+    def __init__(self, solver, scenario, rule, lamb, number_voters, stats=None):
+        self.scenario = scenario
+        voters = textwrap.dedent(f"""
+        % Adding voters, their judgements are set by the externals vote/2.
+        voter(1..{number_voters}).
+        #external vote(V,X) : voter(V), ilit(X).
+        :- voter(V), ilit(X), js(V,X), not vote(V,X).
+        """)
+        asp_program = solver.program(scenario, rule, lamb, voters, stats=stats)
+        self.opt = solver.opt
+        self.log_lamb = solver.log_lamb
+        self.fits = True
+        if 'kemnash' in rule and self.log_lamb is None:
+            lamb_num, lamb_den = (Fraction(lamb).limit_denominator()).as_integer_ratio()
+            factor = max(lamb_num, lamb_den * scenario.num_issues, solver.num_variables + 1)
+            self.fits = factor ** number_voters < 2**31
+        if not self.fits:
+            return
+        if solver.print_asp:
+            print(asp_program)
+        self.control = ground_program(asp_program, stats)
+        # Externals of voter (index) and issue (position): (vote(V,l), vote(V,-l)).
+        self.externals = [[(clingo.Function('vote', [clingo.Number(voter), clingo.Function(f'l{label}')]),
+            clingo.Function('vote', [clingo.Number(voter), clingo.Function(f'l{label}', [], False)]))
+            for label in scenario.agenda] for voter in range(1, number_voters + 1)]
+        self.votes = [None] * number_voters
+
+    def solve(self, profile, stats=None):
+        """Sorted outcomes (bitmasks) of profile (a list of [count, mask]); the statistics
+        are added to stats (if not None)."""
+        time0 = time.time()
+        voter = 0
+        for count, mask in profile:
+            for _ in range(count):
+                if self.votes[voter] != mask:
+                    for pos, (accept, reject) in enumerate(self.externals[voter]):
+                        value = bool((mask >> (self.scenario.num_issues - 1 - pos)) & 1)
+                        self.control.assign_external(accept, value)
+                        self.control.assign_external(reject, not value)
+                    self.votes[voter] = mask
+                voter += 1
+        if stats is not None:
+            stats['time_assign'] += time.time() - time0
+        return solve_outcomes(self.control, self.scenario, self.opt, self.log_lamb, stats)
+
+
+def ground_program(asp_program, stats=None):
+    """ADDED (split off from ASPSolver.all_outcomes). A control with asp_program added
+    and grounded; the times are added to stats (if not None)."""
+    time0 = time.time()
+    control = clingo.Control(arguments=["--project"])
+    control.add("base", [], asp_program)
+    time1 = time.time()
+    control.ground([("base", [])])
+    if stats is not None:
+        stats['time_add'] += time1 - time0
+        stats['time_ground'] += time.time() - time1
+    return control
+
+def add_search_stats(control, stats):
+    """ADDED. Adds the choices and conflicts of the last solve of control to stats."""
+    solvers = control.statistics['solving']['solvers']
+    stats['choices'] += int(solvers['choices'])
+    stats['conflicts'] += int(solvers['conflicts'])
+
+
+def solve_outcomes(control, scenario, opt, log_lamb=None, stats=None):
+    """ADDED (split off from ASPSolver.all_outcomes). Solves the grounded control and
+    returns the sorted outcomes (bitmasks); if opt only optimal models are outcomes.
+    If log_lamb is not None (log-utility rules, see asp_rules.kemnash_log) all 
+    outcomes within the rounding error of the optimum are enumerated, and those with
+    maximal exact lambda Kemeny-Nash score are returned. The times of solving and
+    of reading the models (extract), and the search statistics are added to stats
+    (if not None)."""
+    time0 = time.time()
+    control.configuration.solve.models = 0
+    if log_lamb is not None:
+        # Optimal costs; the rounding error of the sum of logarithms is at most 1/2 
+        # per voter (unit 1/asp_rules.LOG_PRECISION).
+        costs = []
+        control.configuration.solve.opt_mode = "optN"
+        control.solve(on_model=lambda m: costs.append(m.cost))
+        if stats is not None:
+            stats['time_solve'] += time.time() - time0
+            add_search_stats(control, stats)
+        slack = sum(coalition[0] for coalition in scenario.profile) + 1
+        bound = costs[-1][:-1] + [costs[-1][-1] + slack]
+        control.configuration.solve.opt_mode = "enum," + ",".join(map(str, bound))
+        return exact_kemnash(scenario, solve_outcomes(control, scenario, False, stats=stats), log_lamb)
+    if opt:
+        control.configuration.solve.opt_mode = "optN"
+
+    # Yield the results of the program.
+    # Modified: only the shown atoms outcome(X) are read (not all atoms as strings).
+    bits = {f'l{label}': 1 << (scenario.num_issues - 1 - pos) for pos, label in enumerate(scenario.agenda)}
+    outcomes = []
+    time_extract = 0.0
+    with control.solve(yield_=True) as handle:
+        for m in handle:
+            if opt and not m.optimality_proven:
+                continue
+            time1 = time.time()
+            outcome_mask = 0
+            for atom in m.symbols(shown=True):
+                literal = atom.arguments[0]
+                if literal.positive:
+                    outcome_mask |= bits[literal.name]
+            outcomes.append(outcome_mask)
+            time_extract += time.time() - time1
+    if stats is not None:
+        stats['time_extract'] += time_extract
+        stats['time_solve'] += time.time() - time0 - time_extract
+        add_search_stats(control, stats)
+    return sorted(set(outcomes))
+
+def exact_kemnash(scenario, outcomes, lamb):
+    """ADDED. The outcomes (bitmasks) with maximal lambda Kemeny-Nash score (the product
+    of the lambda agreements) for scenario.profile, computed exactly (with Python 
+    integers)."""
+    lamb_num, lamb_den = (Fraction(lamb).limit_denominator()).as_integer_ratio()
+
+    def score(outcome):
+        product = 1
+        for count, mask in scenario.profile:
+            agr = utils.agr_masks(mask, outcome, scenario.num_issues)
+            product *= (agr * lamb_den if agr > 0 else lamb_num) ** count
+        return product
+    scores = {outcome: score(outcome) for outcome in outcomes}
+    best = max(scores.values())
+    return sorted(outcome for outcome, value in scores.items() if value == best)
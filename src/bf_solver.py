@@ -4,21 +4,21 @@
 ## to .src.classes
 #####################################################################
 
-import copy, math, warnings, time
-from itertools import combinations
-from nnf import Var, Or, And # pylint: disable=unused-import
+import math, warnings
+import numpy as np
 from .classes import Solver
-from .parser import Parser
 import src.utils as utils
 
 class BFSolver(Solver):
     """A brute force solver for Judgment Aggregation."""
-    def __init__(self, binrep=False, idx_rep=False):
+    def __init__(self, binrep=False, idx_rep=False, maskrep=False):
         self.binrep = binrep
         self.idx_rep = idx_rep
+        self.maskrep = maskrep
         self.idxs = 0
+        self.scores = None
 
-    def all_outcomes(self, scenario, rule, lamb=0):
+    def all_outcomes(self, scenario, rule, lamb=0, counts=None):
         """Given a scenario object and the name of a rule
         this function will yield a list with all the outcomes
         of the judgment aggregation. The rule should be given
@@ -29,40 +29,97 @@ class BFSolver(Solver):
             - kemeny-original (Kemeny from JAGGPY)
         The utility of a player with judgment J_i when outcome is J is calculated
         as U_i = agr(J_i,J)+lamb.
+        The profile can be passed as counts over scenario.in_consistent (see
+        Scenario.profile_counts); if None it is computed from scenario.profile.
+        Outcomes are judgement dictionaries, unless binrep (bin strings) or 
+        maskrep (bitmasks, the internal representation) is set.
         """
         self.idxs = 0
+        if counts is None and rule != "kemeny-original":
+            counts = scenario.profile_counts()
         # We determine the outcome with a helper function for corresponding rule.
         # Kemeny rule.
         if rule == "kemeny":
-            outcomes = self.solve_kemeny(scenario)
+            outcomes = self.solve_kemeny(scenario, counts)
         # Kemeny-Nash rule.
         elif rule == "kemnash":
             if lamb > 0:
                 warnings.warn("For nonzero values of \u03BB for use parameterised Kemeny-Nash rule, now \u03BB is set to 0.")
-            outcomes = self.solve_kemnash(scenario, 0)
+            outcomes = self.solve_kemnash(scenario, counts, 0)
         # Parameterised Kemeny-Nash rule.
         elif rule == "lamb-kemnash":
-            outcomes = self.solve_kemnash(scenario, lamb)
+            outcomes = self.solve_kemnash(scenario, counts, lamb)
         # Original Kemeny rule implementation from JAGGPY package.
         elif rule == "kemeny-original":
             outcomes = self.solve_kemeny_original(scenario)
         elif rule == "maxham":
-            outcomes = self.solve_maxham(scenario)
+            outcomes = self.solve_maxham(scenario, counts)
         elif rule == "maxeq":
-            outcomes = self.solve_maxeq(scenario)
+            outcomes = self.solve_maxeq(scenario, counts)
         elif rule == "all_rules":
-            outcomes = self.solve_all(scenario, lamb)
+            outcomes = self.solve_all(scenario, counts, lamb)
         else:
             raise Exception (f"{rule} is not a recognized aggregation rule.")
         if self.binrep:
             if rule == "all_rules":
-                return [[utils.jdict_to_bin(out) for out in out_sing] for out_sing in outcomes]
+                return [[utils.mask_to_bin(out, scenario.num_issues) for out in out_sing] for out_sing in outcomes]
             else:
-                return [utils.jdict_to_bin(d) for d in outcomes]
+                return [utils.mask_to_bin(d, scenario.num_issues) for d in outcomes]
+        if not self.maskrep:
+            if rule == "all_rules":
+                outcomes = [[utils.mask_to_jdict(scenario, out) for out in out_sing] for out_sing in outcomes]
+            else:
+                outcomes = [utils.mask_to_jdict(scenario, d) for d in outcomes]
         if self.idx_rep:
             return self.idxs, outcomes
         return outcomes
 
+    def all_outcomes_batch(self, scenario, rule, lamb=0, counts=None):
+        """ADDED. As all_outcomes, for a block of profiles at once: counts is an array
+        with a row of counts over scenario.in_consistent for every profile. The scores
+        of the whole block are computed with matrix operations (see batch_scores).
+        Rules: kemeny, kemnash, lamb-kemnash, maxham, maxeq and all_rules. Returns a
+        list with the outcomes of every profile; self.idxs is the list of their indices
+        (and is returned as well if idx_rep)."""
+        if rule == "kemeny":
+            agr_sums = counts @ scenario.agr_table
+            self.idxs = batch_argmax(agr_sums)
+        elif rule == "kemnash":
+            if lamb > 0:
+                warnings.warn("For nonzero values of \u03BB for use parameterised Kemeny-Nash rule, now \u03BB is set to 0.")
+            self.idxs = self.kemnash_idxs_batch(scenario, counts, 0)
+        elif rule == "lamb-kemnash":
+            self.idxs = self.kemnash_idxs_batch(scenario, counts, lamb)
+        elif rule == "maxham":
+            _, agr_mins, _ = self.batch_scores(scenario, counts)
+            self.idxs = batch_argmax(agr_mins)
+        elif rule == "maxeq":
+            _, _, agr_maxDists = self.batch_scores(scenario, counts)
+            self.idxs = batch_argmax(-agr_maxDists)
+        elif rule == "all_rules":
+            self.idxs = [[idxs_kem, idxs_kns[0], idxs_maxham, idxs_maxeq] for idxs_kem, idxs_kns,
+                idxs_maxham, idxs_maxeq in self.solve_all_lambs_batch(scenario, counts, [lamb])]
+        else:
+            raise Exception (f"{rule} is not a recognized aggregation rule for a batch of profiles.")
+        # Outcomes of every profile, converted as in all_outcomes.
+        if rule == "all_rules":
+            convert = lambda outs: [self.batch_convert(scenario, out_sing) for out_sing in outs]
+        else:
+            convert = lambda outs: self.batch_convert(scenario, outs)
+        outcomes = [convert(idxs) for idxs in self.idxs]
+        if self.idx_rep:
+            return self.idxs, outcomes
+        return outcomes
+
+    def batch_convert(self, scenario, idxs:list):
+        """ADDED. Outcomes with indices idxs, as bin strings (binrep), bitmasks (maskrep)
+        or judgement dictionaries."""
+        if self.binrep:
+            return [utils.mask_to_bin(scenario.out_consistent[idx], scenario.num_issues) for idx in idxs]
+        if not self.maskrep:
+            return [utils.mask_to_jdict(scenario, scenario.out_consistent[idx]) for idx in idxs]
+        return [scenario.out_consistent[idx] for idx in idxs]
+
     def support_number(self, agenda, profile):
         """The function support_number gets an agenda and profile and returns a dictionary, 
         containing label,occurence pairs.
@@ -72,77 +129,144 @@ class BFSolver(Solver):
             support_count[formula] = 0
         for judgement_set in profile:
             times_accepted = judgement_set[0]
-            accepted_formula = judgement_set[1]
-            for formula in accepted_formula:
-                support_count[formula] += times_accepted
+            mask = judgement_set[1]
+            for pos, formula in enumerate(agenda.values()):
+                if (mask >> (len(agenda) - 1 - pos)) & 1:
+                    support_count[formula] += times_accepted
         return support_count
 
-    def agr(self, scenario, outcome:dict, lamb=0):
-        """ADDED. The function gets an agenda and profile (j1, ..., jn), and jdict J 
+    def agr(self, scenario, outcome:int, lamb=0):
+        """ADDED. The function gets an agenda and profile (j1, ..., jn), and mask J 
         (i.e., canditate [clean] outcome. It computes a list 
         agr_vec=[j_1\cap J + lamb,..., jn \cap J + lamb]) """
-        agr_vec = []
-        for js_pair in scenario.profile:
-            score = 0
-            times_occur = js_pair[0]
-            js = js_pair[1]
-            for formula in scenario.agenda.values():
-                if formula in js and outcome[formula]==True:
-                    score += 1
-                elif formula not in js and outcome[formula]==False:
-                    score += 1
-            if score == 0:
-                score = lamb
-            agr_vec.extend([score] * times_occur)
-        return agr_vec
-
-    def solve_kemeny(self, scenario):
-        """New implementation based on list comprehension. Effect on performance is 
-        neglectable."""
-        agr_vecs = [self.agr(scenario, outcome) for outcome in scenario.out_consistent]
-        # agr_sums = [reduce((lambda x,y: x+y), agr_vec) for agr_vec in agr_vecs]
-        agr_sums = [sum(agr_vec) for agr_vec in agr_vecs]
-        self.idxs = [idx for idx,agr in enumerate(agr_sums) if agr == max(agr_sums)]
+        return utils.agr(scenario, outcome, lamb)
+
+    def agr_hist(self, scenario, outcome:int, counts=None):
+        """ADDED. Histogram of agreements with mask outcome (see utils.agr_hist)."""
+        return utils.agr_hist(scenario, outcome, counts)
+
+    def kemnash_idxs(self, scenario, counts, lamb=0, tol=1e-9):
+        """ADDED. Indices of the outcomes maximising the product of agreements (zero 
+        agreement is replaced by lamb, taken exactly as utils.lamb_fraction). Products 
+        are compared as sums count * log(agreement) over the judgements of the profile;
+        only outcomes within tol (relative) of the maximum are compared exactly."""
+        lamb = utils.lamb_fraction(lamb)
+        zeros = counts @ scenario.zero_agr_table
+        log_prods = counts @ scenario.log_agr_table
+        if lamb == 0:
+            # If every outcome has a judge with zero agreement, all products are zero.
+            if zeros.min() > 0:
+                return list(range(len(zeros)))
+            cands = np.flatnonzero(zeros == 0)
+        else:
+            cands = np.arange(len(log_prods))
+            log_prods = log_prods + zeros * math.log(lamb)
+        log_prods = log_prods[cands]
+        max_log = log_prods.max()
+        cands = cands[log_prods >= max_log - tol * max(1, abs(max_log))]
+        if len(cands) == 1:
+            return cands.tolist()
+        # Exact products (integers or Fractions) of the remaining candidates.
+        exact_prods = [utils.hist_prod(utils.agr_hist_idx(scenario, idx, counts), lamb) for idx in cands]
+        max_prod = max(exact_prods)
+        return [int(idx) for idx, prod in zip(cands, exact_prods) if prod == max_prod]
+
+    def solve_kemeny(self, scenario, counts):
+        """Agreement sums are a single vector-matrix product with the agreement table."""
+        agr_sums = counts @ scenario.agr_table
+        self.idxs = np.flatnonzero(agr_sums == agr_sums.max()).tolist()
         return [scenario.out_consistent[idx] for idx in self.idxs]
 
-    def solve_kemnash(self, scenario, lamb=0):
-        """New implementation based on list comprehension. Effect on performance is 
-        neglectable."""
-        agr_vecs = [self.agr(scenario, outcome, lamb) for outcome in scenario.out_consistent]
-        agr_prods = [math.prod(agr_vec) for agr_vec in agr_vecs]
-        self.idxs = [idx for idx,agr in enumerate(agr_prods) if agr == max(agr_prods)]
+    def solve_kemnash(self, scenario, counts, lamb=0):
+        """Log-domain scores with exact tie resolution (see kemnash_idxs)."""
+        self.idxs = self.kemnash_idxs(scenario, counts, lamb)
         return [scenario.out_consistent[idx] for idx in self.idxs]
 
-    def solve_maxham(self, scenario):
+    def solve_maxham(self, scenario, counts):
         """Maximises the minimum agreement."""
-        agr_vecs = [self.agr(scenario, outcome) for outcome in scenario.out_consistent]
-        agr_mins = [min(agr_vec) for agr_vec in agr_vecs]
-        self.idxs = [idx for idx,agr in enumerate(agr_mins) if agr == max(agr_mins)]
+        agr_mins = scenario.agr_table[counts > 0].min(axis=0)
+        self.idxs = np.flatnonzero(agr_mins == agr_mins.max()).tolist()
         return [scenario.out_consistent[idx] for idx in self.idxs]
 
-    def solve_maxeq(self, scenario):
+    def solve_maxeq(self, scenario, counts):
         """Minimises the maximum distance."""
-        agr_vecs = [self.agr(scenario, outcome) for outcome in scenario.out_consistent]
-        agr_maxDists = [ (max(agr_vec) - min(agr_vec)) for agr_vec in agr_vecs]
-        self.idxs = [idx for idx,agr in enumerate(agr_maxDists) if agr == min(agr_maxDists)]
+        agr_present = scenario.agr_table[counts > 0]
+        agr_maxDists = agr_present.max(axis=0) - agr_present.min(axis=0)
+        self.idxs = np.flatnonzero(agr_maxDists == agr_maxDists.min()).tolist()
         return [scenario.out_consistent[idx] for idx in self.idxs]
 
-    def solve_all(self, scenario, lamb):
-        agr_vecs = [self.agr(scenario, outcome) for outcome in scenario.out_consistent]
-        agr_vecs_lamb = [self.agr(scenario, outcome, lamb) for outcome in scenario.out_consistent]
+    def solve_all(self, scenario, counts, lamb):
+        agr_present = scenario.agr_table[counts > 0]
         # Manipulation on agreement vectors.
-        agr_sums = [sum(agr_vec) for agr_vec in agr_vecs]
-        agr_prods = [math.prod(agr_vec) for agr_vec in agr_vecs_lamb]
-        agr_mins = [min(agr_vec) for agr_vec in agr_vecs]
-        agr_maxDists = [ (max(agr_vecs[out_idx]) - agr_mins[out_idx]) for out_idx in range(len(agr_vecs))]
+        agr_sums = counts @ scenario.agr_table
+        agr_mins = agr_present.min(axis=0)
+        agr_maxDists = agr_present.max(axis=0) - agr_mins
         # Computing different optima.
-        idxs_kem = [idx for idx,agr in enumerate(agr_sums) if agr == max(agr_sums)]
-        idxs_kn = [idx for idx,agr in enumerate(agr_prods) if agr == max(agr_prods)]
-        idxs_maxham = [idx for idx,agr in enumerate(agr_mins) if agr == max(agr_mins)]
-        idxs_maxeq = [idx for idx,agr in enumerate(agr_maxDists) if agr == min(agr_maxDists)]
+        idxs_kem = np.flatnonzero(agr_sums == agr_sums.max()).tolist()
+        idxs_kn = self.kemnash_idxs(scenario, counts, lamb)
+        idxs_maxham = np.flatnonzero(agr_mins == agr_mins.max()).tolist()
+        idxs_maxeq = np.flatnonzero(agr_maxDists == agr_maxDists.min()).tolist()
         self.idxs = [idxs_kem, idxs_kn, idxs_maxham, idxs_maxeq]
         return [[scenario.out_consistent[idx] for idx in idxs_opt] for idxs_opt in self.idxs]
 
+    def solve_all_lambs(self, scenario, counts, lambs:list):
+        """ADDED. As solve_all, for several values of lambda at once. The agreement
+        sums and the Kemeny, MaxHam and MaxEq optima are computed once. Returns the
+        indices [idxs_kem, [idxs_kn for every lamb], idxs_maxham, idxs_maxeq]."""
+        agr_present = scenario.agr_table[counts > 0]
+        agr_sums = counts @ scenario.agr_table
+        agr_mins = agr_present.min(axis=0)
+        agr_maxDists = agr_present.max(axis=0) - agr_mins
+        idxs_kem = np.flatnonzero(agr_sums == agr_sums.max()).tolist()
+        idxs_kns = [self.kemnash_idxs(scenario, counts, lamb) for lamb in lambs]
+        idxs_maxham = np.flatnonzero(agr_mins == agr_mins.max()).tolist()
+        idxs_maxeq = np.flatnonzero(agr_maxDists == agr_maxDists.min()).tolist()
+        self.idxs = [idxs_kem, idxs_kns, idxs_maxham, idxs_maxeq]
+        return self.idxs
+
+    def batch_scores(self, scenario, counts):
+        """ADDED. For a batch of profiles (rows of counts): the agreement sums, minimal
+        agreements and spreads (max - min agreement) of every outcome, as arrays
+        (profiles x outcomes)."""
+        present = (counts > 0)[:, :, None]
+        agr_mins = np.where(present, scenario.agr_table, scenario.num_issues + 1).min(axis=1)
+        agr_maxs = np.where(present, scenario.agr_table, -1).max(axis=1)
+        return counts @ scenario.agr_table, agr_mins, agr_maxs - agr_mins
+
+    def kemnash_idxs_batch(self, scenario, counts, lamb=0, tol=1e-9):
+        """ADDED. kemnash_idxs for a batch of profiles (rows of counts): the log-products
+        of all profiles are computed at once, only profiles with near ties are
+        compared exactly (by kemnash_idxs)."""
+        frac = utils.lamb_fraction(lamb)
+        zeros = counts @ scenario.zero_agr_table
+        log_prods = counts @ scenario.log_agr_table
+        if frac == 0:
+            log_prods = np.where(zeros == 0, log_prods, -np.inf)
+        else:
+            log_prods = log_prods + zeros * math.log(frac)
+        max_logs = log_prods.max(axis=1, keepdims=True)
+        # Rows where every product is 0 (lamb = 0) are all near, hence exact.
+        near = log_prods >= max_logs - tol * np.maximum(1, np.abs(max_logs))
+        idxs = []
+        for row, near_row in zip(counts, near):
+            cands = np.flatnonzero(near_row)
+            idxs.append(cands.tolist() if len(cands) == 1 else self.kemnash_idxs(scenario, row, lamb, tol))
+        return idxs
+
+    def solve_all_lambs_batch(self, scenario, counts, lambs:list):
+        """ADDED. solve_all_lambs for a batch of profiles (rows of counts) at once. Returns
+        a list with for every profile [idxs_kem, [idxs_kn for every lamb], idxs_maxham,
+        idxs_maxeq]; the arrays of batch_scores are kept in self.scores."""
+        self.scores = self.batch_scores(scenario, counts)
+        agr_sums, agr_mins, agr_maxDists = self.scores
+        idxs_kems = batch_argmax(agr_sums)
+        idxs_kns = [self.kemnash_idxs_batch(scenario, counts, lamb) for lamb in lambs]
+        idxs_maxhams = batch_argmax(agr_mins)
+        idxs_maxeqs = batch_argmax(-agr_maxDists)
+        self.idxs = [[idxs_kems[row], [idxs_kn[row] for idxs_kn in idxs_kns], idxs_maxhams[row], 
+            idxs_maxeqs[row]] for row in range(len(counts))]
+        return self.idxs
+
     def solve_kemeny_original(self, scenario):
         """Slightly modified to be compatible with implementation."""
         # Keep track of the maximum agreement score and initiate list of outcomes.
@@ -153,9 +277,9 @@ class BFSolver(Solver):
             agreement_score = 0
             # For each formula in the pre-agenda, check how many agents agree
             # with the outcome and update agreement score.
-            for issue in outcome.keys():
+            for pos, issue in enumerate(scenario.agenda.values()):
                 support = self.support_number(scenario.agenda, scenario.profile)
-                if outcome[issue]:
+                if (outcome >> (scenario.num_issues - 1 - pos)) & 1:
                     agreement_score += support[issue]
                 else:
                     agreement_score += scenario.number_voters - support[issue]
@@ -165,4 +289,9 @@ class BFSolver(Solver):
                 max_agreement = agreement_score
                 outcomes = [outcome]
         return outcomes
-    
+
+
+def batch_argmax(scores):
+    """ADDED. For every row of scores the (list of) indices of its maxima."""
+    rows, idxs = np.nonzero(scores == scores.max(axis=1, keepdims=True))
+    return [part.tolist() for part in np.split(idxs, np.flatnonzero(np.diff(rows)) + 1)]
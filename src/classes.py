@@ -9,11 +9,19 @@
 
 from abc import ABC, abstractmethod
 from itertools import islice
-from nnf import Var, Or, And  # pylint: disable=unused-import
-from .parser import Parser 
+from collections import Counter
+import numpy as np
 import src.utils as utils
-import time
+import src.models as models
+import os, json, hashlib
 
+# ADDED. Version of the compiled scenarios in the cache (see Scenario.load_cache);
+# to be increased when compile_lines changes.
+CACHE_VERSION = 2
+
+def cache_key(text):
+    """ADDED. Key of the compiled scenario of a .jagg file with contents text."""
+    return hashlib.sha256(f'{CACHE_VERSION}\n{np.__version__}\n{text}'.encode('utf-8')).hexdigest()
 
 
 class Scenario:
@@ -23,8 +31,9 @@ class Scenario:
                 formulas as values
             - input_constraints: a list of input constraints
             - output_constraints: a list of output constraints
-            - profile: a list of judgment sets
+            - profile: a list of (times selected, judgment) pairs
             - number_voters: an integer specifying the number of voters
+            Judgments are bitmasks over the agenda (see utils.jdict_to_mask).
             """
     def __init__(self):
         """A Scenario object has the following properties:
@@ -33,10 +42,14 @@ class Scenario:
                 formulas as values
             - input_constraints: a list of input constraints
             - output_constraints: a list of output constraints
-            - profile: a list of judgment sets
+            - profile: a list of (times selected, judgment) pairs
             - number_voters: an integer specifying the number of voters
-            - in_consistent: list with all rational judgement dictionaries
-            - out_consistent: list with all feasible judgement dictionaries.
+            - num_issues: the number of issues in the agenda
+            - in_consistent: sorted list with all rational judgements (bitmasks)
+            - out_consistent: sorted list with all feasible judgements (bitmasks).
+            - agr_table: array with agreement between every rational (row) and
+                every feasible (column) judgement.
+            - asp_facts: the constraints in CNF as ASP facts (see compute_asp_facts).
             """
         self.agenda = {}
         self.variables = []
@@ -44,12 +57,18 @@ class Scenario:
         self.output_constraints = []
         self.profile = []
         self.number_voters = 0
+        self.num_issues = 0
         # Added attributes (to prevent recomputation in profile iteration)
-        self.in_consistent = {}
-        self.out_consistent = {}
+        self.in_consistent = []
+        self.out_consistent = []
         self.num_profs = 0
+        self.in_index = {}
+        self.out_index = {}
+        self.agr_table = None
+        self.asp_facts = None
+        self.asp_num_variables = 0
 
-    def load_from_file(self, path, num_voters=None):
+    def load_from_file(self, path, num_voters=None, cache_dir=None):
         # Num_voters is added variable; with profile iteration you do not need
         # specify jagg file for every size anymore
         """Load the scenario from a .jagg file given its path.
@@ -72,7 +91,8 @@ class Scenario:
             - The AND operator &
             - The NOT operator ~
             - The IMPLIES operator ->
-        Parentheses can be omitted where clear from context. """
+        Parentheses can be omitted where clear from context. 
+        cache_dir: None or directory of the cache of compiled scenarios (see load_cache)."""
         # Read the file and split all lines
         with open(path, encoding='utf-8') as conn:
             text = conn.read()
@@ -81,7 +101,96 @@ class Scenario:
         # Remove blank lines and comments from the lines
         lines = [line for line in lines if line != "" and line[0] != "#"]
 
+        # Modified: the compiled scenario (all but the profile) is read from the cache
+        # if present, otherwise compiled (see compile_lines) and saved in the cache.
+        key = cache_key(text)
+        line_number = self.load_cache(cache_dir, key) if cache_dir else None
+        if line_number is None:
+            line_number = self.compile_lines(lines)
+            if cache_dir:
+                self.save_cache(cache_dir, key, line_number)
+
+        # Add the number of voters to the scenario
+        # If profile iteration we only add num_voters and we are done.
+        if num_voters != None:
+            self.number_voters = num_voters
+        else:
+            self.number_voters += int(lines[line_number].split(", ")[0])
+
+            # Add every (occurence, js)-pair to the profile dictionary
+            number_of_js = int(lines[line_number].split(", ")[1])
+            for i in range(line_number+1, line_number+number_of_js+1):
+                current_line = lines[i].split(", ")
+                # If the list of accepted formulas is not empty continue
+                if current_line[1] != '':
+                    label = int(current_line[0])
+                    formula_labels = list(map(int, current_line[1].split(";")))
+                    js = []
+                    for formula_label in formula_labels:
+                        js.append(self.agenda[formula_label])
+                    mask = utils.js_to_mask(self, js)
+                    # Check if js is consistent with constraints
+                    if mask not in self.in_index:
+                        raise Exception (f"The judgment set on line {i} is inconsistent"\
+                            " with the input constraints.")
+                    # Add the judgment set to the scenario
+                    self.profile.append([label, mask]) 
+                else:
+                    # If the all issues are rejected, add the empty judgement
+                    # label line is added; previously the wrong label was taken
+                    label = int(current_line[0])
+                    self.profile.append([label, 0]) 
+        # Add number of profiles.
+        self.num_profs = utils.multiset_coefficient(len(self.in_consistent), self.number_voters)
+
+    def count_from_file(self, path, num_voters=None):
+        """ADDED. As load_from_file, but the consistent judgements (and the profile) are
+        not computed, only counted (see count_consistent): for sizing scenarios too 
+        large to enumerate. Sets number_voters and num_profs and returns the counts."""
+        with open(path, encoding='utf-8') as conn:
+            lines = conn.read().splitlines()
+        lines = [line for line in lines if line != "" and line[0] != "#"]
+        line_number = self.parse_lines(lines)
+        counts = self.count_consistent()
+        if counts['in'][0] == 0:
+            raise Exception ("The input constraints are inconsistent")
+        if counts['out'][0] == 0:
+            raise Exception ("The output constraints are inconsistent")
+        if num_voters != None:
+            self.number_voters = num_voters
+        else:
+            self.number_voters += int(lines[line_number].split(", ")[0])
+        self.num_profs = utils.multiset_coefficient(counts['in'][0], self.number_voters)
+        return counts
+
+    def compile_lines(self, lines):
+        """ADDED. Compiles agenda, constraints and consistent judgements from the lines
+        of a .jagg file (see load_from_file); returns the number of the first line 
+        after the constraints."""
+        line_number = self.parse_lines(lines)
+
+        # Consturct the CONSISTENT judgement
+        # Modified: every formula is parsed and compiled once (see src.models), issues 
+        # (labels l1, l2, ..) stand for their formula; instead of listing all models of 
+        # one large nnf formula, the consistent judgements are enumerated as bitmasks.
+        formulas, in_constraint, out_constraint = self.compile_constraints()
+        self.in_consistent = models.enumerate_masks(in_constraint, formulas, self.variables)
+        self.out_consistent = models.enumerate_masks(out_constraint, formulas, self.variables)
+        if not self.in_consistent:
+            raise Exception ("The input constraints are inconsistent")
+        if not self.out_consistent:
+            raise Exception ("The output constraints are inconsistent")
+        self.compute_agr_table()
+        self.compute_asp_facts()
+        return line_number
+
+    def parse_lines(self, lines):
+        """ADDED (split off from compile_lines). Reads the variables, agenda and 
+        constraints from the lines of a .jagg file; returns the number of the first
+        line after the constraints."""
         # Create a parser object for future use
+        # Modified: pyparsing is only imported when a scenario is compiled.
+        from .parser import Parser
         parser = Parser()
 
         # Add the VARIABLES to the scenario
@@ -102,13 +211,7 @@ class Scenario:
             label = int(current_line[0])
             formula = current_line[1]
             self.agenda[label] = parser.to_nnf(formula)
-
-        # Update what variables appear in the scenario.
-        all_variables = []
-        for var in self.variables:
-            all_variables.append(var)
-        for label in self.agenda.keys():
-            all_variables.append(f'l{label}')
+        self.num_issues = len(self.agenda)
 
         # Add the INPUT CONSTRAINT to the list of constraints
         line_number = number_of_formulass+2
@@ -126,97 +229,268 @@ class Scenario:
                 formula = formula_def
             self.output_constraints.append(parser.to_nnf(formula))
             line_number += 1
+        return line_number
 
-        # Consturct the CONSISTENT judgement
-        # Translated agenda: issues are represented by their labels.
-        translated_agenda = parser.translate_agenda(self.agenda)
+    def compile_constraints(self):
+        """ADDED. The compiled formulas of the issues (in order of the agenda) and the
+        compiled input and output constraint (see src.models)."""
+        from .parser import Parser
+        parser = Parser()
+        formulas = {f'l{label}': models.compile_formula(parser, formula) 
+            for label, formula in self.agenda.items()}
+        in_constraint = models.conjunction([models.compile_formula(parser, conjunct, formulas)
+            for conjunct in self.input_constraints])
+        out_constraint = models.conjunction([models.compile_formula(parser, conjunct, formulas)
+            for conjunct in self.output_constraints])
+        return list(formulas.values()), in_constraint, out_constraint
+
+    def count_consistent(self):
+        """ADDED. Numbers of rational and feasible judgements and of antipodal pairs 
+        among them, counted without enumerating the judgements (see models.count_masks), 
+        as dictionary 'in'/'out': (number, number of antipodal pairs)."""
+        formulas, in_constraint, out_constraint = self.compile_constraints()
+        return {'in': models.count_masks(in_constraint, formulas, self.variables),
+            'out': models.count_masks(out_constraint, formulas, self.variables)}
 
-        # Convert constraints to strings
-        in_string = ""
-        out_string = ""
+    def compute_asp_facts(self):
+        """ADDED (moved from ASPSolver.all_outcomes). The input and output constraints, 
+        with the equivalences of the labels and their formulas, in CNF as ASP facts 
+        inputClause/2 and outputClause/2, and the facts variable/1; they do not depend
+        on the profile, hence are computed once (and cached, see save_cache). Sets 
+        asp_facts and asp_num_variables (number of variables)."""
+        from .parser import Parser
+        parser = Parser()
+
+        # Create a list of all variables in the scenario.
+        all_variables = set(self.variables)
+        for key in self.agenda:
+            all_variables.add(f"l{key}")
+
+        # Adding input constraints.
+        asp_facts = "\n% Declare input constraints (in CNF)\n"
+        total_input_constraints = ""
+
+        # Compound separate constraints into one.
         for conjunct in self.input_constraints:
-            in_string += f'({conjunct}) & '
+            total_input_constraints += f"{conjunct} & "
+
+        # Add auxiliary input constraints that guarantee that labels
+        # correspond to the right formulas.
+        for constraint in parser.translate_agenda(self.agenda):
+            total_input_constraints += f"({constraint}) & "
+        total_ic = total_input_constraints[:-3]
+
+        # Translate the constraint to CNF.
+        cnf_object = parser.to_cnf(total_ic, all_variables)
+        ic_cnf = cnf_object[0]
+        all_variables = all_variables.union(cnf_object[1])
+
+        # Adding the input constraint clauses to the program.
+        conjuncts = ("".join(ic_cnf.split())).split("&")
+        clause_number = 1
+        for clause in conjuncts:
+            prep_clause = "".join(clause.split("("))
+            prep_clause = "".join(prep_clause.split(")"))
+            conjunct = prep_clause.split("|")
+            for string in conjunct:
+                if string[0] == "(":
+                    formula = string[1:]
+                elif string[-1] == ")":
+                    formula = string[:-1]
+                else:
+                    formula = string
+                if formula[0] == "~":
+                    asp_facts += f'inputClause({clause_number}, -{formula[1:]}).\n'
+                else:
+                    asp_facts += f'inputClause({clause_number}, {formula}).\n'
+            clause_number += 1
+
+        # Adding output constraints.
+        asp_facts += "\n% Declare output constraints (in CNF)\n"
+        total_output_contstraints = ""
+
+        # Compound separate constraints into one.
         for conjunct in self.output_constraints:
-            out_string += f'({conjunct}) & '
-        for conjunct in translated_agenda:
-            in_string += f'({conjunct}) & '
-            out_string += f'({conjunct}) & '
-        # Add constraint of completeness
-        for var in all_variables:
-            in_string += f"({var} | ~{var}) & "
-            out_string += f"({var} | ~{var}) & "
-        in_string = in_string[:-3]
-        out_string = out_string[:-3]
-
-        # Preprocess the string representing the scenario.
-        in_string_prepro = in_string
-        out_string_prepro = out_string
-        for var in all_variables:
-            in_string_prepro = in_string_prepro.replace(var, var_prefix + var)
-            out_string_prepro = out_string_prepro.replace(var, var_prefix + var)
-        # If more than ten variables this goes wrong, following fix:
-        in_string_prepro = in_string_prepro.replace(var_prefix + var_prefix, var_prefix)
-        out_string_prepro = out_string_prepro.replace(var_prefix + var_prefix, var_prefix)
-        for var in all_variables:
-            exec(f"{var_prefix}{var} = Var('{var}')")
-        in_constraint = eval(in_string_prepro)
-        out_constraint = eval(out_string_prepro)
-        if not in_constraint.consistent():
-            raise Exception ("The input constraints are inconsistent")
-        if not out_constraint.consistent():
-            raise Exception ("The output constraints are inconsistent")
+            total_output_contstraints += f"{conjunct} & "
 
-        # List all the models that are consistent with the output constraints.
-        self.in_consistent = self.clean_outcome(list(in_constraint.models()))
-        self.out_consistent = self.clean_outcome(list(out_constraint.models()))
-        in_consistent_bin = [utils.jdict_to_bin(jdict) for jdict in self.in_consistent]
-        out_consistent_bin = [utils.jdict_to_bin(jdict) for jdict in self.out_consistent]
+        # Add auxiliary input constraints that guarantee
+        # that labels correspond to the right formulas.
+        for constraint in parser.translate_agenda(self.agenda):
+            total_output_contstraints += f"({constraint}) & "
+        total_oc = total_output_contstraints[:-3]
 
-        # Add the number of voters to the scenario
-        # If profile iteration we only add num_voters and we are done.
-        if num_voters != None:
-            self.number_voters = num_voters
-        else:
-            self.number_voters += int(lines[line_number].split(", ")[0])
+        # Translate the constraint to CNF.
+        cnf_object = parser.to_cnf(total_oc, all_variables)
+        oc_cnf = cnf_object[0]
+        all_variables = all_variables.union(cnf_object[1])
 
-            # Add every (occurence, js)-pair to the profile dictionary
-            number_of_js = int(lines[line_number].split(", ")[1])
-            for i in range(line_number+1, line_number+number_of_js+1):
-                current_line = lines[i].split(", ")
-                # If the list of accepted formulas is not empty continue
-                if current_line[1] != '':
-                    label = int(current_line[0])
-                    formula_labels = list(map(int, current_line[1].split(";")))
-                    js = []
-                    for formula_label in formula_labels:
-                        js.append(self.agenda[formula_label])
-                    # Check if js is consistent with constraints
-                    if utils.js_to_bin(self, js) not in in_consistent_bin:
-                        raise Exception (f"The judgment set on line {i} is inconsistent"\
-                            " with the input constraints.")
-                    # Add the judgment set to the scenario
-                    self.profile.append([label, js]) 
+        # Adding the output constraint clauses to the program.
+        conjuncts = ("".join(oc_cnf.split())).split("&")
+        clause_number = 1
+        for clause in conjuncts:
+            prep_clause = "".join(clause.split("("))
+            prep_clause = "".join(prep_clause.split(")"))
+            conjunct = prep_clause.split("|")
+            for string in conjunct:
+                if string[0] == "(":
+                    formula = string[1:]
+                elif string[-1] == ")":
+                    formula = string[:-1]
                 else:
-                    # If the all issues are rejected, add the empty list
-                    # label line is added; previously the wrong label was taken
-                    label = int(current_line[0])
-                    self.profile.append([label, []]) 
-        # Add number of profiles.
-        self.num_profs = utils.multiset_coefficient(len(self.in_consistent), self.number_voters)
+                    formula = string
+                if formula[0] == "~":
+                    asp_facts += f'outputClause({clause_number}, -{formula[1:]}).\n'
+                else:
+                    asp_facts += f'outputClause({clause_number}, {formula}).\n'
+            clause_number += 1
+
+        # Declare variables.
+        asp_facts += '\n'
+        for variable in all_variables:
+            asp_facts += f'variable({variable}).\n'
+        self.asp_facts = asp_facts
+        self.asp_num_variables = len(all_variables)
+
+    def load_cache(self, cache_dir, key):
+        """ADDED. Reads the compiled scenario with key (see cache_key) from cache_dir: 
+        agenda, constraints, consistent judgements and agreement table. Returns the 
+        number of the first line after the constraints, or None if not cached."""
+        path = os.path.join(cache_dir, key + '.npz')
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as cached:
+            meta = json.loads(str(cached['meta']))
+            self.in_consistent = cached['in_consistent'].tolist()
+            self.out_consistent = cached['out_consistent'].tolist()
+            agr_table = cached['agr_table']
+        self.variables = meta['variables']
+        self.agenda = {int(label): formula for label, formula in meta['agenda']}
+        self.num_issues = len(self.agenda)
+        self.input_constraints = meta['input_constraints']
+        self.output_constraints = meta['output_constraints']
+        self.asp_facts = meta['asp_facts']
+        self.asp_num_variables = meta['asp_num_variables']
+        self.compute_agr_table(agr_table)
+        return meta['line_number']
+
+    def save_cache(self, cache_dir, key, line_number):
+        """ADDED. Saves the compiled scenario in cache_dir (see load_cache), as a
+        compressed numpy file replaced atomically."""
+        os.makedirs(cache_dir, exist_ok=True)
+        meta = {'variables': self.variables, 'agenda': list(self.agenda.items()), 
+            'input_constraints': self.input_constraints, 'output_constraints': self.output_constraints,
+            'asp_facts': self.asp_facts, 'asp_num_variables': self.asp_num_variables,
+            'line_number': line_number}
+        tmp = os.path.join(cache_dir, f'{key}.{os.getpid()}.tmp.npz')
+        np.savez_compressed(tmp, meta=np.array(json.dumps(meta)),
+            in_consistent=np.array(self.in_consistent, dtype=np.int64),
+            out_consistent=np.array(self.out_consistent, dtype=np.int64), agr_table=self.agr_table)
+        os.replace(tmp, os.path.join(cache_dir, key + '.npz'))
+
+    def compute_agr_table(self, agr_table=None):
+        """ADDED. Profiles are multisets over in_consistent, hence the agreement
+        of any judge with any feasible outcome can be looked up in agr_table, where
+        agr_table[i, o] = |in_consistent[i] \cap out_consistent[o]| (unless given)."""
+        self.in_index = {mask: idx for idx, mask in enumerate(self.in_consistent)}
+        self.out_index = {mask: idx for idx, mask in enumerate(self.out_consistent)}
+        if agr_table is None:
+            agr_table = np.array([[utils.agr_masks(mask_in, mask_out, self.num_issues)
+                for mask_out in self.out_consistent] for mask_in in self.in_consistent], dtype=np.int64)
+        self.agr_table = agr_table
+        # For log-domain Kemeny-Nash scores (zero agreements are counted separately).
+        self.log_agr_table = np.log(np.maximum(self.agr_table, 1))
+        self.zero_agr_table = (self.agr_table == 0).astype(np.int64)
+
+    def compute_automorphisms(self):
+        """ADDED. Automorphisms of the scenario: signed permutations of the issues
+        (issue pos goes to issue image, negated if sign) that map in_consistent and
+        out_consistent onto themselves. They preserve all agreements, hence all results
+        of a profile (judges and outcomes are permuted alike). The group is not
+        enumerated: along the chain of stabilisers of issues 0, 1, .. one automorphism
+        per image of the next issue is searched. Sets self.aut_order (number of
+        automorphisms) and self.aut_in_perms: these (generating) automorphisms as
+        permutations of the indices of in_consistent; self.aut_in_transversals has them 
+        per level (without the identity), every automorphism is a product of one 
+        element (or the identity) per level (see profiles.group_elements)."""
+        m = self.num_issues
+        bits = [[[(mask >> (m - 1 - pos)) & 1 for pos in range(m)] for mask in masks]
+            for masks in [self.in_consistent, self.out_consistent]]
+
+        def consistent(assign):
+            # The partial map (list of (pos, image, sign)) is extendable only if the
+            # projections on the issues assigned so far are mapped onto each other.
+            for judgements in bits:
+                src = Counter(tuple(js[pos] ^ sign for pos, _, sign in assign) for js in judgements)
+                dst = Counter(tuple(js[image] for _, image, _ in assign) for js in judgements)
+                if src != dst:
+                    return False
+            return True
+
+        def extend(assign):
+            # Depth first search for an automorphism extending assign.
+            if len(assign) == m:
+                return assign
+            used = {image for _, image, _ in assign}
+            for image in range(m):
+                for sign in [0, 1]:
+                    if image not in used and consistent(assign + [(len(assign), image, sign)]):
+                        found = extend(assign + [(len(assign), image, sign)])
+                        if found is not None:
+                            return found
+            return None
+
+        self.aut_order = 1
+        self.aut_in_perms = []
+        self.aut_in_transversals = []
+        for level in range(m):
+            self.aut_in_transversals.append([])
+            fixed = [(pos, pos, 0) for pos in range(level)]
+            num_images = 1
+            for image in range(level, m):
+                for sign in [0, 1]:
+                    if image == level and sign == 0:
+                        continue
+                    found = extend(fixed + [(level, image, sign)]) if consistent(fixed + [(level, image, sign)]) else None
+                    if found is None:
+                        continue
+                    num_images += 1
+                    perm = []
+                    for mask in self.in_consistent:
+                        mask_image = 0
+                        for pos, image_pos, sign_pos in found:
+                            mask_image |= (((mask >> (m - 1 - pos)) & 1) ^ sign_pos) << (m - 1 - image_pos)
+                        perm.append(self.in_index[mask_image])
+                    self.aut_in_perms.append(perm)
+                    self.aut_in_transversals[-1].append(perm)
+            self.aut_order *= num_images
+
+    def profile_counts(self):
+        """ADDED. Returns the profile as vector counts, where counts[i] is the number
+        of judges with judgement in_consistent[i]."""
+        counts = np.zeros(len(self.in_consistent), dtype=np.int64)
+        for times_occur, mask in self.profile:
+            if mask not in self.in_index:
+                raise Exception (f"The judgment {utils.mask_to_bin(mask, self.num_issues)} is"\
+                    " inconsistent with the input constraints.")
+            counts[self.in_index[mask]] += times_occur
+        return counts
+
+    def profile_from_counts(self, counts):
+        """ADDED. Returns the profile (list of (times selected, judgement) pairs) 
+        corresponding to counts over in_consistent."""
+        return [[int(counts[idx]), self.in_consistent[idx]] for idx in np.flatnonzero(counts)]
 
     def clean_outcome(self, outcomes):
-        for i, outcome in enumerate(outcomes):
-            translated_outcomes = {}
-            for formula in outcome.keys():
-                if formula[0] == 'l':
-                    # original: label = int(formula[1]) [wrong if num issues > 9]
-                    label = int(formula[1:])
-                    translation = self.agenda[label]
-                    translated_outcomes[translation] = outcome[formula]
-            outcomes[i] = utils.order_dict(self, translated_outcomes)
-        # Remove duplicates from outcomes.
-        final = [dict(t) for t in {tuple(outcome.items()) for outcome in outcomes}]
-        return final
+        """Translates the models to judgements (bitmasks); sorted and without duplicates."""
+        label_pos = {f'l{label}': self.num_issues - 1 - pos for pos, label in enumerate(self.agenda)}
+        masks = set()
+        for outcome in outcomes:
+            mask = 0
+            for var, value in outcome.items():
+                if value and var in label_pos:
+                    mask |= 1 << label_pos[var]
+            masks.add(mask)
+        return sorted(masks)
 
     def pretty_repr(self):
         """Returns string that represents the scenario object in a readable way"""
@@ -235,7 +509,7 @@ class Scenario:
         scenario_string += "\n\nProfile (times selected, accepted formulas):"
         for judgment_set in self.profile:
             accepted = "("
-            for variable in judgment_set[1]:
+            for variable in utils.mask_to_js(self, judgment_set[1]):
                 if accepted == "(":
                     accepted += variable
                 else:
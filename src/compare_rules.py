@@ -1,26 +1,35 @@
-import itertools, random, math, time, sys
-from more_itertools import random_combination 
+import itertools, random, time
+import numpy as np
 from .bf_solver import BFSolver
-from .asp_solver import ASPSolver 
 import src.utils as utils
+import src.parallel as parallel
+import src.profiles as profiles
 
 class CompareRules():
     """ Class to compare two judgement aggregation methods (solver+rule+lambda)
     with each other. If methods are the same than analysis one a single method."""
 
     def __init__(self, scenario, solver1:str, rule1:str, lamb1:float, 
-                    solver2:str, rule2:str, lamb2:float):
+                    solver2:str, rule2:str, lamb2:float, checkpoint=None, asp_grouped:bool=False,
+                    asp_stats:bool=False):
         """The class is initialized with:
         scenario;
         solver1: choices "bf" (brute force) or "asp" (Answer Set Programming).
         rule1: rule uses in first method, options:
                 "kemeny", "kemnash", "lamb-kemnash", "kemeny-original" for bf; 
                 "kemeny", "kemnash", "lamb-kemnash", "kemeny-sat", "kemnash-sat"
-                "lamb-kemnash-sat", "kemeny-original", "kemeny-sat-original" for asp.
+                "lamb-kemnash-sat", "kemeny-original", "kemeny-sat-original", "kemeny-support", "kemnash-log",
+                "lamb-kemnash-log" for asp.
         lamb1: Value for \u03BB that is used in parameterised (lamb-kemnashX) implementation.
         solver2: idem solver1.
         rule2: idem rule1.
-        lamb2: idem lamb1."""
+        lamb2: idem lamb1.
+        checkpoint: None or parallel.Checkpoint, to save (and resume) sweeps.
+        asp_grouped: if True the asp solver uses the coalition-grouped encodings (see 
+                ASPSolver.profile_facts).
+        asp_stats: if True the statistics of the asp solver (times of the phases, sizes of
+                the ground programs and of the search, see asp_solver.STATS) are summed
+                over the sweep and given in the result (asp_stats)."""
         self.scenario = scenario
         self.solver1 = solver1
         self.rule1 = rule1
@@ -35,48 +44,163 @@ class CompareRules():
         self.prof_tot = 0
         self.prof_test = 0
         self.indices = 0
+        self.counts = None
+        self.checkpoint = checkpoint
+        self.asp_grouped = asp_grouped
+        self.asp_stats = asp_stats
+        self.seed = None
+        # Number of profiles of which the bf outcomes are computed at once.
+        self.chunk_size = 10000
 
 
     def result(self, all_ex:bool=False, num_ex:int=1, sample:int=250000, 
-                time_an:bool=False, show_res:bool=True, simulate:int=40000000):
+                time_an:bool=False, show_res:bool=True, simulate:int=40000000, workers:int=1,
+                symmetry:bool=False, seed:int=None):
         """ 
         all_ex: If True all examples are printed; otherwise, only the ones with different outcomes.
         num_ex: Maximal number of examples to be printed.
-        sample: Number of profiles computed. If 0 all profiles computed.
+        sample: Number of profiles computed, drawn uniformly (without replacement). If 0 
+                all profiles computed.
         time_an: If True time (comparison) analysis is executed.
         show_res: Dictionary with results is printed (in a nice format).
-        simulate: If self.prof_tot > simulate, a profile (multiset) is simulated as random 
-                permutation. (To prevent RAM overflow.)"""
+        simulate: If all profiles are to be computed and self.prof_tot > simulate, instead 
+                self.prof_tot profiles (multisets) are simulated as random permutations.
+        workers: number of processes, every process sweeps a shard of the profiles.
+        symmetry: if all profiles are iterated and the scenario has automorphisms (see
+                Scenario.compute_automorphisms), only one profile per orbit is computed 
+                and its counts are weighted by the size of the orbit.
+        seed: seed of the random sample (and of worker w: seed + w); if None the time."""
         ##################################################
         ################    GROUNDWORK    ################
         ##################################################
         # Random seed
-        random.seed(time.time())
+        self.seed = seed
+        random.seed(time.time() if seed is None else seed)
         # To calculate total time
         time_tot0 = time.time() 
-        # Variable to show time estimation (after 60s).
-        first_pass = True
-        prof_done = 0
-        # Convenient shorthands
-        bfs = BFSolver(binrep=False)
-        asp = ASPSolver(binrep=False)
 
         # Computing total number of profiles (= multisets).
         self.prof_tot = self.scenario.num_profs
         # If sample > self.prof_tot all profiles are iterated and sample set 0
         if sample > self.prof_tot:
             sample = 0
+        # When resuming, the (sampled) indices are read from the checkpoint.
+        key = self.checkpoint_key(sample, simulate, all_ex, num_ex, time_an, workers, symmetry, seed)
+        state = self.checkpoint.load('main', key) if self.checkpoint is not None else None
+        # Sizes of the orbits of the indices (if symmetry), otherwise None.
+        weights = None
+        if state is not None:
+            self.indices, self.prof_test, weights = state
         # In case self.prof_tot > simulate 
-        if self.prof_tot > simulate and sample > 0:
-            print('PROFILE SIMULATION')
-            self.indices = [0] * sample
-            self.prof_test = sample
-        elif self.prof_tot > simulate:
+        elif self.prof_tot > simulate and sample == 0:
             print('PROFILE SIMULATION')
-            self.indices = [0] * self.prof_tot
+            self.indices = profiles.ProfileSimulation(len(self.scenario.in_consistent), 
+                self.scenario.number_voters, self.prof_tot)
             self.prof_test = self.prof_tot
         else:
             self.indices = self.compute_indices(sample)
+            if symmetry and sample == 0:
+                self.scenario.compute_automorphisms()
+                if self.scenario.aut_order > 1:
+                    orbits = profiles.orbit_representatives(len(self.scenario.in_consistent),
+                        self.scenario.number_voters, self.scenario.aut_in_transversals)
+                    self.indices = [index for index, _ in orbits]
+                    weights = [size for _, size in orbits]
+        if self.checkpoint is not None and state is None:
+            self.checkpoint.save('main', key, (self.indices, self.prof_test, weights), force=True)
+        # Every worker gets a shard of the indices.
+        bounds = [worker * len(self.indices) // workers for worker in range(workers + 1)]
+        shards = [(worker, bounds[worker], self.indices[bounds[worker]:bounds[worker + 1]], 
+            None if weights is None else weights[bounds[worker]:bounds[worker + 1]], all_ex, num_ex, 
+            time_an, key) for worker in range(workers)]
+        self.indices = 0
+        acc = parallel.sweep(self, 'sweep', shards, workers)
+        cum = acc.counts['cum']
+        time_r1 = acc.counts['time_r1']
+        time_r2 = acc.counts['time_r2']
+        asp_stats = acc.counts.get('asp_stats')
+        examples_print = acc.examples
+        if time_an:
+            timeMax_r1, profMax_r1 = acc.maxima['time_r1']
+            timeMin_r1, profMin_r1 = acc.minima['time_r1']
+            timeMax_r2, profMax_r2 = acc.maxima['time_r2']
+            timeMin_r2, profMin_r2 = acc.minima['time_r2']
+
+        ##################################################
+        ############    PROCESSING RESULTS    ############
+        ##################################################
+        ###  PRINT EXAMPLES  ###
+        if num_ex > 0:
+            self.print_examples(examples_print)
+
+        ###  PUTTING TOGETHER RELEVANT RESULTS  ###
+        result = {}
+        for key,value in cum.items():
+            if type(value) == float:
+                result[key] = value / self.prof_test
+            else:
+                result[key] = value
+        result['sym_dif'] = ( cum['sol1']+cum['sol2']-2*cum['overlap'] ) / (
+            cum['sol1']+cum['sol2']-cum['overlap'])
+        result['rules_equiv'] = bool(cum['prof_same'] == self.prof_test)
+
+        # Processing times and time analysis
+        time_tot1 = time.time()
+        result['time_tot'] = time_tot1 - time_tot0
+        result['time_r1'] = time_r1
+        result['time_r2'] = time_r2
+        # Modified: per computed profile (with symmetry one per orbit, not self.prof_test).
+        result['iters1sec_r1'] = '{:.2e}'.format(acc.num_profs / time_r1)
+        result['iters1sec_r2'] = '{:.2e}'.format(acc.num_profs / time_r2)
+        if time_an:
+            result['tmax//tmin_r1'] = '{:.0f}'.format(timeMax_r1 // timeMin_r1)
+            result['tmax//tmin_r2'] = '{:.0f}'.format(timeMax_r2 // timeMin_r2)
+            self.scenario.profile = profMax_r1
+            result['prof_max_r1'] = utils.prof_mset_bin(self.scenario)
+            self.scenario.profile = profMin_r1
+            result['prof_min_r1'] = utils.prof_mset_bin(self.scenario)
+            self.scenario.profile = profMax_r2
+            result['prof_max_r2'] = utils.prof_mset_bin(self.scenario)
+            self.scenario.profile = profMin_r2
+            result['prof_min_r2'] = utils.prof_mset_bin(self.scenario)
+        # ADDED. Statistics of the asp solver per method ('r1', 'r2'), summed over the sweep.
+        if asp_stats is not None:
+            result['asp_stats'] = asp_stats
+
+        ###  PRINT RESULTS  ###
+        if show_res:
+            result_string = {}
+            for label in result:
+                if type(result[label]) == float:
+                    result_string[label] = '{:.2f}'.format(result[label])
+                elif type(result[label]) == int:
+                    result_string[label] = '{:.2e}'.format(result[label])
+                else:
+                    result_string[label] = result[label]
+            self.print_result(result_string)
+        return result
+
+    def sweep(self, shard):
+        """ADDED. Sweep over the profiles of shard (worker, start, indices, weights, all_ex, 
+        num_ex, time_an, run_key), with indices at positions start.. of self.indices, weights
+        the sizes of their orbits (or None) and run_key the checkpoint key of the run.
+        Returns an Accumulator (see result for the other arguments)."""
+        worker, start, indices, weights, all_ex, num_ex, time_an, run_key = shard
+        # Modified: the progress is given in the computed profiles (orbit representatives
+        # if symmetry), out of those of the shard.
+        unit = ' profiles' if weights is None else ' orbit representatives'
+        if weights is None:
+            weights = itertools.repeat(1)
+        # Variable to show time estimation (after 60s).
+        first_pass = worker == 0
+        prof_done = 0
+        time_tot0 = time.time()
+        # Convenient shorthands
+        bfs = BFSolver(binrep=False, maskrep=True)
+        # Modified: clingo is only imported if a solver is asp.
+        if 'asp' in [self.solver1, self.solver2]:
+            from .asp_solver import ASPSolver, new_stats
+            asp = ASPSolver(binrep=False, maskrep=True, grouped=self.asp_grouped, stats=self.asp_stats)
 
         # Counts to measure quantitative difference.
         cum = {'sol1':0, 'sol2':0, 'overlap':0, 'overlap_same':0, 'overlap_dif':0}
@@ -85,140 +209,149 @@ class CompareRules():
         cum.update({'sum_agr1':0, 'sum_agr2':0, 'mean_agr1':0, 'mean_agr2':0})
         cum.update({'mean_dist1':0, 'mean_dist2':0, 'num_below1':0, 'num_below2':0})
         cum.update({'low_agr1':0, 'low_agr2':0, 'max_agrDif1':0, 'max_agrDif2':0})
-        # For printing examples
-        examples_print = []
-        # For basic time comparison
-        time_r1 = 0
-        time_r2 = 0
+        # For basic time comparison (and printing examples)
+        acc = parallel.Accumulator({'cum': cum, 'time_r1': 0.0, 'time_r2': 0.0}, num_ex)
+        # Random seed, or state of the checkpoint when resuming.
+        state = self.checkpoint.load(worker, run_key) if self.checkpoint is not None else None
+        if state is None:
+            random.seed(time.time() + worker if self.seed is None else self.seed + worker)
+        else:
+            acc = state['acc']
+            random.setstate(state['random'])
+            cum = acc.counts['cum']
+            indices = indices[acc.num_profs:]
+            weights = itertools.islice(weights, acc.num_profs, None)
+        # ADDED. The statistics of the asp solver are summed in the accumulator (so they 
+        # are saved and merged with it).
+        if self.asp_stats and 'asp' in [self.solver1, self.solver2]:
+            if 'asp_stats' not in acc.counts:
+                acc.counts['asp_stats'] = {'r1': new_stats(), 'r2': new_stats()}
+            for num, solver, rule, lamb in [('2', self.solver2, self.rule2, self.lamb2), 
+                    ('1', self.solver1, self.rule1, self.lamb1)]:
+                if solver == "asp":
+                    asp.stats[(rule, lamb)] = acc.counts['asp_stats']['r'+num]
 
         ##################################################
         ########    ITERATING THROUGH PROFILES    ########
         ##################################################
-        for index in self.indices:
+        for index, weight, batched, last in self.iter_chunks(zip(indices, weights), time_an):
             # Constructing profile corresponding to index
             self.scenario.profile = self.construct_profile(index)
 
             time_single0 = time.time()      # For time analysis
-            # Using the modified Jaggpy solvers to compute outcomes of profile.
-            if self.solver1 == "bf":
+            # Using the modified Jaggpy solvers to compute outcomes of profile, unless
+            # computed for the chunk of the profile (batched).
+            if '1' in batched:
+                outcomes1, time1 = batched['1']
+            elif self.solver1 == "bf":
                 outcomes1 = list(bfs.all_outcomes(
-                    self.scenario, self.rule1, self.lamb1))
+                    self.scenario, self.rule1, self.lamb1, self.counts))
             else:
                 outcomes1 = list(asp.all_outcomes(
                     self.scenario, self.rule1, self.lamb1))
             time_single1 = time.time()      # For time analysis
+            if '1' not in batched:
+                time1 = time_single1 - time_single0
+            # As before, time2 includes time1.
             if self.singleMethod:
                 outcomes2 = outcomes1
+                time2 = time1
+            elif '2' in batched:
+                outcomes2, time2 = batched['2']
+                time2 += time1
             elif self.solver2 == "bf":
                 outcomes2 = list(bfs.all_outcomes(
-                    self.scenario, self.rule2, self.lamb2))
+                    self.scenario, self.rule2, self.lamb2, self.counts))
             else:
                 outcomes2 = list(asp.all_outcomes(
                     self.scenario, self.rule2, self.lamb2))
-            time_single2 = time.time()      # For time analysis
+            if not self.singleMethod and '2' not in batched:
+                time2 = time1 + time.time() - time_single1
             # Appending times for time analysis
-            time1 = time_single1 - time_single0
-            time2 = time_single2 - time_single0
-            time_r1 += time1
-            time_r2 += time2
+            acc.counts['time_r1'] += time1
+            acc.counts['time_r2'] += time2
             if time_an:
-                if prof_done == 0 or time1 > timeMax_r1:
-                    timeMax_r1 = time1
-                    profMax_r1 = self.scenario.profile
-                if prof_done == 0 or time1 < timeMin_r1:
-                    timeMin_r1 = time1
-                    profMin_r1 = self.scenario.profile
-                if prof_done == 0 or time2 > timeMax_r2:
-                    timeMax_r2 = time2
-                    profMax_r2 = self.scenario.profile
-                if prof_done == 0 or time2 < timeMin_r2:
-                    timeMin_r2 = time2
-                    profMin_r2 = self.scenario.profile
+                acc.add_max('time_r1', time1, self.scenario.profile)
+                acc.add_min('time_r1', time1, self.scenario.profile)
+                acc.add_max('time_r2', time2, self.scenario.profile)
+                acc.add_min('time_r2', time2, self.scenario.profile)
 
             ###  QANTATIVE ANALYSIS  ###
             result_quantitative = self.quantitative_analysis(outcomes1, outcomes2)
             # Processing quantitative analysis
             for key,value in result_quantitative.items():
-                cum[key] += value
+                cum[key] += weight * value
 
             ###  QUALITATIVE ANALYSIS  ###
             result_qualitative = self.qualitative_analysis(outcomes1, outcomes2)
             # Processing qualitative analysis
             for key,value in result_qualitative.items():
                 if type(value) == float:
-                    cum[key] += value
+                    cum[key] += weight * value
 
             ###  EXAMPLES TO PRINT  ###
             # Adding extensive comparison to examples to print
-            if len(examples_print) < num_ex:          
-                if not all_ex and result_quantitative['prof_same'] == 1:
-                    continue
-                else:
+            if len(acc.examples) < num_ex:          
+                if all_ex or result_quantitative['prof_same'] != 1:
                     example = {'prof':self.scenario.profile, 'out1':outcomes1, 'out2':outcomes2}
                     example['same'] = bool(result_quantitative['prof_same'])
                     for measure,value in result_qualitative.items():
                         example[measure] = result_qualitative[measure]
-                    examples_print.append(example)
+                    acc.add_example(example)
 
             ###  TIMER  ###
             # After 60s it will give an estimate of duration
             prof_done += 1
+            acc.num_profs += 1
+            # Saved between chunks only (the random state is that after the chunk).
+            if self.checkpoint is not None and last:
+                self.checkpoint.save(worker, run_key, {'acc': acc, 'random': random.getstate()})
             t = time.time()
             if t - time_tot0 > 60 and first_pass:
-                time_est = int((self.prof_test * (t - time_tot0)) / (prof_done * 60))
-                print('TIME INDICATION: '+str(prof_done)+'/'+str(self.prof_test) + ' took ' +\
+                time_est = int((len(indices) * (t - time_tot0)) / (prof_done * 60))
+                print('TIME INDICATION: '+str(prof_done)+'/'+str(len(indices)) + unit + ' took ' +\
                 str(int(t-time_tot0))+'s. Estimate total time: ' + str(time_est) + 'min.')
                 first_pass = False
+        acc.add_range(start, start + acc.num_profs)
+        if self.checkpoint is not None:
+            self.checkpoint.save(worker, run_key, {'acc': acc, 'random': random.getstate()}, force=True)
+        return acc
 
-        ##################################################
-        ############    PROCESSING RESULTS    ############
-        ##################################################
-        ###  PRINT EXAMPLES  ###
-        if num_ex > 0:
-            self.print_examples(examples_print)
-
-        ###  PUTTING TOGETHER RELEVANT RESULTS  ###
-        result = {}
-        for key,value in cum.items():
-            if type(value) == float:
-                result[key] = value / self.prof_test
-            else:
-                result[key] = value
-        result['sym_dif'] = ( cum['sol1']+cum['sol2']-2*cum['overlap'] ) / (
-            cum['sol1']+cum['sol2']-cum['overlap'])
-        result['rules_equiv'] = bool(cum['prof_same'] == self.prof_test)
-
-        # Processing times and time analysis
-        time_tot1 = time.time()
-        result['time_tot'] = time_tot1 - time_tot0
-        result['time_r1'] = time_r1
-        result['time_r2'] = time_r2
-        result['iters1sec_r1'] = '{:.2e}'.format(self.prof_test / time_r1)
-        result['iters1sec_r2'] = '{:.2e}'.format(self.prof_test / time_r2)
-        if time_an:
-            result['tmax//tmin_r1'] = '{:.0f}'.format(timeMax_r1 // timeMin_r1)
-            result['tmax//tmin_r2'] = '{:.0f}'.format(timeMax_r2 // timeMin_r2)
-            self.scenario.profile = profMax_r1
-            result['prof_max_r1'] = utils.prof_mset_bin(self.scenario)
-            self.scenario.profile = profMin_r1
-            result['prof_min_r1'] = utils.prof_mset_bin(self.scenario)
-            self.scenario.profile = profMax_r2
-            result['prof_max_r2'] = utils.prof_mset_bin(self.scenario)
-            self.scenario.profile = profMin_r2
-            result['prof_min_r2'] = utils.prof_mset_bin(self.scenario)
+    def iter_chunks(self, profs, time_an:bool):
+        """ADDED. Iterates the (index, weight) pairs of profs in chunks of self.chunk_size.
+        The outcomes of bf rules (other than kemeny-original) are computed for the whole
+        chunk at once (see BFSolver.all_outcomes_batch), unless every profile is timed
+        (time_an); without such rules chunks are single profiles. Yields (index, weight,
+        batched, last) with batched a dictionary method ('1' or '2'): (outcomes of the
+        profile, share of the time of the chunk), and last True at the end of a chunk."""
+        bfs = BFSolver(binrep=False, maskrep=True)
+        methods = [('1', self.solver1, self.rule1, self.lamb1)]
+        if not self.singleMethod:
+            methods.append(('2', self.solver2, self.rule2, self.lamb2))
+        methods = [(num, rule, lamb) for num, solver, rule, lamb in methods
+            if solver == "bf" and rule != "kemeny-original" and not time_an]
+        chunk_size = self.chunk_size if methods else 1
+        num_consistent = len(self.scenario.in_consistent)
+        while True:
+            chunk = list(itertools.islice(profs, chunk_size))
+            if not chunk:
+                return
+            outcomes = {}
+            if methods:
+                counts = np.array([np.bincount(index, minlength=num_consistent) for index, _ in chunk])
+            for num, rule, lamb in methods:
+                time0 = time.time()
+                outs = bfs.all_outcomes_batch(self.scenario, rule, lamb, counts)
+                outcomes[num] = (outs, (time.time() - time0) / len(chunk))
+            for row, (index, weight) in enumerate(chunk):
+                batched = {num: (outs[row], time_prof) for num, (outs, time_prof) in outcomes.items()}
+                yield index, weight, batched, row == len(chunk) - 1
 
-        ###  PRINT RESULTS  ###
-        if show_res:
-            result_string = {}
-            for label in result:
-                if type(result[label]) == float:
-                    result_string[label] = '{:.2f}'.format(result[label])
-                elif type(result[label]) == int:
-                    result_string[label] = '{:.2e}'.format(result[label])
-                else:
-                    result_string[label] = result[label]
-            self.print_result(result_string)
-        return result
+    def checkpoint_key(self, *args):
+        """Describes the run (args are arguments of result), a checkpoint is only 
+        resumed by the same run."""
+        return (self.solver1, self.rule1, self.lamb1, self.solver2, self.rule2, self.lamb2, args,
+            self.scenario.number_voters, tuple(self.scenario.in_consistent), tuple(self.scenario.out_consistent))
 
     def quantitative_analysis(self, outcomes1:list, outcomes2:list):
         """Given lists outcomes1 and outcomes2:
@@ -256,69 +389,37 @@ class CompareRules():
         qual = {}
         # The sets in the comments are multisets (may contain copies).
         # For o in outcomes and i in Voters, let: agr(o,i) = Agr(js_o, js_i) #R
-        # (agr_msets)[o] = list({ agr(o,i) | i in Voters })
-        qual['agr_msets1'] = [utils.agr(self.scenario, out) for out in outcomes1] 
-        
-        # # sums[o] = sum({ agr(o,i) | i in Voters })
-        # qual['sums1'] = [utils.sum(agr_mset) for agr_mset in qual['agr_msets1']] 
-        # means[o] = mean({ agr(o,i) | i in Voters })
-        qual['means1'] = [ (sum(agr_mset)/float(len(agr_mset))) for agr_mset in qual['agr_msets1']] 
-        # signed_dists1[o] = list({ (agr(o,i) - means[o]) | i in Voters })
-        signed_dists1 = [[qual['agr_msets1'][o][i] - qual['means1'][o]
-            for i in range(self.scenario.number_voters)] for o in range(len(outcomes1))]
-        # dists1[o] = list({ abs(agr(o,i) - means[o]) | i in Voters })
-        dists1 = [[abs(signed_dists1[o][i]) for i in range(self.scenario.number_voters)]
-            for o in range(len(outcomes1))]
-        # mdists[o] = mean({ dist(o,i) | i in Voters})
-        qual['mean_dists1'] = [ (sum(dists1[o])/float(len(dists1[o]))) for o in range(len(outcomes1))]
-        # Number of judges with agr less than average:
-        qual['nums_below1'] = [sum(signed_dists1[o][i] < 0 
-            for i in range(self.scenario.number_voters)) for o in range(len(outcomes1))]
-
-        # List with greatest differences in utility.
-        qual['greatest_difs1'] = [max(qual['agr_msets1'][o]) - min(qual['agr_msets1'][o]) 
-            for o in range(len(outcomes1))]
-        # List with lowest utilities.
-        qual['lows1'] = [min(qual['agr_msets1'][o]) for o in range(len(outcomes1))]
-
-        # The aggregated values.
-        # qual['sum_agr1'] = sum(qual['sums1'])/float(len(qual['sums1'])) #R
-        qual['mean_agr1'] = sum(qual['means1'])/float(len(qual['means1']))
-        qual['mean_dist1'] = sum(qual['mean_dists1'])/float(len(qual['mean_dists1']))
-        qual['num_below1'] = sum(qual['nums_below1'])/float(len(qual['nums_below1']))
-        qual['max_agrDif1'] = sum(qual['greatest_difs1'])/float(len(qual['greatest_difs1']))
-        qual['low_agr1'] = sum(qual['lows1'])/float(len(qual['lows1']))
+        # (agr_msets)[o] = list({ agr(o,i) | i in Voters }), represented as histogram
+        # agr_hists[o][a] = |{ i in Voters | agr(o,i) = a }| (see utils.agr_hist).
+        for num, outcomes in [('1', outcomes1), ('2', outcomes2)]:
+            if num == '2' and self.singleMethod:
+                return qual
+            qual['agr_hists'+num] = [utils.agr_hist(self.scenario, out, counts=self.counts) for out in outcomes] 
+            # # sums[o] = sum({ agr(o,i) | i in Voters })
+            # qual['sums'+num] = [utils.hist_sum(agr_hist) for agr_hist in qual['agr_hists'+num]] 
+            # means[o] = mean({ agr(o,i) | i in Voters })
+            qual['means'+num] = [utils.hist_mean(agr_hist) for agr_hist in qual['agr_hists'+num]] 
+            # mdists[o] = mean({ abs(agr(o,i) - means[o]) | i in Voters})
+            qual['mean_dists'+num] = [utils.hist_mean_dist(agr_hist) for agr_hist in qual['agr_hists'+num]]
+            # Number of judges with agr less than average:
+            qual['nums_below'+num] = [utils.hist_num_below(agr_hist) for agr_hist in qual['agr_hists'+num]]
+            # List with greatest differences in utility.
+            qual['greatest_difs'+num] = [utils.hist_max(agr_hist) - utils.hist_min(agr_hist) 
+                for agr_hist in qual['agr_hists'+num]]
+            # List with lowest utilities.
+            qual['lows'+num] = [utils.hist_min(agr_hist) for agr_hist in qual['agr_hists'+num]]
 
-        if self.singleMethod:
-            return qual
-        
-        # Same for result from second rule
-        qual['agr_msets2'] = [utils.agr(self.scenario, out) for out in outcomes2]
-        
-        # qual['sums2'] = [sum(agr_mset) for agr_mset in qual['agr_msets2']] #R
-        qual['means2'] = [sum(agr_mset)/ float(len(agr_mset)) for agr_mset in qual['agr_msets2']] 
-        signed_dists2 = [[qual['agr_msets2'][o][i] - qual['means2'][o]
-            for i in range(self.scenario.number_voters)] for o in range(len(outcomes2))]
-        dists2 = [[abs(signed_dists2[o][i]) for i in range(self.scenario.number_voters)]
-            for o in range(len(outcomes2))]
-        qual['mean_dists2'] = [sum(dists2[o])/float(len(dists2[o])) for o in range(len(outcomes2))]
-        qual['nums_below2'] = [sum(signed_dists2[o][i] < 0 
-            for i in range(self.scenario.number_voters)) for o in range(len(outcomes2))]
-        
-        qual['greatest_difs2'] = [max(qual['agr_msets2'][o]) - min(qual['agr_msets2'][o]) 
-            for o in range(len(outcomes2))]
-        qual['lows2'] = [min(qual['agr_msets2'][0]) for o in range(len(outcomes2))]
-
-        # qual['sum_agr2'] = sum(qual['sums2'])/float(len(qual['sums2'])) #R
-        qual['mean_agr2'] = sum(qual['means2'])/float(len(qual['means2']))
-        qual['mean_dist2'] = sum(qual['mean_dists2'])/float(len(qual['mean_dists2']))
-        qual['num_below2'] = sum(qual['nums_below2'])/float(len(qual['nums_below2']))
-        qual['max_agrDif2'] = sum(qual['greatest_difs2'])/float(len(qual['greatest_difs2']))
-        qual['low_agr2'] = sum(qual['lows2'])/float(len(qual['lows2']))
+            # The aggregated values.
+            # qual['sum_agr'+num] = sum(qual['sums'+num])/float(len(qual['sums'+num])) #R
+            qual['mean_agr'+num] = sum(qual['means'+num])/float(len(qual['means'+num]))
+            qual['mean_dist'+num] = sum(qual['mean_dists'+num])/float(len(qual['mean_dists'+num]))
+            qual['num_below'+num] = sum(qual['nums_below'+num])/float(len(qual['nums_below'+num]))
+            qual['max_agrDif'+num] = sum(qual['greatest_difs'+num])/float(len(qual['greatest_difs'+num]))
+            qual['low_agr'+num] = sum(qual['lows'+num])/float(len(qual['lows'+num]))
 
         # Keep track of negative distances.
         if self.rule1 == "kemeny":
-            if self.rule2 == "kemnash" or self.rule2 == "lamb-kemnash":
+            if self.rule2 in ["kemnash", "lamb-kemnash", "kemnash-log", "lamb-kemnash-log"]:
                 # For every outcome2 checks if distance is greater than ALL distances for outcome1
                 # then divides number of instances by total number of outcomes 2.
                 qual['ZEx10'] = 10 * float([min([bool(qual['mean_dists2'][i] > qual['mean_dists1'][j]) 
@@ -326,35 +427,27 @@ class CompareRules():
         return qual
 
     def compute_indices(self, sample:int):
-        """We build an iterator all_indices that contains tuples that represent
-        the indices of consistent judgements in the corresponding profile """
-        all_indices = itertools.combinations_with_replacement(
-            range(len(self.scenario.in_consistent)), self.scenario.number_voters)
+        """We build a sequence all_indices that contains tuples that represent
+        the indices of consistent judgements in the corresponding profile. The 
+        profiles are not stored, but unranked when iterated (see src.profiles)."""
+        num_consistent = len(self.scenario.in_consistent)
         if sample > 0:
             self.prof_test = sample
-            # randomly draw indices from the set of all indices
-            all_indices = random_combination(all_indices, self.prof_test)
+            # Randomly draw distinct ranks, in O(sample) memory.
+            ranks = profiles.sample_ranks(self.prof_tot, self.prof_test)
+            all_indices = profiles.ProfileSample(num_consistent, self.scenario.number_voters, ranks)
         else:
             self.prof_test = self.prof_tot
-            all_indices = random_combination(all_indices, self.prof_test)
+            # All profiles, in order of rank.
+            all_indices = profiles.ProfileRange(num_consistent, self.scenario.number_voters)
         return all_indices
 
     def construct_profile(self, index):
-        profile = []
-        if index == 0:
-            profile_permutation = []
-            for judge in range(self.scenario.number_voters):
-                profile_permutation.append(random.randrange(len(self.scenario.in_consistent)))
-            for i in range(len(self.scenario.in_consistent)):
-                num_occur = profile_permutation.count(i)
-                if num_occur > 0:
-                    profile.append([num_occur, utils.jdict_to_js(self.scenario.in_consistent[i])])
-        else:
-            for i in range(len(self.scenario.in_consistent)):
-                num_occur = list(index).count(i)
-                if num_occur > 0:
-                    profile.append([num_occur, utils.jdict_to_js(self.scenario.in_consistent[i])])
-        return profile
+        """Returns the profile corresponding to index; the profile as counts over
+        self.scenario.in_consistent is stored in self.counts."""
+        num_consistent = len(self.scenario.in_consistent)
+        self.counts = np.bincount(index, minlength=num_consistent)
+        return self.scenario.profile_from_counts(self.counts)
 
     def print_result(self, result:dict):
         from src.utils import print_list as pl
@@ -424,8 +517,27 @@ class CompareRules():
             print('Agr dist high:          '+result['max_agrDif1'])
             print('**  Time  **')
             print('Solver iterations p/s: {}'.format(result['iters1sec_r1']))
+        if 'asp_stats' in result:
+            self.print_asp_stats(result['asp_stats'])
         return None
 
+    def print_asp_stats(self, asp_stats:dict):
+        """ADDED. Prints the statistics of the asp solver per method, per call (times in ms)."""
+        dum = utils.print_inits(self)
+        print('**  ASP Statistics (per call)  **')
+        for num in ['1', '2']:
+            stats = asp_stats['r'+num]
+            if stats['calls'] == 0:
+                continue
+            calls = stats['calls']
+            times = ', '.join('{} {:.2f}'.format(key[5:], 1000 * stats[key] / calls)
+                for key in stats if key.startswith('time'))
+            print(dum['t'+num]+' ('+str(calls)+' calls)')
+            print('Times (ms):  '+times)
+            print('Ground:      {:.0f} atoms, {:.0f} rules; Search: {:.1f} choices, {:.1f} conflicts'.format(
+                stats['atoms'] / calls, stats['rules'] / calls, stats['choices'] / calls, 
+                stats['conflicts'] / calls))
+
     def print_examples(self, examples_print:list):
         print('********************************************************')
         print('***************         EXAMPLES         ***************')
@@ -436,12 +548,12 @@ class CompareRules():
         else:
             for idx,example in enumerate(examples_print):
                 # Changing some representations
-                example['out1'] = [utils.jdict_to_bin(outcome) for outcome in example['out1']]
-                example['out2'] = [utils.jdict_to_bin(outcome) for outcome in example['out2']]
+                example['out1'] = [utils.mask_to_bin(outcome, self.scenario.num_issues) for outcome in example['out1']]
+                example['out2'] = [utils.mask_to_bin(outcome, self.scenario.num_issues) for outcome in example['out2']]
                 self.scenario.profile = example['prof']
                 profile = utils.prof_mset_bin(self.scenario)
-                agr_msets1 = [utils.mset(agr_set) for agr_set in example['agr_msets1']][0]
-                agr_msets2 = [utils.mset(agr_set) for agr_set in example['agr_msets2']][0]
+                agr_msets1 = [utils.hist_mset(agr_hist) for agr_hist in example['agr_hists1']][0]
+                agr_msets2 = [utils.hist_mset(agr_hist) for agr_hist in example['agr_hists2']][0]
                 lows1 = example['lows1']
                 lows2 = example['lows2']
                 dum = utils.print_inits(self)
@@ -1,19 +1,29 @@
-import itertools, random, math, time, sys
-from more_itertools import random_combination 
+import itertools, math, time, functools
+from fractions import Fraction
+import numpy as np
 from .bf_solver import BFSolver
-from .asp_solver import ASPSolver 
 import src.utils as utils
-import matplotlib.pyplot as plt
+import src.profiles as profiles
+import src.parallel as parallel
 
 class Compare_Kemnash():
     """ Class to compare two judgement aggregation methods (solver+rule+lambda)
     with each other. If methods are the same than analysis one a single method."""
 
-    def __init__(self, scenario, lambs:list, sample:int=250000):
+    def __init__(self, scenario, lambs:list, sample:int=250000, gray:bool=False, checkpoint=None,
+                    symmetry:bool=False, seed:int=None):
         """The class is initialized with:
         scenario;
         lambs: value of lambda-parameter for parameterised Kemeny-Nash rule
-        sample: sample x 10^4 is max number of iterations (ie if sample>num_profs -> arg ignored)"""
+        sample: sample x 10^4 is max number of iterations (ie if sample>num_profs -> arg ignored)
+        gray: if all profiles are iterated, they are visited in minimal change order
+            (see profiles.gray_moves) and scores are updated incrementally.
+        checkpoint: None or parallel.Checkpoint, to save (and resume) sweeps.
+        symmetry: if all profiles are iterated and the scenario has automorphisms (see
+            Scenario.compute_automorphisms), only one profile per orbit is visited 
+            and its counts are weighted by the size of the orbit.
+        seed: seed of the sample (see sample_batches); if None a random seed (which is
+            saved in the checkpoint and used again when resuming)."""
         self.scenario = scenario
         self.lambs = lambs
         if len(lambs) == 1:
@@ -21,17 +31,37 @@ class Compare_Kemnash():
         if self.scenario.num_profs > sample:
             self.sample = True
             self.prof_test = sample
-            self.indices = [0] * sample
         else:
             self.sample = False
             self.prof_test = self.scenario.num_profs
+        # Orbits of the profiles: list of (index, orbit size), or None.
+        self.orbits = None
+        if symmetry and not self.sample:
+            self.scenario.compute_automorphisms()
+            if self.scenario.aut_order > 1:
+                self.orbits = profiles.orbit_representatives(len(self.scenario.in_consistent), 
+                    self.scenario.number_voters, self.scenario.aut_in_transversals)
+        self.weight = 1
+        self.gray = gray and not self.sample and self.orbits is None
+        self.scores = None
         # Useful for iteration later on
         self.rules = ['Kem', 'KN', 'Maxham', 'Maxeq']
         self.rulesComb = ['KemKN', 'KemMaxham', 'KemMaxeq', 'KN-Maxham', 'KN-Maxeq']
         self.outcomes = []
         self.idxs_outcomes = []
+        self.counts = None
+        self.stats = None
+        self.curve = None
+        self.done = None
+        self.checkpoint = checkpoint
+        self.seed = np.random.SeedSequence().entropy if seed is None else seed
+        self.given_seed = seed
+        # Sampled profiles are drawn and evaluated in batches of batch_size (such
+        # that the arrays of BFSolver.batch_scores have about 2^22 entries).
+        self.batch_size = max(1, 2**22 // (len(scenario.in_consistent) * len(scenario.out_consistent)))
+        self.winners = None
 
-    def result(self, verbose=True):
+    def result(self, verbose=True, workers:int=1):
         """ 
         all_ex: If True all examples are printed; otherwise, only the ones with different outcomes.
         num_ex: Maximal number of examples to be printed.
@@ -39,17 +69,128 @@ class Compare_Kemnash():
         time_an: If True time (comparison) analysis is executed.
         show_res: Dictionary with results is printed (in a nice format).
         simulate: If self.prof_tot > simulate, a profile (multiset) is simulated as random 
-                permutation. (To prevent RAM overflow.)"""
+                permutation. (To prevent RAM overflow.)
+        workers: number of processes, every process sweeps a shard of the profiles.
+        All lambdas are evaluated in a single pass over the (sampled) profiles."""
+        self.load_seed('sweep', workers)
+        acc = parallel.sweep(self, 'sweep', [(worker, workers) for worker in range(workers)], workers)
+        cumQuans, cumQuals = acc.counts
+        return self.process_results(cumQuans, cumQuals)
+
+    def sweep(self, shard=(0, 1)):
+        """Sweep over shard (worker, workers) of the profiles (see iter_profiles).
+        Returns an Accumulator with counts [cumQuans, cumQuals], one dict per lambda."""
         ########    GROUNDWORK    ########
-        # Random seed
-        random.seed(time.time())
-        # Variable to show time estimation (after 60s).
-        first_pass = True
-        prof_done = 0
         # Convenient shorthands
-        bfs = BFSolver(binrep=False, idx_rep=True)
+        bfs = BFSolver(binrep=False, idx_rep=True, maskrep=True)
+        # Initialise dictionaries to keep counts during profile iterations, one per lambda.
+        cumQuans, cumQuals = zip(*[self.init_cums() for lamb in self.lambs])
+        acc = self.load_shard('sweep', shard, parallel.Accumulator([list(cumQuans), list(cumQuals)]))
+        cumQuans, cumQuals = acc.counts
+
+        ########    ITERATE THROUGH PROFILES, FOR EVERY PROFILE ALL LAMBDAS    ########
+        for _ in self.iter_profiles(*shard, acc.num_profs):
+            if self.gray:
+                idxs_kem, idxs_kns, idxs_maxham, idxs_maxeq = self.scores.winners_lambs(self.lambs)
+                self.stats = self.scores.stats()
+            elif self.sample:
+                # Evaluated with the batch of the profile (see sample_batches).
+                idxs_kem, idxs_kns, idxs_maxham, idxs_maxeq = self.winners
+            else:
+                # Using the modified Jaggpy solvers to compute outcomes of profile.
+                idxs_kem, idxs_kns, idxs_maxham, idxs_maxeq = bfs.solve_all_lambs(
+                    self.scenario, self.counts, self.lambs)
+                self.stats = self.profile_stats()
+            # Qualitative measures of rules independent of lambda are shared.
+            self.set_shared(idxs_kem, idxs_maxham, idxs_maxeq)
+            for idxl in range(len(self.lambs)):
+                self.analysis(idxs_kns[idxl], cumQuans[idxl], cumQuals[idxl])
+            acc.num_profs += 1
+            self.save_shard('sweep', shard, acc)
+        acc.add_range(*self.done)
+        self.save_shard('sweep', shard, acc, force=True)
+        return acc
+
+    def result_parametric(self, lambs:list=None, workers:int=1):
+        """ADDED. Instead of a fixed grid of lambdas, computes for every profile the exact
+        values of lambda at which the lamb-kemnash winners change (see 
+        IncrementalScores.kemnash_envelope) and accumulates the counts as exact piecewise
+        constant functions of lambda (self.curve, a LambCurve). Returns the result 
+        dictionary (as result()) evaluated at lambs (default self.lambs)."""
+        if lambs is None:
+            lambs = self.lambs
+        cumQuan, cumQual = self.init_cums()
+        self.load_seed('parametric', workers)
+        acc = parallel.sweep(self, 'sweep_parametric', [(worker, workers) for worker in range(workers)], workers)
+        self.curve = acc.curve
+        cumQuans, cumQuals = [], []
+        for lamb in lambs:
+            values = self.curve.value(lamb)
+            cumQuans.append({label: values[label] for label in cumQuan})
+            cumQuals.append({label: values[label] for label in cumQual})
+        return self.process_results(cumQuans, cumQuals)
+
+    def sweep_parametric(self, shard=(0, 1)):
+        """Sweep over shard (worker, workers) of the profiles for result_parametric. 
+        Returns an Accumulator with curve."""
+        cumQuan, cumQual = self.init_cums()
+        acc = parallel.Accumulator()
+        acc.curve = LambCurve(list(cumQuan) + list(cumQual))
+        acc = self.load_shard('parametric', shard, acc)
+        for _ in self.iter_profiles(*shard, acc.num_profs):
+            if not self.gray:
+                if self.scores is None:
+                    self.scores = IncrementalScores(self.scenario, self.counts, [])
+                else:
+                    self.scores.reset(self.counts)
+            idxs_kem, _, idxs_maxham, idxs_maxeq = self.scores.winners_lambs([])
+            self.stats = self.scores.stats()
+            self.set_shared(idxs_kem, idxs_maxham, idxs_maxeq)
+            idxs_zero, idxs_init, breaks = self.scores.kemnash_envelope()
+            acc.curve.add(self.cum_vector(idxs_zero), self.cum_vector(idxs_init), 
+                [(key, log_lamb, self.cum_vector(idxs_point), self.cum_vector(idxs_after)) 
+                for key, log_lamb, idxs_point, idxs_after in breaks])
+            acc.num_profs += 1
+            self.save_shard('parametric', shard, acc)
+        acc.add_range(*self.done)
+        self.save_shard('parametric', shard, acc, force=True)
+        return acc
 
-        # Initialise dictionaries to keep counts during profile iterations for current lambda.
+    def checkpoint_key(self, mode:str, workers:int):
+        """Describes the run, a checkpoint is only resumed by the same run. The seed
+        only describes a sample, and only if it is given (see load_seed)."""
+        seed = self.given_seed if self.sample else None
+        return (mode, workers, tuple(self.lambs), self.sample, seed, self.gray, self.orbits is not None, self.prof_test, 
+            self.scenario.number_voters, tuple(self.scenario.in_consistent), tuple(self.scenario.out_consistent))
+
+    def load_seed(self, mode:str, workers:int):
+        """ADDED. A resumed sample continues with the seed saved in the checkpoint (part
+        'main'); otherwise the seed is saved."""
+        if self.checkpoint is None or not self.sample:
+            return
+        key = self.checkpoint_key(mode, workers)
+        seed = self.checkpoint.load('main', key)
+        if seed is None:
+            self.checkpoint.save('main', key, self.seed, force=True)
+        else:
+            self.seed = seed
+
+    def load_shard(self, mode:str, shard, acc):
+        """Returns accumulator of shard (worker, workers) saved in checkpoint, or acc 
+        if there is none. A resumed sample continues with the same seed (see load_seed)."""
+        if self.checkpoint is not None:
+            state = self.checkpoint.load(shard[0], self.checkpoint_key(mode, shard[1]))
+            if state is not None:
+                return state['acc']
+        return acc
+
+    def save_shard(self, mode:str, shard, acc, force:bool=False):
+        """Saves accumulator (after acc.num_profs profiles of shard)."""
+        if self.checkpoint is not None:
+            self.checkpoint.save(shard[0], self.checkpoint_key(mode, shard[1]), {'acc': acc}, force)
+
+    def init_cums(self):
+        """Dictionaries to keep counts during profile iterations (for single lambda)."""
         cumQuan = {}
         cumQual = {}
         for rule in self.rules:
@@ -60,8 +201,117 @@ class Compare_Kemnash():
             for rule in self.rules:
                 cumQual[count+rule] = 0 
         cumQual['ZE'] = 0
+        return cumQuan, cumQual
 
-        # Initialise dictionary to append results for single lambda
+    def iter_profiles(self, worker:int=0, workers:int=1, offset:int=0):
+        """Iterates through (or samples) the profiles of shard worker (out of workers
+        shards), skipping the first offset profiles. At every step the profile is in 
+        self.counts, or in self.scores if self.gray; sampled profiles are evaluated 
+        already (self.winners and self.stats)."""
+        # Variable to show time estimation (after 60s).
+        first_pass = worker == 0
+        prof_done = 0
+        # Positions (in order of the sweep: ranks, minimal change order, orbits or samples).
+        num_positions = self.prof_test if self.orbits is None else len(self.orbits)
+        start = worker * num_positions // workers
+        prof_shard = (worker + 1) * num_positions // workers - start
+        self.done = (start, start + prof_shard)
+        start, prof_shard = start + offset, prof_shard - offset
+        num_consistent = len(self.scenario.in_consistent)
+        t0 = time.time()
+        if self.gray:
+            # Shards are consecutive blocks of the minimal change order. The first 
+            # profile of the block is gray_start after the moves of the previous blocks,
+            # every next index is a move of one judge.
+            counts = profiles.gray_start(num_consistent, self.scenario.number_voters)
+            moves = profiles.gray_moves(num_consistent, self.scenario.number_voters)
+            for src, dst in itertools.islice(moves, start):
+                counts[src] -= 1
+                counts[dst] += 1
+            self.scores = IncrementalScores(self.scenario, counts, self.lambs)
+            self.indices = itertools.chain([None], itertools.islice(moves, prof_shard - 1)) if prof_shard else []
+        elif self.orbits is not None:
+            self.indices = self.orbits[start:start + prof_shard]
+        elif not self.sample:
+            self.indices = profiles.ProfileRange(num_consistent, self.scenario.number_voters, 
+                start, start + prof_shard)
+        else:
+            self.indices = self.sample_batches(worker, offset, prof_shard)
+
+        for index in self.indices:
+            if self.gray:
+                if index is not None:
+                    self.scores.move(*index)
+            elif self.sample:
+                self.counts, self.winners, self.stats = index
+            else:
+                if self.orbits is not None:
+                    index, self.weight = index
+                # Constructing profile (as counts) corresponding to index
+                self.counts = np.bincount(index, minlength=num_consistent)
+            yield index
+
+            ###  TIMER  ###
+            # After 60s it will give an estimate of duration
+            prof_done += 1
+            t = time.time()
+            if t - t0 > 30 and first_pass:
+                time_est = int((prof_shard * (t - t0)) / (prof_done * 60))
+                # Modified: in positions (orbit representatives if symmetry) of the shard.
+                unit = ' profiles' if self.orbits is None else ' orbit representatives'
+                print('TIME INDICATION: '+str(prof_done)+'/'+str(prof_shard) + unit + ' took ' +\
+                str(int(t-t0))+'s. Estimate total time: ' + str(time_est) + 'min.')
+                first_pass = False
+
+    def sample_batches(self, worker:int, offset:int, num:int):
+        """Samples num profiles of shard worker, after the first offset, in batches: every
+        judge picks a judgement of in_consistent uniformly, so a batch is a single 
+        multinomial draw (a count matrix) and is evaluated at once (see 
+        BFSolver.solve_all_lambs_batch). Batch b of worker is drawn with seed 
+        (self.seed, worker, b), hence a resumed shard continues with the same profiles.
+        Yields (counts, winners, stats) for every profile."""
+        bfs = BFSolver(binrep=False, idx_rep=True, maskrep=True)
+        num_consistent = len(self.scenario.in_consistent)
+        probs = np.full(num_consistent, 1 / num_consistent)
+        batch, skip = divmod(offset, self.batch_size)
+        while num > 0:
+            rng = np.random.default_rng([self.seed, worker, batch])
+            counts = rng.multinomial(self.scenario.number_voters, probs, size=self.batch_size)[skip:skip + num]
+            winners = bfs.solve_all_lambs_batch(self.scenario, counts, self.lambs)
+            agr_sums, agr_mins, agr_maxDists = bfs.scores
+            stats = agr_stats(self.scenario.number_voters, agr_sums, counts @ self.scenario.agr_table**2,
+                agr_mins, agr_maxDists)
+            for row in range(len(counts)):
+                yield counts[row], winners[row], [stat[row] for stat in stats]
+            num -= len(counts)
+            batch += 1
+            skip = 0
+
+    def set_shared(self, idxs_kem, idxs_maxham, idxs_maxeq):
+        """Outcomes and measures of the rules that do not depend on lambda."""
+        self.shared = [set(idxs_kem), set(idxs_maxham), set(idxs_maxeq)]
+        self.shared_measures = {rule: self.measures(idxs) for rule, idxs in 
+            zip(['Kem', 'Maxham', 'Maxeq'], self.shared)}
+
+    def analysis(self, idxs_kn, cumQuan, cumQual):
+        """Updates counts with current profile, for Kemeny-Nash outcomes idxs_kn."""
+        idxs_kem, idxs_maxham, idxs_maxeq = self.shared
+        self.idxs = [idxs_kem, set(idxs_kn), idxs_maxham, idxs_maxeq]
+        measures = dict(self.shared_measures)
+        measures['KN'] = self.measures(self.idxs[1])
+        #  Updating quantitative analysis dict 
+        self.quantitative_analysis(cumQuan)
+        #  Updating qualitative analysis dict
+        self.qualitative_analysis(cumQual, measures)
+
+    def cum_vector(self, idxs_kn):
+        """Counts of current profile alone as a vector (ordered as self.curve.labels)."""
+        cumQuan, cumQual = self.init_cums()
+        self.analysis(idxs_kn, cumQuan, cumQual)
+        return np.array(list(cumQuan.values()) + list(cumQual.values()), dtype=float)
+
+    def process_results(self, cumQuans, cumQuals):
+        """Result dictionary from counts, every value a list with an entry per lambda."""
         final = {}
         for comb in self.rulesComb:
             final['symdif'+comb] = []
@@ -70,52 +320,7 @@ class Compare_Kemnash():
         final.update({'R-meanKN':[], 'R-meanMaxham':[], 'R-meanMaxeq': [], 'R-lowKem':[], 'R-lowKN':[]})
         final.update({'R-maxdistKem':[], 'R-maxdistKN':[], 'ZE':[], 'SD-KNKem':[]})
         final.update({'meanKN':[], 'SDKN':[], 'lowKN':[], 'maxdistKN':[]})
-
-        ########    FOR EVERY LAMBDA ITERATE THROUGH PROFILES    ########
-        t0 = time.time()
-        for idxl,lamb in enumerate(self.lambs):
-            # Empty cumulative dicts.
-            for label in cumQuan:
-                cumQuan[label] = 0
-            for label in cumQual:
-                cumQual[label] = 0
-            if not self.sample:
-                self.indices = itertools.combinations_with_replacement(
-                    range(len(self.scenario.in_consistent)), self.scenario.number_voters)
-
-            for index in self.indices:
-                if self.sample:
-                    # Get random multiset index
-                    pool = tuple(self.scenario.out_consistent)
-                    num_consistent = len(pool)
-                    index = tuple(sorted(random.choices(range(num_consistent), k=self.scenario.number_voters)))
-                # Constructing profile corresponding to index
-                self.scenario.profile = []
-                for i in range(len(self.scenario.in_consistent)):
-                    num_occur = list(index).count(i)
-                    if num_occur > 0:
-                        self.scenario.profile.append([num_occur, utils.jdict_to_js(self.scenario.in_consistent[i])])
-
-                # Using the modified Jaggpy solvers to compute outcomes of profile.
-                self.idxs, self.outcomes = bfs.all_outcomes(self.scenario, "all_rules", lamb)
-                self.idxs = [set(idxs) for idxs in self.idxs]
-
-                #  Updating quantitative analysis dict 
-                cumQuan = self.quantitative_analysis(cumQuan)
-                #  Updating qualitative analysis dict
-                cumQual = self.qualitative_analysis(cumQual)
-
-                ###  TIMER  ###
-                # After 60s it will give an estimate of duration
-                prof_done += 1
-                t = time.time()
-                if t - t0 > 30 and first_pass and idxl == 0:
-                    time_est = int((len(self.lambs) * self.prof_test * (t - t0)) / (prof_done * 60))
-                    print('TIME INDICATION: '+str(prof_done)+'/'+str(self.prof_test) + ' took ' +\
-                    str(int(t-t0))+'s. Estimate total time: ' + str(time_est) + 'min.')
-                    first_pass = False
-
-            ############    PROCESSING RESULTS    ############
+        for cumQuan, cumQual in zip(cumQuans, cumQuals):
             for comb in self.rulesComb:
                 final['symdif'+comb].append(((cumQuan['symdif'+comb]) / float(self.prof_test)) / len(self.scenario.out_consistent))
             for rule in self.rules:
@@ -136,35 +341,254 @@ class Compare_Kemnash():
         return final
 
     def quantitative_analysis(self, cumQuan):
-        """Updates counts necessary for symmetric difference computations"""
+        """Updates counts necessary for symmetric difference computations (times 
+        self.weight, the number of profiles the current profile stands for)."""
         # Adding number of solutions.
         for idx,rule in enumerate(self.rules):
-            cumQuan['sol'+rule] += len(self.idxs[idx])
+            cumQuan['sol'+rule] += self.weight * len(self.idxs[idx])
         idxKem, idxKN, idxMaxham, idxMaxeq = self.idxs
         idxs1 = [idxKem, idxKem, idxKem, idxKN, idxKN]
         idxs2 = [idxKN, idxMaxham, idxMaxeq, idxMaxham, idxMaxeq]
         for idx,comb in enumerate(self.rulesComb):
-            cumQuan['symdif'+comb] += len(idxs1[idx].symmetric_difference(idxs2[idx]))
+            cumQuan['symdif'+comb] += self.weight * len(idxs1[idx].symmetric_difference(idxs2[idx]))
         return cumQuan
 
-    def qualitative_analysis(self, cumQual):
-        """Comparing utalitarian and egalitarian measures."""
-        # Computations. 
-        agr_msets = [[utils.agr(self.scenario, out) for out in outcomes] for outcomes in self.outcomes] 
-        means = [[sum(agr_mset)/float(len(agr_mset)) for agr_mset in agr_mseti] for agr_mseti in agr_msets] 
-        dists2 = [[[(agr_msets[ridx][oidx][nidx] - means[ridx][oidx])**2 for nidx in range(self.scenario.number_voters)]
-            for oidx in range(len(self.outcomes[ridx]))] for ridx in range(len(self.rules))] 
-        SDs = [[math.sqrt(sum(dists)/float(len(dists))) for dists in dists2i] for dists2i in dists2]
-        lows = [[min(agr_mset) for agr_mset in agr_mseti] for agr_mseti in agr_msets]
-        maxdists = [[max(agr_msets[ridx][oidx]) - min(agr_msets[ridx][oidx]) for oidx in range(
-            len(self.outcomes[ridx]))] for ridx in range(len(self.rules))]
+    def profile_stats(self):
+        """Means, standard deviations, minima and spreads of the agreements of every 
+        outcome with the current profile (self.counts)."""
+        table = self.scenario.agr_table
+        agr_present = table[self.counts > 0]
+        agr_mins = agr_present.min(axis=0)
+        return agr_stats(self.scenario.number_voters, self.counts @ table, self.counts @ table**2,
+            agr_mins, agr_present.max(axis=0) - agr_mins)
+
+    def measures(self, idxs):
+        """Lists [means, SDs, lows, maxdists] over the outcomes with indices idxs."""
+        return [[stat[idx] for idx in idxs] for stat in self.stats]
+
+    def qualitative_analysis(self, cumQual, measures):
+        """Comparing utalitarian and egalitarian measures. The measures of the outcomes
+        of every rule are computed by self.measures (counts are times self.weight)."""
         # Zero effect
-        ZE = float([min([bool(SDs[1][KNIdx] > SDs[0][KemIdx]) for KemIdx in range(len(self.outcomes[0]))])
-            for KNIdx in range(len(self.outcomes[1]))].count(True) / len(self.outcomes[1]))
-        for idx,rule in enumerate(self.rules):
-            cumQual['mean'+rule] += sum(means[idx])/float(len(means[idx]))
-            cumQual['SD'+rule] += sum(SDs[idx])/float(len(SDs[idx]))
-            cumQual['low'+rule] += sum(lows[idx])/float(len(lows[idx]))
-            cumQual['maxdist'+rule] += sum(maxdists[idx])/float(len(maxdists[idx]))
-        cumQual['ZE'] += ZE
-        return cumQual
\ No newline at end of file
+        SDsKem, SDsKN = measures['Kem'][1], measures['KN'][1]
+        ZE = float([min([bool(SDKN > SDKem) for SDKem in SDsKem]) for SDKN in SDsKN].count(True) / len(SDsKN))
+        for rule in self.rules:
+            means, SDs, lows, maxdists = measures[rule]
+            cumQual['mean'+rule] += self.weight * sum(means)/float(len(means))
+            cumQual['SD'+rule] += self.weight * sum(SDs)/float(len(SDs))
+            cumQual['low'+rule] += self.weight * sum(lows)/float(len(lows))
+            cumQual['maxdist'+rule] += self.weight * sum(maxdists)/float(len(maxdists))
+        cumQual['ZE'] += self.weight * ZE
+        return cumQual
+
+
+def agr_stats(num_voters, sums, sqsums, mins, maxdists):
+    """Returns means, standard deviations, minima and spreads of the agreements of
+    every outcome (as lists indexed by outcome) from (integer) arrays with sums, sums 
+    of squares, minima and spreads."""
+    means = (sums / float(num_voters)).tolist()
+    # Variance times num_voters^2 is an integer; computed exactly.
+    SDs = (np.sqrt(num_voters * sqsums - sums ** 2) / num_voters).tolist()
+    return means, SDs, mins.tolist(), maxdists.tolist()
+
+
+class IncrementalScores():
+    """ADDED. Scores of every feasible outcome for a profile (counts over 
+    scenario.in_consistent) that changes one judge at a time. For every outcome it
+    keeps the sum and the sum of squares of the agreements, the histogram of the
+    agreements (for minima and spreads), and the product of the non-zero agreements as 
+    exponents of its prime factors, i.e. an exact Kemeny-Nash log-product. A move
+    costs O(#outcomes), independent of the number of judges and rational judgements."""
+
+    def __init__(self, scenario, counts, lambs:list):
+        self.table = scenario.agr_table
+        self.sq_table = self.table ** 2
+        self.num_issues = scenario.num_issues
+        self.range_out = np.arange(self.table.shape[1])
+        # Primes of all (non-zero) agreements and of all λ (as exact fractions).
+        lamb_fracs = {lamb: utils.lamb_fraction(lamb) for lamb in lambs}
+        numbers = list(range(1, self.num_issues + 1))
+        for frac in lamb_fracs.values():
+            if frac > 0:
+                numbers += [frac.numerator, frac.denominator]
+        self.primes = sorted({prime for number in numbers for prime in utils.prime_factors(number)})
+        self.log_primes = np.log(np.array(self.primes, dtype=float))
+        self.lamb_exps = {lamb: np.array(utils.prime_exponents(frac, self.primes) if frac > 0 
+            else [0] * len(self.primes), dtype=np.int64) for lamb, frac in lamb_fracs.items()}
+        agr_exps = [utils.prime_exponents(agr, self.primes) if agr > 0 else [0] * len(self.primes)
+            for agr in range(self.num_issues + 1)]
+        self.exp_table = np.array(agr_exps, dtype=np.int64)[self.table]
+        self.reset(counts)
+
+    def reset(self, counts):
+        """Computes scores of profile counts from scratch."""
+        self.num_voters = int(counts.sum())
+        self.sums = counts @ self.table
+        self.sqsums = counts @ self.sq_table
+        self.exps = np.tensordot(counts, self.exp_table, axes=1)
+        self.hist = np.zeros((len(self.range_out), self.num_issues + 1), dtype=np.int64)
+        for idx in np.flatnonzero(counts):
+            self.hist[self.range_out, self.table[idx]] += counts[idx]
+
+    def move(self, src, dst):
+        """A judge changes judgement in_consistent[src] to in_consistent[dst]."""
+        self.sums += self.table[dst] - self.table[src]
+        self.sqsums += self.sq_table[dst] - self.sq_table[src]
+        self.exps += self.exp_table[dst] - self.exp_table[src]
+        self.hist[self.range_out, self.table[src]] -= 1
+        self.hist[self.range_out, self.table[dst]] += 1
+
+    def update_ranges(self):
+        """Minimal agreement and spread (max - min agreement) of every outcome."""
+        self.mins = np.argmax(self.hist > 0, axis=1)
+        maxs = self.num_issues - np.argmax(self.hist[:, ::-1] > 0, axis=1)
+        self.maxdists = maxs - self.mins
+
+    def exact_argmax(self, exps, tol=1e-9):
+        """Positions of the rows of exps (exponent vectors w.r.t. self.primes) with maximal
+        product: the rows within tol (relative) of the maximal log-product are compared
+        exactly (as Fractions), as in BFSolver.kemnash_idxs."""
+        logs = exps @ self.log_primes
+        max_log = logs.max()
+        near = np.flatnonzero(logs >= max_log - tol * max(1, abs(max_log)))
+        if len(near) == 1:
+            return near
+        prods = [self.exact_prod(exps[pos]) for pos in near]
+        max_prod = max(prods)
+        return near[np.array([value == max_prod for value in prods])]
+
+    def exact_prod(self, exps):
+        """The product of self.primes to the powers exps (a Fraction)."""
+        return math.prod((Fraction(prime) ** int(exp) for prime, exp in zip(self.primes, exps)),
+            start=Fraction(1))
+
+    def kemnash_winners(self, lamb, tol=1e-9):
+        """Outcomes maximising the product of agreements (zero agreement counts as λ).
+        Products within tol of the maximum are compared exactly (see exact_argmax)."""
+        zeros = self.hist[:, 0]
+        if lamb == 0:
+            cands = np.flatnonzero(zeros == 0)
+            # If every outcome has a judge with zero agreement, all products are zero.
+            if len(cands) == 0:
+                return self.range_out
+            exps = self.exps[cands]
+        else:
+            cands = self.range_out
+            exps = self.exps + np.outer(zeros, self.lamb_exps[lamb])
+        return cands[self.exact_argmax(exps, tol)]
+
+    def kemnash_envelope(self):
+        """For lambda > 0 the log-product of outcome o is log(C_o) + z_o * log(lambda), 
+        with C_o the product of non-zero agreements and z_o the number of judges with zero
+        agreement: the lamb-kemnash winners follow the upper envelope of these lines. 
+        Returns (idxs_zero, idxs_init, breaks): the winners for lambda = 0, for lambda 
+        slightly above 0 and for every lambda at which the winners change, in increasing
+        order, (key, log_lamb, idxs_point, idxs_after): the winners at and just after 
+        that lambda. Such lambda equals (C_a/C_b)^(1/(z_b-z_a)); key is its exact 
+        representation (utils.root_key)."""
+        zeros = self.hist[:, 0]
+        logs = self.exps @ self.log_primes
+        # Lambda near 0: minimal number of zero agreements, then maximal product.
+        cands = np.flatnonzero(zeros == zeros.min())
+        winners = cands[self.exact_argmax(self.exps[cands])]
+        idxs_init = winners.tolist()
+        # For lambda = 0 products with a zero agreement are 0 (all outcomes win if all are).
+        idxs_zero = idxs_init if zeros.min() == 0 else self.range_out.tolist()
+        breaks = []
+        while True:
+            win = winners[0]
+            steeper = np.flatnonzero(zeros > zeros[win])
+            if len(steeper) == 0:
+                break
+            # Intersections (in log lambda) of the winning line with steeper lines.
+            diffs = zeros[steeper] - zeros[win]
+            log_lambs = (logs[win] - logs[steeper]) / diffs
+            min_log = log_lambs.min()
+            near = np.flatnonzero(log_lambs <= min_log + 1e-9 * max(1, abs(min_log)))
+            # The first intersection is decided exactly: (C_a/C_b)^(1/d) <= (C_a/C_c)^(1/e)
+            # iff (C_a/C_b)^e <= (C_a/C_c)^d; exact ties have the same keys.
+            ratios = {idx: self.exact_prod(self.exps[win] - self.exps[steeper[idx]]) for idx in near}
+            def compare(i, j):
+                left, right = ratios[i] ** int(diffs[j]), ratios[j] ** int(diffs[i])
+                return (left > right) - (left < right)
+            first = min(near, key=functools.cmp_to_key(compare))
+            keys = {idx: utils.root_key(
+                self.primes, self.exps[win] - self.exps[steeper[idx]], diffs[idx])
+                for idx in near}
+            tied = [steeper[idx] for idx in near if keys[idx] == keys[first]]
+            # After the intersection the steepest of the tied lines wins. 
+            max_zeros = max(zeros[tied])
+            idxs_point = sorted(winners.tolist() + [int(idx) for idx in tied])
+            winners = np.array([idx for idx in tied if zeros[idx] == max_zeros])
+            breaks.append((keys[first], float(log_lambs[first]), idxs_point, winners.tolist()))
+        return idxs_zero, idxs_init, breaks
+
+    def winners_lambs(self, lambs:list):
+        """Returns indices of outcomes [Kemeny, [Kemeny-Nash for every lamb], MaxHam, MaxEq]."""
+        self.update_ranges()
+        idxs_kem = np.flatnonzero(self.sums == self.sums.max()).tolist()
+        idxs_maxham = np.flatnonzero(self.mins == self.mins.max()).tolist()
+        idxs_maxeq = np.flatnonzero(self.maxdists == self.maxdists.min()).tolist()
+        idxs_kns = [self.kemnash_winners(lamb).tolist() for lamb in lambs]
+        return [idxs_kem, idxs_kns, idxs_maxham, idxs_maxeq]
+
+    def stats(self):
+        """Returns means, standard deviations, minima and spreads of the agreements
+        of every outcome (as lists indexed by outcome). Call after winners_lambs."""
+        return agr_stats(self.num_voters, self.sums, self.sqsums, self.mins, self.maxdists)
+
+
+class LambCurve():
+    """ADDED. Counts (a vector, entries named by labels) accumulated over profiles as 
+    exact piecewise constant functions of lambda. The pieces of a profile are given by 
+    its value at lambda = 0, just after 0, and at and just after every breakpoint 
+    (see IncrementalScores.kemnash_envelope). Breakpoints are stored by exact key."""
+
+    def __init__(self, labels:list):
+        self.labels = labels
+        self.at_zero = np.zeros(len(labels))
+        self.start = np.zeros(len(labels))
+        # key -> [log lambda, jump after breakpoint, jump at breakpoint]
+        self.jumps = {}
+
+    def add(self, vec_zero, vec_init, breaks:list):
+        """Adds a profile. breaks is a list of (key, log_lamb, vec_point, vec_after)."""
+        self.at_zero += vec_zero
+        self.start += vec_init
+        vec_before = vec_init
+        for key, log_lamb, vec_point, vec_after in breaks:
+            if key not in self.jumps:
+                self.jumps[key] = [log_lamb, np.zeros(len(self.labels)), np.zeros(len(self.labels))]
+            self.jumps[key][1] += vec_after - vec_before
+            self.jumps[key][2] += vec_point - vec_before
+            vec_before = vec_after
+
+    def breakpoints(self):
+        """Sorted list of the lambdas at which the counts change (lambda = 0 excluded)."""
+        return sorted(math.exp(jump[0]) for jump in self.jumps.values())
+
+    def value(self, lamb):
+        """Dictionary label: count at lambda = lamb."""
+        if lamb == 0:
+            values = self.at_zero
+        else:
+            key = utils.number_key(utils.lamb_fraction(lamb))
+            log_lamb = math.log(utils.lamb_fraction(lamb))
+            values = self.start.copy()
+            for key_b, (log_b, jump, point) in self.jumps.items():
+                if key_b == key:
+                    values += point
+                elif log_b < log_lamb:
+                    values += jump
+        return dict(zip(self.labels, values.tolist()))
+
+    def merge(self, other):
+        """Adds the counts of LambCurve other (with the same labels)."""
+        self.at_zero += other.at_zero
+        self.start += other.start
+        for key, (log_lamb, jump, point) in other.jumps.items():
+            if key not in self.jumps:
+                self.jumps[key] = [log_lamb, np.zeros(len(self.labels)), np.zeros(len(self.labels))]
+            self.jumps[key][1] += jump
+            self.jumps[key][2] += point
+        return self
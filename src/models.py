@@ -0,0 +1,253 @@
+#####################################################################
+## ADDED. Compiled enumeration of the judgements consistent with the
+## constraints. Formulas are parsed once (see Parser.parse_sentence) and
+## compiled to a tree of tuples; the models are enumerated directly as
+## bitmasks (see utils.jdict_to_mask) instead of listing all models of
+## one large nnf formula.
+#####################################################################
+
+from functools import reduce
+import numpy as np
+
+# Nodes of compiled formulas: ('var', name), ('not', node), ('and', [nodes]),
+# ('or', [nodes]) and ('const', bool).
+TRUE = ('const', True)
+
+def compile_parsed(parsed, labels:dict=None):
+    """Compiles a formula parsed by Parser.parse_sentence. Variables in labels (a
+    dictionary name: compiled formula, e.g. l1 for issue 1) are replaced by their
+    formula."""
+    if isinstance(parsed, str):
+        if labels is not None and parsed in labels:
+            return labels[parsed]
+        return ('var', parsed)
+    if parsed[0] == '~':
+        return ('not', compile_parsed(parsed[1], labels))
+    if len(parsed) == 1:
+        return compile_parsed(parsed[0], labels)
+    operator = parsed[1]
+    args = [compile_parsed(arg, labels) for arg in parsed[0::2]]
+    if operator == '->':
+        return ('or', [('not', args[0]), args[1]])
+    return ('and' if operator == '&' else 'or', args)
+
+def compile_formula(parser, formula:str, labels:dict=None):
+    """Compiles formula (a string); see compile_parsed."""
+    return compile_parsed(parser.parse_sentence(formula), labels)
+
+def conjunction(nodes:list):
+    return ('and', nodes) if nodes else TRUE
+
+def variables(node):
+    """Set of the variables in node."""
+    if node[0] == 'var':
+        return {node[1]}
+    if node[0] == 'const':
+        return set()
+    if node[0] == 'not':
+        return variables(node[1])
+    return set().union(*[variables(arg) for arg in node[1]])
+
+def partial_value(node, env:dict):
+    """Value (True/False) of node if it is decided by the partial assignment env
+    (name: bool), otherwise None."""
+    kind = node[0]
+    if kind == 'var':
+        return env.get(node[1])
+    if kind == 'const':
+        return node[1]
+    if kind == 'not':
+        value = partial_value(node[1], env)
+        return None if value is None else not value
+    decided = kind == 'or'
+    result = not decided
+    for arg in node[1]:
+        value = partial_value(arg, env)
+        if value is decided:
+            return decided
+        if value is None:
+            result = None
+    return result
+
+def evaluate(node, env:dict):
+    """Value of node for env: name -> bool or array of bools (one entry per
+    assignment); arrays are combined elementwise."""
+    kind = node[0]
+    if kind == 'var':
+        return env[node[1]]
+    if kind == 'const':
+        return node[1]
+    if kind == 'not':
+        return np.logical_not(evaluate(node[1], env))
+    combine = np.logical_and if kind == 'and' else np.logical_or
+    return reduce(combine, [evaluate(arg, env) for arg in node[1]])
+
+def enumerate_masks(constraint, formulas:list, names:list, block_bits:int=16):
+    """Sorted list of the masks (bit of formulas[0] most significant) of the
+    assignments to the variables names that satisfy constraint. The last block_bits
+    variables are evaluated at once for all their assignments (as arrays); the
+    others are branched on, and branches in which constraint is already false are
+    pruned."""
+    num_issues = len(formulas)
+    names = sorted(set(names) | variables(constraint) | set().union(*[variables(f) for f in formulas]),
+        key=lambda name: names.index(name) if name in names else len(names))
+    num_low = min(len(names), block_bits)
+    high, low = names[:len(names) - num_low], names[len(names) - num_low:]
+    assignments = np.arange(2 ** num_low)
+    low_env = {name: ((assignments >> pos) & 1).astype(bool) for pos, name in enumerate(low)}
+    masks = set()
+
+    def search(env, pos):
+        if partial_value(constraint, env) is False:
+            return
+        if pos < len(high):
+            for value in [False, True]:
+                search({**env, high[pos]: value}, pos + 1)
+            return
+        full_env = {**env, **low_env}
+        satisfied = np.broadcast_to(evaluate(constraint, full_env), assignments.shape)
+        mask = np.zeros(len(assignments), dtype=np.int64)
+        for issue, formula in enumerate(formulas):
+            value = np.broadcast_to(evaluate(formula, full_env), assignments.shape)
+            mask |= value.astype(np.int64) << (num_issues - 1 - issue)
+        masks.update(np.unique(mask[satisfied]).tolist())
+
+    search({}, 0)
+    return sorted(masks)
+
+#####################################################################
+## COUNTING. The number of consistent judgements (and of antipodal pairs 
+## among them) without enumerating them: the constraints and the issues are
+## compiled to a reduced ordered binary decision diagram (BDD), the variables
+## are quantified away and the remaining assignments to the issues counted.
+#####################################################################
+
+class BDD:
+    """Reduced ordered BDD over the levels 0, 1, ..; nodes are ints: 0 (false),
+    1 (true) or indices of (level, low, high) in self.nodes."""
+
+    def __init__(self, num_levels:int):
+        self.num_levels = num_levels
+        self.nodes = [(num_levels, None, None), (num_levels, None, None)]
+        self.unique = {}
+        self.memo = {}
+
+    def level(self, node):
+        return self.nodes[node][0]
+
+    def make(self, level, low, high):
+        """The (unique) node of level with children low (level false) and high."""
+        if low == high:
+            return low
+        key = (level, low, high)
+        if key not in self.unique:
+            self.unique[key] = len(self.nodes)
+            self.nodes.append(key)
+        return self.unique[key]
+
+    def var(self, level):
+        return self.make(level, 0, 1)
+
+    def cofactors(self, node, level):
+        node_level, low, high = self.nodes[node]
+        return (low, high) if node_level == level else (node, node)
+
+    def apply(self, operator:str, node1, node2):
+        """Conjunction ('and'), disjunction ('or') or equivalence ('iff') of two nodes."""
+        if operator == 'and':
+            if node1 == 0 or node2 == 0:
+                return 0
+            if node1 == 1 or node1 == node2:
+                return node2
+            if node2 == 1:
+                return node1
+        elif operator == 'or':
+            if node1 == 1 or node2 == 1:
+                return 1
+            if node1 == 0 or node1 == node2:
+                return node2
+            if node2 == 0:
+                return node1
+        elif node1 == node2:
+            return 1
+        elif node1 < 2 and node2 < 2:
+            return 0
+        key = (operator, min(node1, node2), max(node1, node2))
+        if key not in self.memo:
+            level = min(self.level(node1), self.level(node2))
+            low1, high1 = self.cofactors(node1, level)
+            low2, high2 = self.cofactors(node2, level)
+            self.memo[key] = self.make(level, self.apply(operator, low1, low2), 
+                self.apply(operator, high1, high2))
+        return self.memo[key]
+
+    def negate(self, node):
+        return self.apply('iff', node, 0)
+
+    def build(self, node, levels:dict):
+        """BDD of a compiled formula (see compile_parsed); levels: name -> level."""
+        kind = node[0]
+        if kind == 'var':
+            return self.var(levels[node[1]])
+        if kind == 'const':
+            return int(node[1])
+        if kind == 'not':
+            return self.negate(self.build(node[1], levels))
+        return reduce(lambda result, arg: self.apply(kind, result, self.build(arg, levels)), 
+            node[1], int(kind == 'and'))
+
+    def exists(self, node, quantified:set, memo=None):
+        """The node with the levels in quantified existentially quantified."""
+        memo = {} if memo is None else memo
+        if node < 2:
+            return node
+        if node not in memo:
+            level, low, high = self.nodes[node]
+            low, high = self.exists(low, quantified, memo), self.exists(high, quantified, memo)
+            memo[node] = self.apply('or', low, high) if level in quantified else self.make(level, low, high)
+        return memo[node]
+
+    def flip(self, node, memo=None):
+        """The node with every level negated (assignments complemented)."""
+        memo = {} if memo is None else memo
+        if node < 2:
+            return node
+        if node not in memo:
+            level, low, high = self.nodes[node]
+            memo[node] = self.make(level, self.flip(high, memo), self.flip(low, memo))
+        return memo[node]
+
+    def count(self, node, counted:list):
+        """Number of assignments to the levels in counted (sorted) satisfying node, a
+        node over these levels only (e.g. the others are quantified)."""
+        position = {level: pos for pos, level in enumerate(counted)}
+        position[self.num_levels] = len(counted)
+        memo = {0: 0, 1: 1}
+
+        def count_from(node):
+            if node not in memo:
+                level, low, high = self.nodes[node]
+                memo[node] = sum(count_from(child) << (position[self.level(child)] - position[level] - 1)
+                    for child in [low, high])
+            return memo[node]
+        return count_from(node) << position[self.level(node)]
+
+def count_masks(constraint, formulas:list, names:list):
+    """Number of masks of the assignments to the variables names that satisfy
+    constraint (i.e. len(enumerate_masks(..))) and number of antipodal pairs (mask
+    and its complement) among them; the masks are not enumerated (see BDD). Every 
+    issue is ordered just above the (new) variables of its formula."""
+    order = []
+    for issue, formula in enumerate(formulas):
+        order.append(issue)
+        order += sorted(variables(formula) - set(order), key=lambda name: names.index(name) if name in names else len(names))
+    order += sorted(variables(constraint) - set(order))
+    levels = {name: level for level, name in enumerate(order)}
+    bdd = BDD(len(order))
+    node = bdd.build(constraint, levels)
+    for issue, formula in enumerate(formulas):
+        node = bdd.apply('and', node, bdd.apply('iff', bdd.var(levels[issue]), bdd.build(formula, levels)))
+    issues = [levels[issue] for issue in range(len(formulas))]
+    node = bdd.exists(node, set(levels.values()) - set(issues))
+    antipodal = bdd.apply('and', node, bdd.flip(node))
+    return bdd.count(node, issues), bdd.count(antipodal, issues) // 2
@@ -0,0 +1,139 @@
+#####################################################################
+## ADDED. Parallel sweeps over the profile space. A sweep over a shard of
+## the profiles results in an Accumulator; accumulators of shards are merged
+## (associatively) into the result of the full sweep.
+#####################################################################
+
+import os, pickle, time
+from concurrent.futures import ProcessPoolExecutor
+
+class Accumulator():
+    """Mergeable counts of a sweep over (a shard of) the profiles:
+    counts: (nested) dictionaries/lists of numbers, merged by addition;
+    maxima, minima: dictionaries label: (value, payload), merged by max/min of value;
+    examples: list of examples, merged by concatenation (at most num_ex);
+    curve: None or object with method merge (e.g. lamb_iter.LambCurve);
+    ranges: sorted disjoint ranges [start, stop) of positions of the profiles done, 
+        e.g. ranks (see profiles.multiset_rank), merged by union."""
+
+    def __init__(self, counts=None, num_ex:int=0):
+        self.counts = counts
+        self.num_profs = 0
+        self.maxima = {}
+        self.minima = {}
+        self.examples = []
+        self.num_ex = num_ex
+        self.curve = None
+        self.ranges = []
+
+    def add_max(self, label, value, payload=None):
+        if label not in self.maxima or value > self.maxima[label][0]:
+            self.maxima[label] = (value, payload)
+
+    def add_min(self, label, value, payload=None):
+        if label not in self.minima or value < self.minima[label][0]:
+            self.minima[label] = (value, payload)
+
+    def add_example(self, example):
+        if len(self.examples) < self.num_ex:
+            self.examples.append(example)
+
+    def add_range(self, start, stop):
+        self.ranges = merge_ranges(self.ranges + [(start, stop)])
+
+    def merge(self, other):
+        """Adds accumulator other to self (and returns self)."""
+        self.counts = merge_counts(self.counts, other.counts)
+        self.num_profs += other.num_profs
+        for label, (value, payload) in other.maxima.items():
+            self.add_max(label, value, payload)
+        for label, (value, payload) in other.minima.items():
+            self.add_min(label, value, payload)
+        self.ranges = merge_ranges(self.ranges + other.ranges)
+        for example in other.examples:
+            self.add_example(example)
+        if self.curve is None:
+            self.curve = other.curve
+        elif other.curve is not None:
+            self.curve.merge(other.curve)
+        return self
+
+class Checkpoint():
+    """Periodic checkpoints of sweeps, for resuming killed runs. Every part (e.g. 
+    worker) of a sweep saves its state (accumulator, position, random state) to its 
+    own file path.part, together with a key describing the run: a checkpoint is only
+    loaded by a run with the same key."""
+
+    def __init__(self, path:str, every:float=300, resume:bool=False):
+        """path: prefix of checkpoint files; every: minimal number of seconds between
+        saves; resume: if True saved states are loaded."""
+        self.path = path
+        self.every = every
+        self.resume = resume
+        self.last_save = {}
+
+    def file(self, part):
+        return '{}.{}'.format(self.path, part)
+
+    def load(self, part, key):
+        """Saved state of part, or None if there is none (or not resuming)."""
+        if not self.resume or not os.path.exists(self.file(part)):
+            return None
+        with open(self.file(part), 'rb') as file:
+            saved = pickle.load(file)
+        if saved['key'] != key:
+            raise Exception (f"Checkpoint {self.file(part)} belongs to a different run.")
+        return saved['state']
+
+    def save(self, part, key, state, force:bool=False):
+        """Saves state of part if force or if the last save is long enough ago. The 
+        file is replaced atomically, so a killed run leaves a valid checkpoint."""
+        now = time.time()
+        if part not in self.last_save:
+            self.last_save[part] = now
+        if not force and now - self.last_save[part] < self.every:
+            return
+        tmp = self.file(part) + '.tmp'
+        with open(tmp, 'wb') as file:
+            pickle.dump({'key': key, 'state': state}, file)
+        os.replace(tmp, self.file(part))
+        self.last_save[part] = now
+
+def merge_counts(counts1, counts2):
+    """Sum of two (nested) dictionaries/lists of numbers with the same structure."""
+    if counts1 is None:
+        return counts2
+    if isinstance(counts1, dict):
+        return {key: merge_counts(value, counts2[key]) for key, value in counts1.items()}
+    if isinstance(counts1, (list, tuple)):
+        return [merge_counts(value1, value2) for value1, value2 in zip(counts1, counts2)]
+    return counts1 + counts2
+
+def merge_ranges(ranges:list):
+    """Union of ranges [start, stop) as sorted list of disjoint ranges."""
+    merged = []
+    for start, stop in sorted(ranges):
+        if start >= stop:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(stop, merged[-1][1]))
+        else:
+            merged.append((start, stop))
+    return merged
+
+def sweep_shard(obj, method:str, shard):
+    """Runs obj.method(shard) (in a worker process)."""
+    return getattr(obj, method)(shard)
+
+def sweep(obj, method:str, shards:list, workers:int=1):
+    """Runs obj.method(shard) for every shard, with a pool of workers processes if
+    workers > 1, and returns the merged accumulators. obj is pickled to every worker."""
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            accs = list(executor.map(sweep_shard, [obj] * len(shards), [method] * len(shards), shards))
+    else:
+        accs = [sweep_shard(obj, method, shard) for shard in shards]
+    acc = accs[0]
+    for other in accs[1:]:
+        acc.merge(other)
+    return acc
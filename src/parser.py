@@ -11,9 +11,117 @@
 ## It has been altered for this application.
 #####################################################################
 
+from functools import lru_cache
 from pyparsing import infixNotation, opAssoc, Keyword, Word, alphanums, ParserElement
 from nnf import Var, Or, And # pylint: disable=unused-import
 
+# Modified: the node classes and the grammar are defined once (at import) instead 
+# of at every call of parse_sentence; results of the Parser methods are memoised
+# (per process, at most CACHE_SIZE distinct arguments per method).
+CACHE_SIZE = 4096
+
+ParserElement.enablePackrat()
+
+# Define classes to be built at parse time, as each matching
+# expression type is parsed. Each class has a as_list method
+# that returns itself and its elements in list representation
+# (recursively).
+class BoolOperand:
+    """The class BoolOperand"""
+    def __init__(self, t):
+        self.label = t[0]
+
+    def __str__(self) -> str:
+        return self.label
+
+    __repr__ = __str__
+
+    def as_list(self):
+        return self.label
+
+class BoolNot:
+    """The class for negations."""
+    def __init__(self, t):
+        self.arg = t[0][1]
+
+    def __str__(self) -> str:
+        return "~" + str(self.arg)
+
+    __repr__ = __str__
+
+    def as_list(self):
+        return ["~", self.arg.as_list()]
+
+class BoolBinOp:
+    """The parent class for binary operations."""
+    repr_symbol: str = ""
+
+    def __init__(self, t):
+        self.args = t[0][0::2]
+
+    def __str__(self) -> str:
+        sep = " %s " % self.repr_symbol
+        return "(" + sep.join(map(str, self.args)) + ")"
+
+
+class BoolAnd(BoolBinOp):
+    """The class for conjunctions."""
+    repr_symbol = "&"
+    def as_list(self):
+        """Returns list of conjuncts with '&' symbol."""
+        result = []
+        for argument in self.args:
+            result.append(argument.as_list())
+            result.append("&")
+        result = result[:-1]
+        return result
+
+class BoolOr(BoolBinOp):
+    """The class disjunctions."""
+    repr_symbol = "|"
+    def as_list(self):
+        """Return list of disjuncts with '|' symbol."""
+        result = []
+        for argument in self.args:
+            result.append(argument.as_list())
+            result.append("|")
+        result = result[:-1]
+        return result
+
+class BoolImplies(BoolBinOp):
+    """The class for implications."""
+    repr_symbol = "->"
+    def as_list(self):
+        """Return implications in list form with '->' symbol."""
+        return [self.args[0].as_list(), "->", self.args[1].as_list()]
+
+# Define what the operator symbols mean
+NOT = Keyword("~")
+AND = Keyword("&")
+OR = Keyword("|")
+IMPLIES = Keyword("->")
+
+# Atoms can be alphanumerals
+bool_operand = Word(alphanums)
+bool_operand.setParseAction(BoolOperand).setName("bool_operand")
+
+bool_expr = infixNotation(
+bool_operand,
+[
+    # Define precedence of operations
+    (NOT, 1, opAssoc.RIGHT, BoolNot),
+    (OR, 2, opAssoc.LEFT, BoolOr),
+    (AND, 2, opAssoc.LEFT, BoolAnd),
+    (IMPLIES, 2, opAssoc.LEFT, BoolImplies)
+],
+)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_prepared(prep_sentence):
+    """The parse object of a sentence (with spaces after negations)."""
+    return bool_expr.parseString(prep_sentence)[0]
+
+
 class Parser:
     """A parser class for parsing formulas."""
     def parse_sentence(self, sentence):
@@ -24,114 +132,21 @@ class Parser:
         prep_sentence = sentence.split("~")
         prep_sentence = "~ ".join(prep_sentence)
 
-        ParserElement.enablePackrat()
-
-		# Define classes to be built at parse time, as each matching
-		# expression type is parsed. Each class has a as_list method
-		# that returns itself and its elements in list representation
-		# (recursively).
-        class BoolOperand:
-            """The class BoolOperand"""
-            def __init__(self, t):
-                self.label = t[0]
-
-            def __str__(self) -> str:
-                return self.label
-
-            __repr__ = __str__
-
-            def as_list(self):
-                return self.label
-
-        class BoolNot:
-            """The class for negations."""
-            def __init__(self, t):
-                self.arg = t[0][1]
-
-            def __str__(self) -> str:
-                return "~" + str(self.arg)
-
-            __repr__ = __str__
-
-            def as_list(self):
-                return ["~", self.arg.as_list()]
-
-        class BoolBinOp:
-            """The parent class for binary operations."""
-            repr_symbol: str = ""
-
-            def __init__(self, t):
-                self.args = t[0][0::2]
-
-            def __str__(self) -> str:
-                sep = " %s " % self.repr_symbol
-                return "(" + sep.join(map(str, self.args)) + ")"
-
-
-        class BoolAnd(BoolBinOp):
-            """The class for conjunctions."""
-            repr_symbol = "&"
-            def as_list(self):
-                """Returns list of conjuncts with '&' symbol."""
-                result = []
-                for argument in self.args:
-                    result.append(argument.as_list())
-                    result.append("&")
-                result = result[:-1]
-                return result
-
-        class BoolOr(BoolBinOp):
-            """The class disjunctions."""
-            repr_symbol = "|"
-            def as_list(self):
-                """Return list of disjuncts with '|' symbol."""
-                result = []
-                for argument in self.args:
-                    result.append(argument.as_list())
-                    result.append("|")
-                result = result[:-1]
-                return result
-
-        class BoolImplies(BoolBinOp):
-            """The class for implications."""
-            repr_symbol = "->"
-            def as_list(self):
-                """Return implications in list form with '->' symbol."""
-                return [self.args[0].as_list(), "->", self.args[1].as_list()]
-
-        # Define what the operator symbols mean
-        NOT = Keyword("~")
-        AND = Keyword("&")
-        OR = Keyword("|")
-        IMPLIES = Keyword("->")
-
-        # Atoms can be alphanumerals
-        bool_operand = Word(alphanums)
-        bool_operand.setParseAction(BoolOperand).setName("bool_operand")
-
-        bool_expr = infixNotation(
-        bool_operand,
-        [
-            # Define precedence of operations
-            (NOT, 1, opAssoc.RIGHT, BoolNot),
-            (OR, 2, opAssoc.LEFT, BoolOr),
-            (AND, 2, opAssoc.LEFT, BoolAnd),
-            (IMPLIES, 2, opAssoc.LEFT, BoolImplies)
-        ],
-        )
-
-        # Create a parse object
-        parsed_sentence = bool_expr.parseString(prep_sentence)[0]
-
-        # Return the parsed sentence as a list
+        # Create a parse object (memoised)
+        parsed_sentence = parse_prepared(prep_sentence)
+
+        # Return the parsed sentence as a list (a new one, it may be changed)
         return parsed_sentence.as_list()
 
-    def to_nnf(self, sentence):
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def to_nnf(sentence):
         """Given a formula as a string, returns a string of the
-        formula converted to NNF."""
+        formula converted to NNF. (Memoised.)"""
         # Parse the sentence and then convert it to NNF
-        parsed = self.parse_sentence(sentence)
-        nnf = self.to_nnf_parsed(parsed)
+        parser = Parser()
+        parsed = parser.parse_sentence(sentence)
+        nnf = parser.to_nnf_parsed(parsed)
         return nnf
 
     def to_nnf_parsed(self, sentence):
@@ -214,7 +229,16 @@ class Parser:
         The function needs a formula/sentence as a string and a list of all
         variables occuring in the sentence. It returns the CNF formula and
         an updated list of all occurring variables.
+        Modified: memoised (see to_cnf_cached), the returned set is a new one.
         """
+        formula_str, all_variables = self.to_cnf_cached(sentence, frozenset(variables))
+        return [formula_str, set(all_variables)]
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def to_cnf_cached(sentence, variables):
+        """ADDED. Body of to_cnf (the original one), memoised; variables is a frozenset
+        and the occurring variables are returned as frozenset."""
         my_string = sentence
         all_variables = set()
 
@@ -262,25 +286,32 @@ class Parser:
                 disjunct_counter += 1
             list_of_conjuncts.append(conj)
         if len(formula) == 1:
-            return [list_of_conjuncts[0], all_variables]
+            return (list_of_conjuncts[0], frozenset(all_variables))
         formula_str = "( "
         for i, value in enumerate(list_of_conjuncts):
             if i < len(list_of_conjuncts) - 1:
                 formula_str = formula_str + value + " & "
             else:
                 formula_str = formula_str + value + " )"
-        return [formula_str, all_variables]
+        return (formula_str, frozenset(all_variables))
 
     def translate_agenda(self, agenda):
         """Given a (sub)-agenda returns a list of constraints. For each issue a
         constraint is added of the form (label -> formula) and (formula -> label).
-        Both are made sure to be NNF formulas. """
+        Both are made sure to be NNF formulas.
+        Modified: memoised (see translate_items), the returned list is a new one."""
+        return list(self.translate_items(tuple(agenda.items())))
+
+    @staticmethod
+    @lru_cache(maxsize=CACHE_SIZE)
+    def translate_items(items):
+        """ADDED. Body of translate_agenda for the items (label, formula) of the agenda,
+        memoised."""
         new_constraints = []
-        for label in agenda.keys():
+        for label, formula in items:
             label_var = f'l{label}'
-            formula = agenda[label]
             new_constraints.append(f'~{label_var} | {formula}')
             # Modified: in general negation of nnf formula is not nnf.
-            neg_formula = self.to_nnf(f'~ ({formula})')
+            neg_formula = Parser.to_nnf(f'~ ({formula})')
             new_constraints.append(f'{neg_formula} | {label_var}')
-        return new_constraints
\ No newline at end of file
+        return tuple(new_constraints)
@@ -0,0 +1,277 @@
+#####################################################################
+## ADDED. Enumeration of the profile space. A profile is a multiset of
+## number_voters judgements out of scenario.in_consistent, represented as
+## counts: counts[i] is the number of judges with judgement in_consistent[i].
+#####################################################################
+
+import random
+import numpy as np
+from math import comb, prod
+import src.utils as utils
+
+def gray_start(num_judgements, num_voters):
+    """First profile of gray_moves: all judges have judgement 0."""
+    counts = np.zeros(num_judgements, dtype=np.int64)
+    counts[0] = num_voters
+    return counts
+
+def gray_moves(num_judgements, num_voters):
+    """Minimal change enumeration of all profiles. Starting from gray_start, every
+    profile is visited exactly once and consecutive profiles differ by a single judge
+    moving from judgement src to judgement dst; the moves (src, dst) are yielded.
+    Recursively, G(m,k) (profiles of m judges over judgements 0..k-1) starts at
+    (m,0,..,0) and ends at (0,..,0,m): it visits j = 0..m judges with judgement k-1,
+    and for each j runs through G(m-j,k-1), alternately forward and backward."""
+    # Explicit stack (instead of recursive generators) to keep cost per move constant.
+    # Items are either moves (src, dst) or blocks (m, k, forward).
+    stack = [(num_voters, num_judgements, True)]
+    while stack:
+        item = stack.pop()
+        if len(item) == 2:
+            yield item
+            continue
+        m, k, forward = item
+        if m == 0 or k == 1:
+            continue
+        items = []
+        if forward:
+            for j in range(m + 1):
+                items.append((m - j, k - 1, j % 2 == 0))
+                if j < m:
+                    # Block j ended at (0,..,0,m-j) if forward, else at (m-j,0,..,0).
+                    items.append((k - 2 if j % 2 == 0 else 0, k - 1))
+        else:
+            for j in range(m, -1, -1):
+                items.append((m - j, k - 1, j % 2 == 1))
+                if j > 0:
+                    items.append((k - 1, k - 2 if (j - 1) % 2 == 0 else 0))
+        stack.extend(reversed(items))
+
+####  RANKING  ####
+# Profiles as indices (non-decreasing tuples of positions in in_consistent, as 
+# generated by itertools.combinations_with_replacement) are ranked in that order, 
+# i.e. lexicographically, by the combinatorial number system.
+def multiset_rank(index, num_judgements):
+    """Rank of index among the profiles of len(index) judges."""
+    rank = 0
+    prev = 0
+    num_voters = len(index)
+    for pos, value in enumerate(index):
+        rest = num_voters - pos - 1
+        # Number of completions for all values in prev..value-1 at position pos.
+        rank += comb(num_judgements - prev + rest, rest + 1) - comb(num_judgements - value + rest, rest + 1)
+        prev = value
+    return rank
+
+def multiset_unrank(rank, num_judgements, num_voters):
+    """Index (tuple) of the profile with rank rank; inverse of multiset_rank."""
+    if not 0 <= rank < utils.multiset_coefficient(num_judgements, num_voters):
+        raise Exception (f"Rank {rank} is out of range.")
+    index = []
+    value = 0
+    for pos in range(num_voters):
+        rest = num_voters - pos - 1
+        # Skip values with fewer preceding profiles than rank.
+        while True:
+            num_completions = comb(num_judgements - value + rest - 1, rest)
+            if rank < num_completions:
+                break
+            rank -= num_completions
+            value += 1
+        index.append(value)
+    return tuple(index)
+
+def next_multiset(index:list, num_judgements):
+    """Changes index (list) into the profile with the next rank. Returns False if 
+    index was the last profile."""
+    for pos in range(len(index) - 1, -1, -1):
+        if index[pos] < num_judgements - 1:
+            value = index[pos] + 1
+            index[pos:] = [value] * (len(index) - pos)
+            return True
+    return False
+
+def counts_to_index(counts):
+    """Index (tuple) of a profile given as counts."""
+    return tuple(np.repeat(np.arange(len(counts)), counts).tolist())
+
+
+class ProfileRange():
+    """The profiles with ranks start, .., stop-1 (of num_voters judges over 
+    num_judgements judgements) as a sequence of indices; contiguous slices are again 
+    ProfileRanges, so a range can be split for workers without enumerating it."""
+
+    def __init__(self, num_judgements, num_voters, start=0, stop=None):
+        self.num_judgements = num_judgements
+        self.num_voters = num_voters
+        num_profs = utils.multiset_coefficient(num_judgements, num_voters)
+        self.start = start
+        self.stop = num_profs if stop is None else min(stop, num_profs)
+
+    def __len__(self):
+        return max(self.stop - self.start, 0)
+
+    def __iter__(self):
+        if len(self) == 0:
+            return
+        index = list(multiset_unrank(self.start, self.num_judgements, self.num_voters))
+        for _ in range(len(self)):
+            yield tuple(index)
+            next_multiset(index, self.num_judgements)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise Exception ("Only contiguous slices of a ProfileRange are supported.")
+            return ProfileRange(self.num_judgements, self.num_voters, self.start + start, self.start + max(stop, start))
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("ProfileRange index out of range")
+        return multiset_unrank(self.start + item, self.num_judgements, self.num_voters)
+
+####  SYMMETRY  ####
+# Bounds of orbit_representatives: the number of entries of the table of all
+# automorphisms (one byte each for at most 256 judgements), and the number of orbits
+# (at least the number of profiles divided by the number of automorphisms).
+MAX_GROUP_ENTRIES = 2**28
+MAX_ORBITS = 10**7
+
+def group_elements(num_judgements, transversals:list):
+    """ADDED. All elements of the group with the given transversals (lists of 
+    permutations of the judgements per level of a stabiliser chain, without the 
+    identity, see Scenario.compute_automorphisms): the products of one element (or the
+    identity) per level. Returned as array group with group[judgement, element] the 
+    image of judgement under element."""
+    order = prod(len(transversal) + 1 for transversal in transversals)
+    if order * num_judgements > MAX_GROUP_ENTRIES:
+        raise Exception (f"The {order} automorphisms of {num_judgements} judgements are too many "\
+            f"to enumerate (at most {MAX_GROUP_ENTRIES} entries).")
+    dtype = np.uint8 if num_judgements <= 2**8 else np.int64
+    group = np.empty((num_judgements, order), dtype=dtype)
+    group[:, 0] = np.arange(num_judgements)
+    size = 1
+    for transversal in reversed(transversals):
+        for num, perm in enumerate(transversal, 1):
+            group[:, num * size:(num + 1) * size] = np.array(perm, dtype=dtype)[group[:, :size]]
+        size *= len(transversal) + 1
+    return group
+
+def orbit_representatives(num_judgements, num_voters, transversals:list):
+    """ADDED. Orbits of the profiles under the automorphisms of the judgements given by
+    transversals (see group_elements, e.g. scenario.aut_in_transversals). Returns a list
+    of (index, orbit size) with one profile per orbit: the one with the lowest rank 
+    (the lexicographically smallest index), in order of rank. The representatives are
+    generated directly (orderly generation): the first k judgements of a 
+    representative are again a representative, so representatives of k+1 judges are
+    the representatives of k judges extended by a judgement (not smaller than their
+    last one) for which the result is the smallest of its orbit (see canonical_stabilisers).
+    The profiles are not enumerated; raises an Exception if there are more than 
+    MAX_ORBITS orbits (estimated)."""
+    order = prod(len(transversal) + 1 for transversal in transversals)
+    if utils.multiset_coefficient(num_judgements, num_voters) > MAX_ORBITS * order:
+        raise Exception (f"The profiles of {num_voters} judges have more than {MAX_ORBITS} "\
+            f"orbits under the {order} automorphisms; use a sample instead of symmetry.")
+    group = group_elements(num_judgements, transversals)
+    generators = np.array([perm for transversal in transversals for perm in transversal], 
+        dtype=group.dtype).reshape(-1, num_judgements).T
+    # Smallest judgement in the orbit of every judgement.
+    orbit_mins = group.min(axis=1)
+    orbits = [((), order)]
+    for _ in range(num_voters):
+        extended = []
+        for index, _ in orbits:
+            for value, stabiliser in canonical_stabilisers(group, generators, orbit_mins, index):
+                extended.append((index + (value,), order // stabiliser))
+        orbits = extended
+    return orbits
+
+def smaller_images(images, index):
+    """ADDED. Whether sorted(g(index)) < index (lexicographically) for an element g, 
+    given the images g(index) as columns of images, and the number of elements with 
+    sorted(g(index)) = index."""
+    images = np.sort(images.T, axis=1)
+    differ = images != index
+    first = differ.argmax(axis=1)
+    rows_differ = np.flatnonzero(differ.any(axis=1))
+    smaller = (images[rows_differ, first[rows_differ]] < index[first[rows_differ]]).any()
+    return smaller, len(images) - len(rows_differ)
+
+def canonical_stabilisers(group, generators, orbit_mins, prefix:tuple):
+    """ADDED. For the smallest index prefix in its orbit (see orbit_representatives), 
+    yields (value, stabiliser) for every value (not smaller than the last of prefix)
+    such that index = prefix + (value,) is the smallest in its orbit, with stabiliser
+    the number of elements g of group with sorted(g(index)) = index. Most other values
+    are excluded by the generators already; otherwise only the elements mapping a 
+    judgement of index onto index[0] can give an image not larger than index and 
+    their images are compared with index."""
+    # Elements mapping a judgement of prefix onto prefix[0].
+    prefix_rows = np.zeros(group.shape[1], dtype=bool)
+    if prefix:
+        prefix_rows = group[list(prefix)].min(axis=0) == prefix[0]
+    for value in range(prefix[-1] if prefix else 0, len(group)):
+        index = np.array(prefix + (value,))
+        if orbit_mins[value] < index[0] or smaller_images(generators[index], index)[0]:
+            continue
+        rows = np.flatnonzero(prefix_rows | (group[value] == index[0]))
+        smaller, stabiliser = smaller_images(group[np.ix_(index, rows)], index)
+        if not smaller:
+            yield value, stabiliser
+
+####  SAMPLING  ####
+def sample_ranks(num_profs, k, rng=random):
+    """ADDED. k distinct ranks drawn uniformly from range(num_profs), sorted, in O(k) 
+    memory (Floyd's algorithm); rng is a random.Random (default the random module)."""
+    if k > num_profs:
+        raise Exception (f"Cannot draw {k} distinct profiles out of {num_profs}.")
+    chosen = set()
+    for top in range(num_profs - k, num_profs):
+        rank = rng.randrange(top + 1)
+        chosen.add(top if rank in chosen else rank)
+    return sorted(chosen)
+
+
+class ProfileSample():
+    """ADDED. The profiles with the given (sorted) ranks as a sequence of indices, 
+    unranked lazily; slices are again ProfileSamples."""
+
+    def __init__(self, num_judgements, num_voters, ranks:list):
+        self.num_judgements = num_judgements
+        self.num_voters = num_voters
+        self.ranks = ranks
+
+    def __len__(self):
+        return len(self.ranks)
+
+    def __iter__(self):
+        for rank in self.ranks:
+            yield multiset_unrank(rank, self.num_judgements, self.num_voters)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return ProfileSample(self.num_judgements, self.num_voters, self.ranks[item])
+        return multiset_unrank(self.ranks[item], self.num_judgements, self.num_voters)
+
+
+class ProfileSimulation():
+    """ADDED. Sequence of size random profiles, every judge drawing a judgement 
+    uniformly (with the random module, when iterated); slices are again 
+    ProfileSimulations. Not uniform over the profiles, but needs no ranks."""
+
+    def __init__(self, num_judgements, num_voters, size:int):
+        self.num_judgements = num_judgements
+        self.num_voters = num_voters
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for _ in range(self.size):
+            yield tuple(sorted(random.choices(range(self.num_judgements), k=self.num_voters)))
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise Exception ("Profiles of a ProfileSimulation are only drawn when iterated.")
+        return ProfileSimulation(self.num_judgements, self.num_voters, len(range(*item.indices(self.size))))
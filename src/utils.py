@@ -1,10 +1,6 @@
-from functools import reduce
-from math import sqrt, factorial
+from math import sqrt, factorial, prod
 from fractions import Fraction
-import itertools
-import copy
-from nnf import Var, Or, And
-from .parser import Parser
+import numpy as np
 
 ####  SWITCHING REPRESENTATION JUDGEMENT ####
 # jdict to..
@@ -39,13 +35,47 @@ def js_to_jdict(scenario, js):
 def js_to_bin(scenario, js):
     ordered_jdict = js_to_jdict(scenario, js)
     return jdict_to_bin(ordered_jdict)
+def js_to_mask(scenario, js):
+    """The js (list of accepted issues) as bitmask (see jdict_to_mask)."""
+    mask = 0
+    for issue in scenario.agenda.values():
+        mask = (mask << 1) | (issue in js)
+    return mask
+
+####  BITMASK REPRESENTATION JUDGEMENT ####
+# A judgement is represented by an int (mask) with one bit per issue: the first
+# issue of the agenda is the most significant bit. Hence the mask written in binary
+# (with num_issues digits) is the bin string, and sorting masks sorts bin strings.
+# Dictionaries, lists and strings are only produced when presenting results.
+def jdict_to_mask(ordered_jdict):
+    mask = 0
+    for value in ordered_jdict.values():
+        mask = (mask << 1) | bool(value)
+    return mask
+def mask_to_bin(mask, num_issues):
+    return format(mask, f'0{num_issues}b')
+def mask_to_jdict(scenario, mask):
+    """Returns the (ordered) judgement dictionary of mask."""
+    jdict = {}
+    for pos, issue in enumerate(scenario.agenda.values()):
+        jdict[issue] = bool((mask >> (scenario.num_issues - 1 - pos)) & 1)
+    return jdict
+def mask_to_js(scenario, mask):
+    """Returns the list of accepted issues of mask."""
+    return [issue for pos, issue in enumerate(scenario.agenda.values())
+        if (mask >> (scenario.num_issues - 1 - pos)) & 1]
+def popcount(mask):
+    return bin(mask).count('1')
+def agr_masks(mask1, mask2, num_issues):
+    """Number of issues on which the judgements mask1 and mask2 agree."""
+    return num_issues - popcount(mask1 ^ mask2)
 
 ####  SWITCHING REPRESENTATION PROFILE ####
 def prof_mset_bin(scenario):
     sup = str.maketrans("0123456789", "⁰¹²³⁴⁵⁶⁷⁸⁹")
     profile = []
     for mult_js in scenario.profile:
-        profile.append(js_to_bin(scenario, mult_js[1])+str(mult_js[0]).translate(sup))
+        profile.append(mask_to_bin(mult_js[1], scenario.num_issues)+str(mult_js[0]).translate(sup))
     return profile
 def prof_mset(prof):
     sup = str.maketrans("0123456789", "⁰¹²³⁴⁵⁶⁷⁸⁹")
@@ -83,15 +113,13 @@ def all_jdicts_bin(all_jdicts):
     for jdict in all_jdicts.values():
         binlist.append(jdict_to_bin(jdict))
     return binlist
-def count_consistentOpp(all_jdicts):
+def count_consistentOpp(all_masks, num_issues):
     """
-    all_jdicts contains all consistent judgment sets we count
+    all_masks contains all consistent judgments (as bitmasks) we count
     the number of *pairs* that are antipodal"""
-    countOpp = 0
-    for idx1,idx2 in itertools.combinations(range(len(all_jdicts)), 2):
-        if revert_jdict(all_jdicts[idx1], all_jdicts[idx2]):
-            countOpp += 1
-    return countOpp
+    full = (1 << num_issues) - 1
+    all_masks = set(all_masks)
+    return sum((mask ^ full) in all_masks for mask in all_masks) // 2
 
 ####  OPERATIONS ON (COLLECTIONS OF) OUTCOMES ####
 def clean_outcome(agenda, outcomes):
@@ -108,30 +136,115 @@ def clean_outcome(agenda, outcomes):
     # Remove duplicates from outcomes.
     final = [dict(t) for t in {tuple(outcome.items()) for outcome in outcomes}]
     return final
-def agr(scenario, outcome:dict, lamb=0):
-    """ADDED. The function gets an agenda and profile (j1, ..., jn), and jdict J 
+def agr(scenario, outcome:int, lamb=0, counts=None):
+    """ADDED. The function gets an agenda and profile (j1, ..., jn), and mask J 
     (i.e., canditate [clean] outcome. It computes a list 
-    agr_vec=[j_1\cap J + lamb,..., jn \cap J + lamb]) """
-    agr_vec = []
-    for js_pair in scenario.profile:
-        score = 0
-        times_occur = js_pair[0]
-        js = js_pair[1]
-        for formula in scenario.agenda.values():
-            if formula in js and outcome[formula]==True:
-                score += 1
-            elif formula not in js and outcome[formula]==False:
-                score += 1
-        if score == 0:
-            score = lamb
-        agr_vec.extend([score] * times_occur)
+    agr_vec=[j_1\cap J + lamb,..., jn \cap J + lamb]). Scores are read from
+    scenario.agr_table; counts (see Scenario.profile_counts) can be passed
+    to prevent recomputation."""
+    if counts is None:
+        counts = scenario.profile_counts()
+    out_idx = scenario.out_index[outcome]
+    return agr_idx(scenario, out_idx, counts, lamb)
+def agr_idx(scenario, out_idx:int, counts, lamb=0):
+    """As agr, but for outcome scenario.out_consistent[out_idx]."""
+    agr_vec = np.repeat(scenario.agr_table[:, out_idx], counts).tolist()
+    if lamb != 0:
+        agr_vec = [score if score != 0 else lamb for score in agr_vec]
     return agr_vec
 
+####  AGREEMENT HISTOGRAMS  ####
+# ADDED. hist[a] is the number of judges with agreement a (0..num_issues) with an 
+# outcome; measures are computed from the histogram, so cost is independent of the 
+# number of judges.
+def agr_hist(scenario, outcome:int, counts=None):
+    """Histogram of the agreements of the judges in the profile (or counts) with
+    mask outcome."""
+    if counts is None:
+        counts = scenario.profile_counts()
+    return agr_hist_idx(scenario, scenario.out_index[outcome], counts)
+def agr_hist_idx(scenario, out_idx:int, counts):
+    """As agr_hist, but for outcome scenario.out_consistent[out_idx]."""
+    return np.bincount(scenario.agr_table[:, out_idx], weights=counts, 
+        minlength=scenario.num_issues + 1).astype(np.int64)
+def hist_size(hist):
+    return int(hist.sum())
+def hist_sum(hist):
+    return int(hist @ np.arange(len(hist)))
+def hist_mean(hist):
+    return hist_sum(hist) / float(hist_size(hist))
+def hist_sd(hist):
+    """Standard deviation, computed exactly from integer sums."""
+    num = hist_size(hist)
+    return sqrt(num * int(hist @ np.arange(len(hist))**2) - hist_sum(hist)**2) / num
+def hist_min(hist):
+    return int(np.flatnonzero(hist)[0])
+def hist_max(hist):
+    return int(np.flatnonzero(hist)[-1])
+def hist_mean_dist(hist):
+    """Mean of the distances to the mean agreement."""
+    mean = hist_mean(hist)
+    return sum(mult * abs(agr - mean) for agr, mult in enumerate(hist.tolist()) if mult) / float(hist_size(hist))
+def hist_num_below(hist):
+    """Number of judges with agreement less than the mean agreement."""
+    mean = hist_mean(hist)
+    return sum(mult for agr, mult in enumerate(hist.tolist()) if agr - mean < 0)
+def hist_prod(hist, lamb=0):
+    """Exact product of agreements, zero agreement is replaced by lamb (integer or
+    Fraction, see lamb_fraction)."""
+    hist = hist.tolist()
+    return lamb ** hist[0] * prod(agr ** mult for agr, mult in enumerate(hist) if agr > 0)
+def hist_mset(hist):
+    """let hist = [3,0,2], then hist_mset(hist) = [0^3, 2^2] (see mset)"""
+    sup = str.maketrans("0123456789", "⁰¹²³⁴⁵⁶⁷⁸⁹")
+    return [str(agr)+str(mult).translate(sup) for agr, mult in enumerate(hist.tolist()) if mult]
+
+####  EXACT ARITHMETIC  ####
+def prime_factors(number:int):
+    """Returns dictionary {prime: multiplicity} for positive integer number."""
+    factors = {}
+    prime = 2
+    while prime * prime <= number:
+        while number % prime == 0:
+            factors[prime] = factors.get(prime, 0) + 1
+            number //= prime
+        prime += 1
+    if number > 1:
+        factors[number] = factors.get(number, 0) + 1
+    return factors
+def prime_exponents(number, primes:list):
+    """Exponent vector of positive integer or Fraction number w.r.t. primes (which
+    has to contain all prime factors of number). Products of numbers are compared
+    exactly by comparing (sums of) exponent vectors."""
+    number = Fraction(number)
+    exps = [0] * len(primes)
+    for prime, mult in prime_factors(number.numerator).items():
+        exps[primes.index(prime)] += mult
+    for prime, mult in prime_factors(number.denominator).items():
+        exps[primes.index(prime)] -= mult
+    return exps
+def lamb_fraction(lamb):
+    """Exact value used for λ, the same as in asp_rules."""
+    return Fraction(lamb).limit_denominator()
+def root_key(primes:list, exps, root:int=1):
+    """Exact (hashable) key of the positive real number prod(primes^exps)^(1/root): 
+    tuple of (prime, Fraction exponent) for the non-zero exponents. Equal numbers 
+    have equal keys."""
+    return tuple((prime, Fraction(int(exp), int(root))) for prime, exp in zip(primes, exps) if exp != 0)
+def number_key(number):
+    """root_key of a positive integer or Fraction number."""
+    number = Fraction(number)
+    factors = prime_factors(number.numerator)
+    for prime, mult in prime_factors(number.denominator).items():
+        factors[prime] = -mult
+    primes = sorted(factors)
+    return root_key(primes, [factors[prime] for prime in primes])
+
 # Number of multisets of cardinality k, from set with n elements
 def multiset_coefficient(n, k):
     """Formula for number of multisets with cardinality k from
     underlying set with n elements: C^R(n,k)=(n+k-1)!/(k!(n-1)!)"""
-    return int(factorial(n+k-1) / (factorial(k) * factorial(n-1)))
+    return factorial(n+k-1) // (factorial(k) * factorial(n-1))
 # list (~set) to multiset
 def mset(list_):
     """let list = [0,0,0,2,2], then mset(lex) =[0^3, 2^2] """
@@ -168,7 +281,7 @@ def print_inits(module):
     # Rule 1
     str_print['r1'] = str_rule(module.rule1, module.solver1, module.lamb1)
     # Total method 1.
-    if module.rule1 in ["lamb-kemnash", "lamb-kemnash-opt"]:
+    if module.rule1 in ["lamb-kemnash", "lamb-kemnash-opt", "lamb-kemnash-log"]:
         str_print['t1'] = str_print['r1'][:-1]+', '+str_print['s1']+']'
     else:
         str_print['t1'] = str_print['r1']+' ['+str_print['s1']+']'
@@ -182,7 +295,7 @@ def print_inits(module):
     # Rule 2
     str_print['r2'] = str_rule(module.rule2, module.solver2, module.lamb2)
     # Total method 1.
-    if module.rule2 in ["lamb-kemnash", "lamb-kemnash-opt"]:
+    if module.rule2 in ["lamb-kemnash", "lamb-kemnash-opt", "lamb-kemnash-log"]:
         str_print['t2'] = str_print['r2'][:-1]+', '+str_print['s2']+']'
     else:
         str_print['t2'] = str_print['r2']+' ['+str_print['s2']+']'
@@ -201,6 +314,8 @@ def str_rule(rule, solver, lamb):
         str_rule = "\u03BB-Kemeny-Nash [\u03BB="+str(lamb)+"]"
     elif rule == "lamb-kemnash":
         str_rule = "\u03BB-Kemeny-Nash [Opt, \u03BB="+str(lamb)+"]"
+    elif rule == "kemeny-support":
+        str_rule = "Kemeny [Opt, Support]"
     elif rule == "kemeny-original" and solver == "bf":
         str_rule = "Kemeny [JA-ASP]"
     elif rule == "kemeny-original":
@@ -213,6 +328,10 @@ def str_rule(rule, solver, lamb):
         str_rule = "\u03BB-Kemeny-Nash [Sat, \u03BB="+str(lamb)+"]"
     elif rule == "kemeny-original-sat":
         str_rule = "Kemeny [Sat, JA-ASP]"
+    elif rule == "kemnash-log":
+        str_rule = "Kemeny-Nash [Log]"
+    elif rule == "lamb-kemnash-log":
+        str_rule = "\u03BB-Kemeny-Nash [Log, \u03BB="+str(lamb)+"]"
     else:
         str_rule = rule
     return str_rule
\ No newline at end of file
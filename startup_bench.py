@@ -0,0 +1,44 @@
+######################################################################
+## ADDED. Startup benchmark: time (in fresh interpreters) of the imports of
+## a brute-force run (as runexp.py and compare.py, and their worker processes, without plots)
+## and check that clingo, pyparsing, nnf and matplotlib are not imported.
+## Budget: BUDGET seconds (median of the runs) on top of importing numpy;
+## the exit code is 1 if the budget is exceeded or a heavy module is imported.
+######################################################################
+
+import argparse, statistics, subprocess, sys
+
+BUDGET = 0.15
+HEAVY = ['clingo', 'pyparsing', 'nnf', 'matplotlib']
+
+# What a brute-force run imports, and the baseline (numpy).
+BF_IMPORTS = ('import src; from src import Scenario, Compare_Kemnash, CompareRules; '
+    'from src.parallel import Checkpoint; import src.utils')
+BASE_IMPORTS = 'import numpy'
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--runs', type=int, default=10, help='Number of fresh interpreters timed.')
+parser.add_argument('--budget', type=float, default=BUDGET, help='Budget in seconds (on top of numpy).')
+args = parser.parse_args()
+
+def import_time(imports):
+    """Median over args.runs of the time of imports in a fresh interpreter, and the
+    heavy modules it imported."""
+    code = ('import time; t = time.perf_counter(); ' + imports + '; t = time.perf_counter() - t; '
+        f'import sys; print(t); print(" ".join(m for m in {HEAVY} if m in sys.modules))')
+    times = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+            check=True).stdout.split('\n')
+        times.append(float(output[0]))
+    return statistics.median(times), output[1].split()
+
+time_bf, heavy = import_time(BF_IMPORTS)
+time_base, _ = import_time(BASE_IMPORTS)
+print(f'Imports of a BF run: {time_bf:.3f}s (numpy alone: {time_base:.3f}s), budget {args.budget:.3f}s on top of numpy.')
+if heavy:
+    print('Heavy modules imported: ' + ', '.join(heavy))
+if heavy or time_bf - time_base > args.budget:
+    print('FAILED')
+    sys.exit(1)
+print('OK')